@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Generates synthetic todoist states in the format of the todoist-python cache."""
+
+import json
+import os
+import random
+
+LABEL_PROGRESS = 'progressbar'
+LABEL_GROCERY = 'grocery'
+PRICE_FORMATS = ('comma', 'dot', 'prefix', 'integer')
+PRODUCTS = ('Milk', 'Bread', 'Apples', 'Coffee', 'Butter', 'Cheese', 'Rice', 'Pasta', 'Tomatoes', 'Eggs')
+FIRST_ID = 3000000000
+
+
+def formatprice(cents, priceformat, currency, rng) -> str:
+    """
+    Returns a price as users write it in todoist
+
+    :param cents: (int) price in cents
+    :param priceformat: (str) one of PRICE_FORMATS or 'mixed'
+    :param currency: (str) currency symbol
+    :param rng: (random.Random) used for 'mixed'
+    :return: str
+    """
+    if priceformat == 'mixed':
+        priceformat = rng.choice(PRICE_FORMATS)
+    if priceformat == 'comma':
+        return "{},{:02d}{}".format(cents // 100, cents % 100, currency)
+    if priceformat == 'dot':
+        return "{}.{:02d}{}".format(cents // 100, cents % 100, currency)
+    if priceformat == 'prefix':
+        return "{}{}.{:02d}".format(currency, cents // 100, cents % 100)
+    if priceformat == 'integer':
+        return "{}{}".format(cents // 100, currency)
+    raise ValueError("Unknown price format: {}".format(priceformat))
+
+
+def generatestate(items, depth=3, labeldensity=0.1, priceformat='mixed', currency='€', labels=20, inactive=0.05, seed=0) -> dict:
+    """
+    Generates a todoist state with nested tasks. Tasks get the progress label and top level tasks
+    the grocery label with a probability of labeldensity. All subtasks of a grocery list carry a price.
+
+    :param items: (int) number of tasks
+    :param depth: (int) max. nesting depth, 1 -> no subtasks
+    :param labeldensity: (float) 0-1 share of labelled tasks
+    :param priceformat: (str) one of PRICE_FORMATS or 'mixed'
+    :param currency: (str) currency symbol of the prices
+    :param labels: (int) number of additional labels that are not used by taskbutler
+    :param inactive: (float) 0-1 share of deleted, completed (in history) and archived tasks
+    :param seed: (int) same seed -> same state
+    :return: (dict) state as stored in the todoist-python cache
+    """
+    rng = random.Random(seed)
+    project_id = FIRST_ID - 1
+    labelnames = [LABEL_PROGRESS, LABEL_GROCERY] + ["label{}".format(number) for number in range(labels)]
+    labelids = {name: FIRST_ID - 100 - number for number, name in enumerate(labelnames)}
+    fillers = [labelids[name] for name in labelnames[2:]]
+
+    tasks = []
+    # path[level] -> (task ID, is part of a grocery list)
+    path = []
+    for number in range(items):
+        task_id = FIRST_ID + number
+        level = rng.randint(0, min(len(path), max(depth, 1) - 1))
+        parent_id, grocery = path[level - 1] if level else (None, False)
+
+        tasklabels = [rng.choice(fillers)] if fillers and rng.random() < labeldensity else []
+        if level == 0 and rng.random() < labeldensity:
+            tasklabels.append(labelids[LABEL_GROCERY])
+            grocery = True
+            content = "Grocery list {}".format(number)
+        elif grocery:
+            content = "{} {}".format(rng.choice(PRODUCTS), formatprice(rng.randint(100, 5000), priceformat, currency, rng))
+        else:
+            content = "Task {}".format(number)
+        if rng.random() < labeldensity:
+            tasklabels.append(labelids[LABEL_PROGRESS])
+
+        flag = rng.choice(('is_deleted', 'in_history', 'is_archived')) if rng.random() < inactive else None
+        tasks.append({'id': task_id, 'content': content, 'parent_id': parent_id, 'project_id': project_id,
+                      'labels': tasklabels, 'checked': int(flag == 'in_history' or rng.random() < 0.3),
+                      'in_history': int(flag == 'in_history'), 'is_deleted': int(flag == 'is_deleted'),
+                      'is_archived': int(flag == 'is_archived'), 'child_order': number, 'priority': 1, 'user_id': 1111111})
+        path = path[:level] + [(task_id, grocery)]
+
+    return {
+        'items': tasks,
+        'labels': [{'id': labelids[name], 'name': name, 'is_deleted': 0, 'is_favorite': 0, 'item_order': number, 'color': 7}
+                   for number, name in enumerate(labelnames)],
+        'projects': [{'id': project_id, 'name': 'Benchmark', 'is_deleted': 0, 'is_archived': 0, 'parent_id': None}],
+    }
+
+
+def writestate(state, cachefolder, token) -> None:
+    """
+    Writes state to cachefolder like TodoistAPI._write_cache, so TodoistAPI(cache=cachefolder, token=token) loads it
+
+    :param state: (dict) state from generatestate()
+    :param cachefolder: (str) path ending with os.sep
+    :param token: (str) name of the cache files
+    :return: None
+    """
+    os.makedirs(cachefolder, exist_ok=True)
+    with open(os.path.join(cachefolder, token + ".json"), "w") as f:
+        json.dump(state, f)
+    with open(os.path.join(cachefolder, token + ".sync"), "w") as f:
+        f.write("*")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Guards the cold start of the taskbutler CLI: measures `taskbutler --help` in fresh interpreters
+and checks that no heavy SDK gets imported before a feature needs it.
+
+    python -m benchmarks.importtime --max-ms 150
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+import click
+
+# imported only by enabled features or a run
+HEAVY_MODULES = ('dropbox', 'requests', 'todoist', 'asyncio')
+
+HELP_COMMAND = "import sys; sys.argv = ['taskbutler', '--help']; from taskbutler.cli import cli; cli()"
+
+
+def getimportedmodules(code) -> set:
+    """
+    Returns the top level names of all modules a fresh interpreter imports to run code
+
+    :param code: (str) python code
+    :return: (set) module names
+    """
+    result = subprocess.run([sys.executable, '-c', code + "\nimport sys\nprint('\\n'.join(sys.modules), file=sys.stderr)"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    return {line.split('.')[0] for line in result.stderr.splitlines() if line}
+
+
+def getheavymodules(code) -> list:
+    """
+    Returns all HEAVY_MODULES imported to run code
+
+    :param code: (str) python code
+    :return: (list) module names
+    """
+    imported = getimportedmodules(code)
+    return [module for module in HEAVY_MODULES if module in imported]
+
+
+def getstarttime(code, runs=5) -> float:
+    """
+    Returns the fastest wall time of running code in a fresh interpreter
+
+    :param code: (str) python code
+    :param runs: (int) number of interpreters to start
+    :return: (float) seconds
+    """
+    fastest = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        seconds = time.perf_counter() - started
+        fastest = seconds if fastest is None else min(fastest, seconds)
+    return fastest
+
+
+def getimporttimes(module, top=10) -> list:
+    """
+    Returns the modules with the highest cumulative import time of module (python -X importtime)
+
+    :param module: (str) module to import
+    :param top: (int) number of modules to return
+    :return: (list) (module, microseconds)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(cumulative)))
+    return sorted(times, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+@click.command()
+@click.option('--runs', default=5, show_default=True, type=click.IntRange(min=1), help='Fresh interpreters per measurement, the fastest counts.')
+@click.option('--max-ms', default=0, show_default=True, help='Fail if `taskbutler --help` takes longer. 0 -> no limit.')
+@click.option('--json', 'jsonfile', type=click.Path(dir_okay=False), help='Write the results to this file.')
+def main(runs, max_ms, jsonfile):
+    """Measures the cold start of the taskbutler CLI and checks for eagerly imported SDKs."""
+    baseline = getstarttime("pass", runs)
+    helptime = getstarttime(HELP_COMMAND, runs)
+    heavy = getheavymodules(HELP_COMMAND)
+
+    click.echo("interpreter:        {:8.1f} ms".format(baseline * 1000))
+    click.echo("taskbutler --help:  {:8.1f} ms".format(helptime * 1000))
+    click.echo("slowest imports of taskbutler.taskbutler:")
+    for name, microseconds in getimporttimes('taskbutler.taskbutler'):
+        click.echo("  {:<40}{:8.1f} ms".format(name, microseconds / 1000))
+
+    if jsonfile:
+        with open(jsonfile, 'w') as f:
+            json.dump({'interpreter': baseline, 'help': helptime, 'heavy': heavy}, f, indent=2)
+
+    failed = False
+    if heavy:
+        click.echo("--help imports {}".format(", ".join(heavy)), err=True)
+        failed = True
+    if max_ms and helptime * 1000 > max_ms:
+        click.echo("--help took {:.1f} ms. Limit: {} ms".format(helptime * 1000, max_ms), err=True)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
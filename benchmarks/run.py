@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Runs the taskbutler passes against synthetic todoist states and reports time and peak memory per pass.
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --json bench.json
+    python -m benchmarks.run --compare bench.json
+"""
+
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from configparser import ConfigParser
+
+import click
+from todoist import models
+from todoist.api import TodoistAPI
+
+import taskbutler
+from taskbutler.ingest import compactTodoistAPI
+from taskbutler.state import stateIndex
+from taskbutler.titles import titleCodec
+from taskbutler.taskbutler import gettaskwithlabelid, progressFeature, groceryFeature
+
+from .generate import generatestate, writestate, LABEL_PROGRESS, LABEL_GROCERY
+
+TOKEN = "benchmark"
+
+
+class benchSession:
+    """
+    Stands in for accountSession - features only read config and devmode
+    """
+
+    def __init__(self, currency):
+        self.config = ConfigParser()
+        self.config.read(os.path.join(os.path.dirname(taskbutler.__file__), 'config.ini.sample'), encoding='utf-8')
+        self.config['todoist']['label_progress'] = LABEL_PROGRESS
+        self.config['todoist']['label_grocery'] = LABEL_GROCERY
+        self.config['todoist']['grocery_currency'] = currency
+        self.devmode = True
+        self.titles = titleCodec.fromconfig(self.config)
+
+
+def loadstate(cachefolder) -> TodoistAPI:
+    """
+    Loads the state through the todoist-python cache, like the tests and accountSession do
+
+    :param cachefolder: (str) path ending with os.sep
+    :return: TodoistAPI
+    """
+    # reads the cache files of token
+    return TodoistAPI(cache=cachefolder, token=TOKEN)
+
+
+def bulkloadstate(cachefolder) -> TodoistAPI:
+    """
+    Loads the same cache files without merging every task into the state one by one.
+    TodoistAPI._update_state looks up each task by a linear search -> O(n^2), hours for 1M tasks.
+    The passes only need the resulting state, so large states are loaded this way.
+
+    :param cachefolder: (str) path ending with os.sep
+    :return: TodoistAPI
+    """
+    api = TodoistAPI(cache=None, token=TOKEN)
+    api.cache = cachefolder
+    with open(cachefolder + TOKEN + ".json") as f:
+        state = json.load(f)
+    api.state['items'] = [models.Item(item, api) for item in state['items']]
+    api.state['labels'] = [models.Label(label, api) for label in state['labels']]
+    api.state['projects'] = [models.Project(project, api) for project in state['projects']]
+    with open(cachefolder + TOKEN + ".sync") as f:
+        api.sync_token = f.read()
+    return api
+
+
+def compactloadstate(cachefolder) -> compactTodoistAPI:
+    """
+    Loads the cache files as stream through compactTodoistAPI, like accountSession does
+
+    :param cachefolder: (str) path ending with os.sep
+    :return: compactTodoistAPI
+    """
+    return compactTodoistAPI(cache=cachefolder, token=TOKEN)
+
+
+def measure(function, memory=True) -> dict:
+    """
+    Runs function once for the time and, if memory is True, once more with tracemalloc for the peak memory
+
+    :param function: callable without arguments
+    :param memory: (bool) measure peak memory
+    :return: (dict) seconds and peak bytes (None without memory)
+    """
+    gc.collect()
+    started = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'peak': peak}
+
+
+def runbenchmark(items, depth=3, labeldensity=0.1, priceformat='mixed', currency='€', inactive=0.05, seed=0, memory=True, maxload=5000) -> dict:
+    """
+    Generates one state and measures all passes on it. The load pass through TodoistAPI is quadratic
+    and only measured up to maxload tasks, all other passes work on a bulk loaded state.
+
+    :param items: (int) number of tasks
+    :param depth: (int) max. nesting depth
+    :param labeldensity: (float) 0-1 share of labelled tasks
+    :param priceformat: (str) price format of grocery items
+    :param currency: (str) currency symbol
+    :param inactive: (float) 0-1 share of deleted, completed and archived tasks
+    :param seed: (int) seed of the generator
+    :param memory: (bool) measure peak memory
+    :param maxload: (int) max. tasks to measure the load pass for
+    :return: (dict) pass name -> measure() result
+    """
+    session = benchSession(currency)
+    with tempfile.TemporaryDirectory() as folder:
+        cachefolder = folder + os.sep
+        writestate(generatestate(items, depth=depth, labeldensity=labeldensity, priceformat=priceformat, currency=currency,
+                                 inactive=inactive, seed=seed), cachefolder, TOKEN)
+
+        results = {}
+        if items <= maxload:
+            results['load'] = measure(lambda: loadstate(cachefolder), memory)
+        results['bulkload'] = measure(lambda: bulkloadstate(cachefolder), memory)
+        results['compactload'] = measure(lambda: compactloadstate(cachefolder), memory)
+        api = bulkloadstate(cachefolder)
+
+    results['stateIndex'] = measure(lambda: stateIndex(api), memory)
+    index = stateIndex(api)
+    progress_id = index.getlabelid(LABEL_PROGRESS)
+
+    results['gettaskwithlabelid'] = measure(lambda: gettaskwithlabelid(progress_id, api), memory)
+    results['progress'] = measure(lambda: progressFeature(session).run(index, None), memory)
+    results['grocery'] = measure(lambda: groceryFeature(session).run(index, None), memory)
+    return results
+
+
+def formatbytes(size) -> str:
+    if size is None:
+        return "-"
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return "{:.1f} {}".format(size, unit)
+        size = size / 1024
+    return "{:.1f} GiB".format(size)
+
+
+@click.command()
+@click.option('--sizes', default='1000,10000,100000', show_default=True, help='Comma separated numbers of tasks, e.g. 1000,1000000.')
+@click.option('--depth', default=3, show_default=True, type=click.IntRange(min=1), help='Max. nesting depth of tasks.')
+@click.option('--labeldensity', default=0.1, show_default=True, type=click.FloatRange(0, 1), help='Share of labelled tasks.')
+@click.option('--priceformat', default='mixed', show_default=True,
+              type=click.Choice(['mixed', 'comma', 'dot', 'prefix', 'integer']), help='Price format of grocery items.')
+@click.option('--currency', default='€', show_default=True, help='Currency symbol of grocery items.')
+@click.option('--inactive', default=0.05, show_default=True, type=click.FloatRange(0, 1), help='Share of deleted, completed and archived tasks.')
+@click.option('--seed', default=0, show_default=True, help='Seed of the state generator.')
+@click.option('--max-load', default=5000, show_default=True, help='Max. tasks to measure the quadratic TodoistAPI cache load for.')
+@click.option('--no-memory', is_flag=True, help='Skip the peak memory run (halves the runtime).')
+@click.option('--json', 'jsonfile', type=click.Path(dir_okay=False), help='Write the results to this file.')
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), help='Show the change against results of an earlier --json run.')
+def main(sizes, depth, labeldensity, priceformat, currency, inactive, seed, max_load, no_memory, jsonfile, compare):
+    """Benchmarks the taskbutler passes offline on synthetic todoist states."""
+    baseline = {}
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    click.echo("{:>9}  {:<20}{:>12}{:>14}{:>10}".format('items', 'pass', 'seconds', 'peak memory', 'change'))
+    for size in [int(size) for size in sizes.split(',')]:
+        results[str(size)] = runbenchmark(size, depth=depth, labeldensity=labeldensity, priceformat=priceformat,
+                                          currency=currency, inactive=inactive, seed=seed, memory=not no_memory, maxload=max_load)
+        for name, result in results[str(size)].items():
+            change = ""
+            before = baseline.get(str(size), {}).get(name)
+            if before and before['seconds']:
+                change = "{:+.0%}".format(result['seconds'] / before['seconds'] - 1)
+            click.echo("{:>9}  {:<20}{:>12.4f}{:>14}{:>10}".format(size, name, result['seconds'], formatbytes(result['peak']), change))
+
+    if jsonfile:
+        with open(jsonfile, 'w') as f:
+            json.dump({'settings': {'depth': depth, 'labeldensity': labeldensity, 'priceformat': priceformat,
+                                    'currency': currency, 'inactive': inactive, 'seed': seed},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
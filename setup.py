@@ -34,7 +34,7 @@ setup(
     description="Taskbutler enriches your Todoist tasks by adding progress bars, Office365 Files and Dropbox Paper papers directly to your tasks. IMPORTANT NOTICE: The project is currently on hold due to changes in the third-party APIs. I'll try to bring Taskbutler up to date in late 2023.",
     entry_points={
         'console_scripts': [
-            'taskbutler=taskbutler.cli:main',
+            'taskbutler=taskbutler.cli:cli',
         ],
     },
     install_requires=requirements,
@@ -43,7 +43,7 @@ setup(
     include_package_data=True,
     keywords='taskbutler',
     name='taskbutler',
-    packages=find_packages(include=['taskbutler']),
+    packages=find_packages(include=['taskbutler', 'taskbutler.*']),
     setup_requires=setup_requirements,
     test_suite='tests',
     tests_require=test_requirements,
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Multi-account mode of taskbutler - processes a directory of account configs on a shared worker pool."""
+
+import contextvars
+import glob
+import logging
+import logging.handlers
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+
+from .config import getAccountPaths
+
+logger = logging.getLogger('todoist')
+loggerdb = logging.getLogger('dropbox')
+loggerdg = logging.getLogger('github')
+
+LOGGERS = (logger, loggerdb, loggerdg)
+
+# account of the current run - set per worker, copied into the threads of the run
+ACCOUNT = contextvars.ContextVar('account', default=None)
+
+FORMAT = '%(asctime)s - %(account)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class accountFilter(logging.Filter):
+    """
+    Adds the account of the current run to every log record. Passes records of the given account only
+    """
+
+    def __init__(self, account=None):
+        """
+        :param account: (str) name of the account. None -> pass records of all accounts
+        """
+        super().__init__()
+        self.account = account
+
+    def filter(self, record) -> bool:
+        record.account = ACCOUNT.get() or '-'
+        return self.account is None or record.account == self.account
+
+
+def getaccounts(folder) -> dict:
+    """
+    Returns all account configs in folder. Every *.ini file is one account named like the file
+
+    :param folder: (str) directory of account configs
+    :return: (dict) account name -> config file, sorted by name
+    """
+    configfiles = sorted(glob.glob(os.path.join(folder, '*.ini')))
+    return {os.path.splitext(os.path.basename(configfile))[0]: configfile for configfile in configfiles}
+
+
+def readaccountconfig(configfile) -> ConfigParser:
+    """
+    Reads config of one account
+
+    :param configfile: (str) config.ini of the account
+    :return: (ConfigParser) config
+    """
+    config = ConfigParser()
+    with open(configfile, 'r', encoding='utf-8') as f:
+        config.read_file(f)
+    return config
+
+
+def getloglevel(config) -> int:
+    """
+    Returns loglevel of the [log] section. Default is DEBUG
+
+    :param config: (ConfigParser) config
+    :return: (int) loglevel
+    """
+    level = logging.getLevelName(config.get('log', 'loglevel', fallback='DEBUG'))
+    return level if isinstance(level, int) else logging.DEBUG
+
+
+def runaccount(name, configfile, transport=None, concurrency=4, fullsync=False) -> bool:
+    """
+    Runs all features for one account. Errors of the account are logged and never reach the other accounts.
+    Log records of the account also go to its own log file.
+
+    :param name: (str) name of the account
+    :param configfile: (str) config.ini of the account
+    :param transport: (sharedTransport) connection pools shared by all accounts
+    :param concurrency: (int) max. HTTP requests of the account in flight
+    :param fullsync: (bool) ignore the stored sync token
+    :return: (bool) True if the run succeeded
+    """
+    from .taskbutler import accountSession, UPDATE_CHECK_TIMEOUT
+
+    ACCOUNT.set(name)
+    paths = getAccountPaths(name, configfile)
+    handler = None
+    try:
+        config = readaccountconfig(configfile)
+        os.makedirs(paths.cache(), mode=0o750, exist_ok=True)
+        os.makedirs(paths.log(), mode=0o750, exist_ok=True)
+
+        handler = logging.handlers.TimedRotatingFileHandler(paths.file_log(), when="d", interval=7, backupCount=2, encoding='utf-8')
+        handler.setFormatter(logging.Formatter(FORMAT))
+        handler.setLevel(getloglevel(config))
+        handler.addFilter(accountFilter(name))
+        for instance in LOGGERS:
+            instance.addHandler(handler)
+
+        logger.info("Start account {} with config: {}".format(name, configfile))
+        session = accountSession(config, paths=paths, transport=transport, limit=threading.BoundedSemaphore(concurrency))
+        session.run(fullsync=fullsync)
+        if session.updatecheck is not None:
+            session.updatecheck.join(config.getfloat('config', 'update_timeout', fallback=UPDATE_CHECK_TIMEOUT))
+        return True
+    except (Exception, SystemExit) as error:
+        # SystemExit: errors the single account mode exits on, e.g. an invalid API key
+        logger.error("Account {} failed: {}".format(name, error or type(error).__name__))
+        return False
+    finally:
+        if handler is not None:
+            for instance in LOGGERS:
+                instance.removeHandler(handler)
+            handler.close()
+
+
+def runaccounts(folder, workers=4, concurrency=4, fullsync=False) -> dict:
+    """
+    Runs all accounts in folder on a pool of workers. All accounts share the HTTP connection pools.
+    Every account has its own cache below the app directory and its own log file.
+
+    :param folder: (str) directory of account configs
+    :param workers: (int) max. accounts processed at the same time
+    :param concurrency: (int) max. HTTP requests of one account in flight
+    :param fullsync: (bool) ignore the stored sync token
+    :return: (dict) account name -> True if the run succeeded
+    """
+    from .transport import sharedTransport
+
+    accounts = getaccounts(folder)
+    if not accounts:
+        return {}
+
+    # console output of all accounts. The logger level is the lowest level of all accounts, the file handlers filter the rest
+    levels = []
+    for configfile in accounts.values():
+        try:
+            levels.append(getloglevel(readaccountconfig(configfile)))
+        except Exception:
+            # reported by the run of the account
+            pass
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(FORMAT))
+    console.addFilter(accountFilter())
+    for instance in LOGGERS:
+        instance.addHandler(console)
+        instance.setLevel(min(levels or [logging.DEBUG]))
+        instance.propagate = False
+
+    transport = sharedTransport(poolsize=max(1, workers) * max(1, concurrency))
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(accounts)))) as executor:
+            # every account runs in its own context -> ACCOUNT stays set in the threads the run starts
+            futures = {name: executor.submit(contextvars.copy_context().run, runaccount, name, configfile, transport, concurrency, fullsync)
+                       for name, configfile in accounts.items()}
+            results = {name: future.result() for name, future in futures.items()}
+        failed = [name for name, succeeded in results.items() if not succeeded]
+        logger.info("Processed {} accounts. Failed: {}".format(len(results), ", ".join(failed) or "none"))
+        return results
+    finally:
+        transport.close()
+        for instance in LOGGERS:
+            instance.removeHandler(console)
+
+
+def main(folder, workers=4, concurrency=4, fullsync=False):
+    results = runaccounts(folder, workers=workers, concurrency=concurrency, fullsync=fullsync)
+    if not results:
+        logger.error("No account configs (*.ini) found in {}".format(folder))
+        raise SystemExit(1)
+    if not all(results.values()):
+        raise SystemExit(1)
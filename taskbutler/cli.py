@@ -2,23 +2,77 @@
 
 """Console script for taskbutler."""
 import click
-from . import taskbutler
+
+# taskbutler, dropbox and todoist get imported by the commands - --help stays fast
 
 
 @click.group(invoke_without_command=True)
+@click.option('--full-sync', is_flag=True, help='Ignore the stored sync token and download the whole Todoist account.')
 @click.pass_context
-def cli(ctx):
-    """This script showcases different terminal UI helpers in Click."""
+def cli(ctx, full_sync):
+    """Taskbutler enriches your Todoist tasks. Runs all features if no command is given."""
+    ctx.obj = {'full_sync': full_sync}
     if ctx.invoked_subcommand is None:
-        main()
-    else:
-        pass
+        ctx.invoke(main)
 
 
 @cli.command()
-def main(args=None):
+@click.pass_context
+def main(ctx, args=None):
     """Console script for taskbutler."""
-    taskbutler.main()
+    from . import taskbutler
+    taskbutler.main(fullsync=(ctx.obj or {}).get('full_sync', False))
+    return 0
+
+
+@cli.command()
+@click.option('--daemon', is_flag=True, help='Keep running and run all features every interval.')
+@click.option('--interval', default=1200, show_default=True, type=click.IntRange(min=1), help='Seconds between runs in daemon mode.')
+@click.option('--jitter', default=60, show_default=True, type=click.IntRange(min=0), help='Max. random seconds added to or subtracted from the interval.')
+@click.pass_context
+def run(ctx, daemon, interval, jitter):
+    """Run all features once or as daemon."""
+    fullsync = (ctx.obj or {}).get('full_sync', False)
+    if daemon:
+        from .daemon import rundaemon
+        rundaemon(interval, jitter=jitter, fullsync=fullsync)
+    else:
+        from . import taskbutler
+        taskbutler.main(fullsync=fullsync)
+    return 0
+
+
+@cli.command()
+@click.argument('planfile', type=click.Path(dir_okay=False))
+@click.pass_context
+def plan(ctx, planfile):
+    """Compute all title updates and artifacts of a run and write them to PLANFILE. Changes nothing."""
+    from . import taskbutler
+    taskbutler.plan(planfile, fullsync=(ctx.obj or {}).get('full_sync', False))
+    return 0
+
+
+@cli.command()
+@click.argument('planfile', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch', default=100, show_default=True, type=click.IntRange(1, 100), help='Todoist commands per request.')
+@click.option('--delay', default=0.0, show_default=True, type=click.FloatRange(min=0), help='Seconds between two requests.')
+@click.option('--retries', default=3, show_default=True, type=click.IntRange(min=0), help='Retries of failed commands.')
+def apply(planfile, batch, delay, retries):
+    """Apply PLANFILE. Tasks changed since the plan are skipped."""
+    from . import taskbutler
+    taskbutler.apply(planfile, batch=batch, delay=delay, retries=retries)
+    return 0
+
+
+@cli.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--workers', default=4, show_default=True, type=click.IntRange(min=1), help='Accounts processed at the same time.')
+@click.option('--concurrency', default=4, show_default=True, type=click.IntRange(min=1), help='HTTP requests in flight per account.')
+@click.pass_context
+def accounts(ctx, directory, workers, concurrency):
+    """Run all features for every account config (*.ini) in DIRECTORY."""
+    from .accounts import main
+    main(directory, workers=workers, concurrency=concurrency, fullsync=(ctx.obj or {}).get('full_sync', False))
     return 0
 
 
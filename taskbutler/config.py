@@ -13,11 +13,16 @@ class staticConfig:
     dir_config = 'config'
     dir_templates = 'templates'
     dir_log = 'log'
+    dir_cache = 'cache'
+    dir_accounts = 'accounts'
 
     # file names
     filename_config = 'config.ini'
     filename_config_initial = 'config.ini.sample'
     filename_log = 'taskbutler.log'
+    filename_fingerprints = 'fingerprints.json'
+    filename_paperfolders = 'paperfolders.json'
+    filename_updatecheck = 'updatecheck.json'
 
 
 class getConfigPaths:
@@ -34,8 +39,33 @@ class getConfigPaths:
     def log(self):
         return os.path.join(self.user(), staticConfig.dir_app, staticConfig.dir_log)
 
+    def cache(self):
+        return os.path.join(self.user(), staticConfig.dir_app, staticConfig.dir_cache)
+
     def templates(self):
         return os.path.join(self.user(), staticConfig.dir_app, staticConfig.dir_templates)
 
     def file_config(self):
         return os.path.join(self.user(), staticConfig.dir_app, staticConfig.dir_config, staticConfig.filename_config)
+
+
+class getAccountPaths(getConfigPaths):
+    """
+    Paths of one account in multi-account mode: own config file, cache and log file below the app directory
+    """
+
+    def __init__(self, name, configfile):
+        self.name = name
+        self.configfile = configfile
+
+    def cache(self):
+        return os.path.join(super().cache(), staticConfig.dir_accounts, self.name)
+
+    def log(self):
+        return os.path.join(super().log(), staticConfig.dir_accounts)
+
+    def file_config(self):
+        return self.configfile
+
+    def file_log(self):
+        return os.path.join(self.log(), self.name + '.log')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Daemon mode for taskbutler - runs all features on a schedule in one long running process."""
+
+import logging
+import random
+import signal
+import threading
+
+from .taskbutler import createconfigpaths, readconfig, accountSession
+from .webhook import webhookReceiver, startwebhookserver
+
+logger = logging.getLogger('todoist')
+
+
+def getdelay(interval, jitter) -> float:
+    """
+    Returns seconds to wait until the next run: interval +/- random jitter
+
+    :param interval: (int) seconds between runs
+    :param jitter: (int) max. seconds to add or subtract
+    :return: (float) seconds
+    """
+    return max(0.0, interval + random.uniform(-jitter, jitter))
+
+
+def rundaemon(interval, jitter=60, fullsync=False, stop=None):
+    """
+    Runs all features every interval seconds until SIGTERM/SIGINT.
+    Config, clients and todoist state stay in memory between runs.
+    A failed run gets logged and retried next interval.
+    If a webhook port is configured, changed tasks get recomputed right away in between.
+
+    :param interval: (int) seconds between runs
+    :param jitter: (int) max. seconds to add or subtract from interval
+    :param fullsync: (bool) full sync on the first run
+    :param stop: (threading.Event) stops the daemon once set. Default: set by SIGTERM/SIGINT
+    :return: None
+    """
+    createconfigpaths()
+    config = readconfig()
+    session = accountSession(config)
+
+    server = None
+    if config.get('webhook', 'port', fallback=''):
+        secret = config.get('webhook', 'secret', fallback='')
+        if not secret:
+            logger.error("Webhook port set, but no secret. Set [webhook] secret to the client secret of your Todoist app")
+            raise SystemExit(1)
+        receiver = webhookReceiver(session.recompute, debounce=config.getfloat('webhook', 'debounce', fallback=1.0))
+        server = startwebhookserver(receiver, secret, host=config.get('webhook', 'host', fallback='127.0.0.1'),
+                                    port=config.getint('webhook', 'port'))
+
+    handlers = {}
+    if stop is None:
+        stop = threading.Event()
+
+        def handlesignal(signum, frame):
+            logger.info("Received signal {}. Stopping after current run".format(signum))
+            stop.set()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            handlers[signum] = signal.signal(signum, handlesignal)
+
+    logger.info("Taskbutler daemon started. Interval: {}s".format(interval))
+    try:
+        while not stop.is_set():
+            try:
+                session.run(fullsync=fullsync)
+                fullsync = False
+            except (Exception, SystemExit) as error:
+                logger.error("Run failed. Retrying next interval. Original Error: {}".format(error))
+            stop.wait(getdelay(interval, jitter))
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+    logger.info("Taskbutler daemon stopped")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""asyncio engine for taskbutler - runs the features of one run and merges their update intents."""
+
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .features import getfeatureorder, getrequirements
+
+logger = logging.getLogger('todoist')
+
+
+async def runfeatures(features, index, dirty, queue, executor, metrics=None):
+    """
+    Every feature prepares on the snapshot and starts its independent work (e.g. creating artifacts) right away,
+    then runs as soon as its requirements are done. I/O features run on the executor,
+    CPU-only features on the event loop while network calls are in flight.
+    Intents are queued as soon as a feature is done. If two independent features update the same field
+    of a task, the feature that finished first wins.
+
+    :param features: (list) enabled feature instances
+    :param index: (stateIndex) index of the current state
+    :param dirty: (set) IDs of tasks to recompute. None -> all tasks
+    :param queue: (updateQueue) collects the intents
+    :param executor: (Executor) runs the I/O features
+    :param metrics: (runMetrics) records time, scanned and updated tasks per feature
+    :return: (dict) feature name -> list of applied intents
+    """
+    loop = asyncio.get_event_loop()
+    requirements = getrequirements(features)
+    owners = {}
+    applied = {}
+    tasks = {}
+
+    def apply(instance, intents):
+        applied[instance.name] = []
+        for intent in intents or []:
+            task = index.getitem(intent.task_id)
+            if task is None:
+                logger.warning("Feature {} updated unknown task {}".format(instance.name, intent.task_id))
+                continue
+            fields = {}
+            for field, value in intent.fields.items():
+                owner = owners.get((intent.task_id, field))
+                if owner is not None and owner not in requirements[instance.name]:
+                    logger.warning("Conflicting update of task {} by {} and {}. Keeping {}".format(
+                        intent.task_id, owner, instance.name, owner))
+                    continue
+                owners[(intent.task_id, field)] = instance.name
+                fields[field] = value
+            if fields:
+                queue.update(task, **fields)
+                applied[instance.name].append(intent)
+
+    async def step(instance, method, *args):
+        started = time.monotonic()
+        if instance.io:
+            # executor threads get the context of the run, e.g. the account of its log records
+            result = await loop.run_in_executor(executor, contextvars.copy_context().run, method, *args)
+        else:
+            result = method(*args)
+        return result, time.monotonic() - started
+
+    def startandrun(instance):
+        instance.start()
+        return instance.run(index, dirty)
+
+    async def runone(instance):
+        required = [tasks[name] for name in instance.requires if name in tasks]
+        if required:
+            # independent work goes in flight right away - only run() waits for the required features
+            seconds = (await step(instance, instance.start))[1]
+            await asyncio.gather(*required)
+            intents, runseconds = await step(instance, instance.run, index, dirty)
+            seconds += runseconds
+        else:
+            intents, seconds = await step(instance, startandrun, instance)
+        logger.debug("Feature {} done in {:.2f}s".format(instance.name, seconds))
+        apply(instance, intents)
+        if metrics is not None:
+            metrics.addphase('feature_' + instance.name, seconds)
+            metrics.countitems(instance.name, scanned=instance.scanned, updated=len(applied[instance.name]))
+
+    ordered = getfeatureorder(features)
+    # every feature reads the snapshot before any intent gets applied
+    for instance in ordered:
+        try:
+            instance.prepare(index, dirty)
+        except Exception as error:
+            logger.error("Feature {} failed: {}".format(instance.name, error))
+            raise
+    # I/O features come first -> their requests start before the CPU-only features block the loop
+    for instance in sorted(ordered, key=lambda instance: not instance.io):
+        tasks[instance.name] = loop.create_task(runone(instance))
+
+    # never leave I/O features running in the background
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for name, result in zip(tasks, results):
+        if isinstance(result, BaseException):
+            logger.error("Feature {} failed: {}".format(name, result))
+    if errors:
+        raise errors[0]
+    return applied
+
+
+def runpipeline(features, index, dirty, queue, metrics=None):
+    """
+    Runs the features of one run on a private event loop. Wall-clock time approaches the slowest chain
+    of features instead of the sum of all features. Safe to call from any thread without a running event loop.
+
+    :param features: (list) enabled feature instances
+    :param index: (stateIndex) index of the current state
+    :param dirty: (set) IDs of tasks to recompute. None -> all tasks
+    :param queue: (updateQueue) collects the intents
+    :param metrics: (runMetrics) records time, scanned and updated tasks per feature
+    :return: (dict) feature name -> list of applied intents
+    """
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=max(1, len([instance for instance in features if instance.io])))
+    try:
+        return loop.run_until_complete(runfeatures(features, index, dirty, queue, executor, metrics))
+    finally:
+        executor.shutdown(wait=True)
+        loop.close()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Feature interface of taskbutler - every feature reads the shared state and emits update intents."""
+
+from collections import namedtuple
+
+# fields -> dict of task fields to set, e.g. {'content': "new title"}
+updateIntent = namedtuple('updateIntent', ['task_id', 'fields'])
+
+# title -> name of the new artifact, content -> task title its link gets added to
+artifactIntent = namedtuple('artifactIntent', ['feature', 'task_id', 'title', 'content'])
+
+
+class feature:
+    """
+    Base class of all features.
+    A feature reads the shared state snapshot and returns update intents - it must not change the state itself.
+    The runner applies the intents of all features and commits them once.
+
+    Features without a requirement run in parallel. A feature listed in requires runs before and
+    its intents are already applied to the snapshot. Work that doesn't need the required features goes to
+    prepare() and start() - they run right away, so only run() waits.
+    """
+
+    #: unique name, used in requires of other features
+    name = None
+    #: names of features that must run first
+    requires = ()
+    #: True -> blocking network I/O, runs on a worker thread
+    io = False
+    #: True -> creates files or calls external services. Skipped on webhook recomputations
+    artifacts = False
+
+    def __init__(self, session, dryrun=False):
+        """
+        :param session: (accountSession) config and clients of the account
+        :param dryrun: (bool) plan only - artifacts get recorded in self.planned instead of created
+        """
+        self.session = session
+        self.config = session.config
+        self.dryrun = dryrun
+        # tasks looked at by the last run() - reported in the metrics
+        self.scanned = 0
+        # artifacts of the last run() in dryrun
+        self.planned = []
+
+    def enabled(self) -> bool:
+        """
+        Returns True if the feature is configured
+
+        :return: bool
+        """
+        return True
+
+    def prepare(self, index, dirty):
+        """
+        Reads what the feature needs from the snapshot. Called for every feature at the start of the run,
+        before the intents of any feature are applied
+
+        :param index: (stateIndex) index of the current state
+        :param dirty: (set) IDs of tasks to recompute. None -> all tasks
+        :return: None
+        """
+        pass
+
+    def start(self):
+        """
+        Work that doesn't need the required features, e.g. network calls. Starts right after prepare(),
+        on a worker thread if self.io
+
+        :return: None
+        """
+        pass
+
+    def run(self, index, dirty) -> list:
+        """
+        Computes the updates of this feature. Called once the required features are done
+
+        :param index: (stateIndex) index of the current state
+        :param dirty: (set) IDs of tasks to recompute. None -> all tasks
+        :return: (list) updateIntent
+        """
+        raise NotImplementedError
+
+
+class artifactFeature(feature):
+    """
+    Base class of features that create one artifact (document, file) per task and add its link to the task title.
+    Planning and creating are split, so a plan can list the artifacts without creating them.
+    Artifacts are planned on the snapshot and created right away - only the link waits for the required features,
+    so it gets added to their new title.
+    """
+
+    io = True
+    artifacts = True
+
+    def __init__(self, session, dryrun=False):
+        super().__init__(session, dryrun=dryrun)
+        # artifactIntents of prepare() and links of start()
+        self.pending = None
+        self.urls = []
+
+    def plan(self, index, dirty) -> list:
+        """
+        Returns the artifacts to create
+
+        :param index: (stateIndex) index of the current state
+        :param dirty: (set) IDs of tasks to recompute. None -> all tasks
+        :return: (list) artifactIntent
+        """
+        raise NotImplementedError
+
+    def create(self, titles) -> list:
+        """
+        Creates one artifact per title
+
+        :param titles: (list) names of the artifacts
+        :return: (list) links in order of titles
+        """
+        raise NotImplementedError
+
+    def link(self, content, url) -> str:
+        """
+        Returns the task title with the link of its artifact
+
+        :param content: (str) task title
+        :param url: (str) link of the artifact
+        :return: str
+        """
+        raise NotImplementedError
+
+    def prepare(self, index, dirty):
+        self.pending = self.plan(index, dirty)
+        self.scanned = len(self.pending)
+
+    def start(self):
+        if not self.dryrun and self.pending:
+            self.urls = self.create([artifact.title for artifact in self.pending])
+
+    def run(self, index, dirty) -> list:
+        if self.pending is None:
+            self.prepare(index, dirty)
+            self.start()
+        intents = []
+        for number, artifact in enumerate(self.pending):
+            # title with the updates of the required features
+            task = index.getitem(artifact.task_id)
+            content = task['content'] if task is not None else artifact.content
+            if self.dryrun:
+                self.planned.append(artifact._replace(content=content))
+            else:
+                intents.append(updateIntent(artifact.task_id, {'content': self.link(content, self.urls[number])}))
+        return intents
+
+
+def getfeatureorder(features) -> list:
+    """
+    Returns features sorted by their requirements. Ready I/O features come first, so their requests
+    are in flight before the CPU-only features start. Requirements that are not enabled are ignored.
+
+    :param features: (list) feature instances
+    :return: (list) feature instances
+    """
+    names = {instance.name for instance in features}
+    remaining = list(features)
+    done = set()
+    ordered = []
+    while remaining:
+        ready = [instance for instance in remaining if all(name in done or name not in names for name in instance.requires)]
+        if not ready:
+            raise ValueError("Circular feature requirements: {}".format(", ".join(instance.name for instance in remaining)))
+        ready.sort(key=lambda instance: not instance.io)
+        for instance in ready:
+            remaining.remove(instance)
+            done.add(instance.name)
+        ordered.extend(ready)
+    return ordered
+
+
+def getrequirements(features) -> dict:
+    """
+    Returns all direct and indirect requirements of every feature
+
+    :param features: (list) feature instances
+    :return: (dict) feature name -> set of feature names
+    """
+    requires = {instance.name: set(instance.requires) for instance in features}
+    resolved = {}
+
+    def resolve(name, visiting):
+        if name not in resolved:
+            names = set()
+            for required in requires.get(name, ()):
+                if required in requires and required not in visiting:
+                    names.add(required)
+                    names |= resolve(required, visiting | {name})
+            resolved[name] = names
+        return resolved[name]
+
+    for instance in features:
+        resolve(instance.name, set())
+    return resolved
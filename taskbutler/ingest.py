@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Streaming ingestion of todoist sync payloads and cache files - keeps only the tasks and fields taskbutler reads."""
+
+import codecs
+import json
+import logging
+import os
+import re
+
+from todoist import models
+from todoist.api import TodoistAPI, json_dumps, state_default
+
+from .sync import issyncresponse
+
+logger = logging.getLogger('todoist')
+
+# characters read from a file or response at once
+CHUNK_SIZE = 65536
+
+# resource types taskbutler reads - all other lists of the payload are skipped
+RESOURCE_TYPES = ('items', 'labels')
+
+# task fields taskbutler reads and their defaults
+ITEM_FIELDS = (('id', None), ('parent_id', None), ('content', ""), ('labels', ()), ('checked', 0),
+               ('in_history', 0), ('is_deleted', 0), ('is_archived', 0))
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class jsonStream:
+    """
+    Reads JSON from chunks of text. Only the value currently read is held in memory,
+    so the items of a large list can be handled one by one.
+    """
+
+    def __init__(self, chunks):
+        """
+        :param chunks: iterable of str
+        """
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size) -> bool:
+        """
+        Drops the read part of the buffer and reads chunks until size characters are buffered
+
+        :param size: (int) characters to buffer
+        :return: (bool) False if the input ended before
+        """
+        parts = [self.buffer[self.pos:]]
+        self.pos = 0
+        buffered = len(parts[0])
+        while buffered < size and not self.eof:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+            else:
+                parts.append(chunk)
+                buffered += len(chunk)
+        self.buffer = "".join(parts)
+        return buffered >= size
+
+    def peek(self) -> str:
+        """
+        Skips whitespace and returns the next character without consuming it
+
+        :return: (str) next character. Empty at the end of the input
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill(1):
+                return ""
+
+    def expect(self, char):
+        """
+        Consumes char
+
+        :param char: (str) expected character
+        :return: None
+        """
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expected '{}' but found '{}'".format(char, found))
+        self.pos += 1
+
+    def value(self):
+        """
+        Reads the next complete value
+
+        :return: decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer might continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # double the buffer -> a large value gets decoded O(log n) times, not once per chunk
+            self.fill(max(2 * (len(self.buffer) - self.pos), CHUNK_SIZE))
+
+    def iterarray(self):
+        """
+        Yields the values of the next list one by one
+
+        :return: generator
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError("Expected ',' or ']' but found '{}'".format(char))
+
+    def iterkeys(self):
+        """
+        Yields the keys of the next object. The value of every key has to be read before the next key
+
+        :return: generator
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Expected key but found {}".format(key))
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError("Expected ',' or '}}' but found '{}'".format(char))
+
+
+def readpayload(stream, onitem) -> dict:
+    """
+    Reads a sync payload or cache file. Tasks are passed to onitem one by one,
+    lists of resource types taskbutler doesn't read are skipped.
+
+    :param stream: (jsonStream) positioned at the payload
+    :param onitem: callable, gets every task as dict
+    :return: (dict) payload without items and skipped resource types
+    """
+    payload = {}
+    for key in stream.iterkeys():
+        if key == 'items' and stream.peek() == '[':
+            for task in stream.iterarray():
+                onitem(task)
+        elif key not in RESOURCE_TYPES and stream.peek() == '[':
+            for _ in stream.iterarray():
+                pass
+        else:
+            payload[key] = stream.value()
+    if stream.peek():
+        raise ValueError("Unexpected data after the payload")
+    return payload
+
+
+def projecttask(data) -> dict:
+    """
+    Returns the fields of given task taskbutler reads
+
+    :param data: (dict) task of a sync payload
+    :return: dict
+    """
+    return {field: data.get(field, default) for field, default in ITEM_FIELDS}
+
+
+class compactTodoistAPI(TodoistAPI):
+    """
+    todoist-python client that keeps only active tasks (with the fields in ITEM_FIELDS) and labels.
+    Sync responses and cache files are parsed as a stream, so peak memory follows the active tasks
+    instead of the whole account history. Tasks are merged by ID instead of a linear search.
+    """
+
+    def reset_state(self):
+        super().reset_state()
+        self.itemsbyid = {}
+
+    def updateitem(self, data) -> dict:
+        """
+        Merges one task of a sync payload into the state. Deleted and archived tasks are removed
+
+        :param data: (dict) task of a sync payload
+        :return: (dict) projected task
+        """
+        task = projecttask(data)
+        model = self.itemsbyid.get(task['id'])
+        if task['is_deleted'] or task['is_archived']:
+            if model is not None:
+                self.state['items'].remove(model)
+                del self.itemsbyid[task['id']]
+        elif model is not None:
+            model.data.update(task)
+        else:
+            model = models.Item(task, self)
+            self.state['items'].append(model)
+            self.itemsbyid[task['id']] = model
+        return task
+
+    def _update_state(self, syncdata):
+        if 'items' in syncdata:
+            syncdata = dict(syncdata)
+            for data in syncdata.pop('items'):
+                self.updateitem(data)
+        super()._update_state(syncdata)
+
+    def _replace_temp_id(self, temp_id, new_id):
+        super()._replace_temp_id(temp_id, new_id)
+        self.itemsbyid = {model['id']: model for model in self.state['items']}
+
+    def _read_cache(self):
+        if not self.cache:
+            return
+        os.makedirs(self.cache, exist_ok=True)
+
+        try:
+            with open(self.cache + self.token + ".json", 'r', encoding='utf-8') as f:
+                payload = readpayload(jsonStream(iter(lambda: f.read(CHUNK_SIZE), "")), self.updateitem)
+            super()._update_state(payload)
+            with open(self.cache + self.token + ".sync", 'r', encoding='utf-8') as f:
+                self.sync_token = f.read()
+        except FileNotFoundError:
+            logger.debug("No todoist cache found. Full sync")
+        except (OSError, ValueError) as error:
+            logger.warning("Todoist cache unreadable. Full sync. Original: {}".format(error))
+            self.reset_state()
+
+    def _write_cache(self):
+        if not self.cache:
+            return
+        # json.dump encodes chunk by chunk -> no copy of the whole state as one string
+        for suffix, write in ((".json", lambda f: json.dump(self.state, f, default=state_default)),
+                              (".sync", lambda f: f.write(self.sync_token))):
+            path = self.cache + self.token + suffix
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                write(f)
+            os.replace(path + ".tmp", path)
+
+    def sync(self, commands=None):
+        """
+        Sends commands and merges the response into the state while it is downloaded.
+        Only items and labels are requested.
+
+        :param commands: (list) Sync API commands
+        :return: (dict) response. Its items are projected tasks, including deleted and archived tasks
+        """
+        post_data = {
+            'token': self.token,
+            'sync_token': self.sync_token,
+            'day_orders_timestamp': self.state['day_orders_timestamp'],
+            'include_notification_settings': 1,
+            'resource_types': json_dumps(list(RESOURCE_TYPES)),
+            'commands': json_dumps(commands or []),
+        }
+        response = self.session.post(self.get_api_url() + 'sync', data=post_data, stream=True)
+        if 'json' not in response.headers.get('Content-Type', ''):
+            return response.text
+
+        items = []
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        chunks = (decoder.decode(chunk) for chunk in response.iter_content(CHUNK_SIZE))
+        try:
+            payload = readpayload(jsonStream(chunks), lambda data: items.append(self.updateitem(data)))
+        finally:
+            response.close()
+
+        # error payloads (rate limit, rejected token) leave state and cache as they are
+        if not issyncresponse(payload):
+            return payload
+
+        # taskbutler creates no tasks - temp IDs are replaced after the items are merged
+        for temp_id, new_id in payload.get('temp_id_mapping', {}).items():
+            self.temp_ids[temp_id] = new_id
+            self._replace_temp_id(temp_id, new_id)
+        super()._update_state(payload)
+        self._write_cache()
+        payload['items'] = items
+        return payload
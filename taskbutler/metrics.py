@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Metrics of taskbutler runs - phase timings, API calls and processed items, exported as JSON or Prometheus textfile."""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('todoist')
+
+METRICS_FORMATS = ('json', 'prometheus')
+
+
+class runMetrics:
+    """
+    Collects the metrics of one run. Thread safe - API calls of parallel features are recorded too.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drops all collected metrics. Called after every export
+
+        :return: None
+        """
+        with self.lock:
+            self.started = time.time()
+            self.phases = {}
+            self.calls = {}
+            self.items = {}
+            self.success = True
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the wall time of the with block. A repeated phase adds up
+
+        :param name: (str) name of the phase, e.g. sync
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.addphase(name, time.monotonic() - started)
+
+    def addphase(self, name, seconds):
+        """
+        Adds seconds to the wall time of a phase
+
+        :param name: (str) name of the phase
+        :param seconds: (float) wall time
+        :return: None
+        """
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def recordcall(self, service, endpoint, seconds, error=False, retry=False):
+        """
+        Records one API call
+
+        :param service: (str) todoist, dropbox or github
+        :param endpoint: (str) path of the called url
+        :param seconds: (float) latency
+        :param error: (bool) call failed or returned an error status
+        :param retry: (bool) call is a retry of a failed call
+        :return: None
+        """
+        with self.lock:
+            call = self.calls.setdefault((service, endpoint), {'count': 0, 'errors': 0, 'retries': 0, 'seconds': 0.0, 'max': 0.0})
+            call['count'] += 1
+            call['errors'] += int(error)
+            call['retries'] += int(retry)
+            call['seconds'] += seconds
+            call['max'] = max(call['max'], seconds)
+
+    def countitems(self, feature, scanned=0, updated=0):
+        """
+        Adds scanned and updated tasks of a feature
+
+        :param feature: (str) name of the feature
+        :param scanned: (int) tasks looked at
+        :param updated: (int) tasks changed
+        :return: None
+        """
+        with self.lock:
+            items = self.items.setdefault(feature, {'scanned': 0, 'updated': 0})
+            items['scanned'] += scanned
+            items['updated'] += updated
+
+    def todict(self) -> dict:
+        """
+        Returns all metrics as JSON serializable dict
+
+        :return: dict
+        """
+        with self.lock:
+            return {
+                'timestamp': self.started,
+                'success': self.success,
+                'phases': dict(self.phases),
+                'calls': [dict(service=service, endpoint=endpoint, **call) for (service, endpoint), call in sorted(self.calls.items())],
+                'items': {feature: dict(items) for feature, items in self.items.items()},
+            }
+
+    def toprometheus(self) -> str:
+        """
+        Returns all metrics in the Prometheus text format
+
+        :return: str
+        """
+        data = self.todict()
+        lines = []
+
+        def metric(name, help, samples):
+            lines.append("# HELP taskbutler_{} {}".format(name, help))
+            lines.append("# TYPE taskbutler_{} gauge".format(name))
+            for labels, value in samples:
+                labeltext = ",".join('{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"')) for key, label in labels)
+                lines.append("taskbutler_{}{} {}".format(name, "{" + labeltext + "}" if labeltext else "", value))
+
+        metric('last_run_timestamp_seconds', "Start of the last run", [((), data['timestamp'])])
+        metric('last_run_success', "1 if the last run finished without error", [((), int(data['success']))])
+        metric('phase_seconds', "Wall time per phase of the last run", [((('phase', name),), seconds) for name, seconds in data['phases'].items()])
+        for name, field, help in (('api_calls', 'count', "API calls of the last run"),
+                                  ('api_errors', 'errors', "Failed API calls of the last run"),
+                                  ('api_retries', 'retries', "Retried API calls of the last run"),
+                                  ('api_call_seconds', 'seconds', "Summed up latency of API calls of the last run"),
+                                  ('api_call_seconds_max', 'max', "Slowest API call of the last run")):
+            metric(name, help, [((('service', call['service']), ('endpoint', call['endpoint'])), call[field]) for call in data['calls']])
+        for field in ('scanned', 'updated'):
+            metric('items_{}'.format(field), "Tasks {} per feature in the last run".format(field),
+                   [((('feature', feature),), items[field]) for feature, items in data['items'].items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, format='json'):
+        """
+        Writes all metrics to path. Replaces the file atomically, as required by the Prometheus textfile collector
+
+        :param path: (str) file to write
+        :param format: (str) json or prometheus
+        :return: None
+        """
+        if format not in METRICS_FORMATS:
+            raise ValueError("Unknown metrics format: {}".format(format))
+        content = self.toprometheus() if format == 'prometheus' else json.dumps(self.todict(), indent=2) + "\n"
+        temp = path + ".tmp"
+        with open(temp, 'w') as f:
+            f.write(content)
+        os.replace(temp, path)
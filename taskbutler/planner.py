@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Plan and apply mode of taskbutler - compute all changes of a run once, write them later at a controlled rate."""
+
+import json
+import logging
+import os
+import time
+
+from .state import stateIndex
+from .sync import updateQueue, COMMAND_LIMIT
+
+logger = logging.getLogger('todoist')
+
+PLAN_VERSION = 1
+
+
+class changePlan:
+    """
+    Title updates and artifacts of one run, computed from one state snapshot. Stored as compact json.
+
+    updates: [task ID, field, value before, value after]
+    artifacts: [feature, task ID, title of the artifact, task title its link gets added to]
+    """
+
+    def __init__(self, updates=(), artifacts=(), sync_token=None, created=None):
+        self.updates = [list(update) for update in updates]
+        self.artifacts = [list(artifact) for artifact in artifacts]
+        self.sync_token = sync_token
+        self.created = time.time() if created is None else created
+
+    def __len__(self):
+        return len(self.updates) + len(self.artifacts)
+
+    @classmethod
+    def fromrun(cls, queue, features, sync_token=None):
+        """
+        Returns plan of a dryrun
+
+        :param queue: (updateQueue) uncommitted updates of the run
+        :param features: (list) feature instances of the run
+        :param sync_token: (str) sync token of the state snapshot
+        :return: changePlan
+        """
+        updates = [[task_id, field, queue.original[task_id][field], value]
+                   for task_id, fields in queue.updates.items() for field, value in fields.items()]
+        artifacts = [list(artifact) for instance in features for artifact in instance.planned]
+        return cls(updates, artifacts, sync_token)
+
+    @classmethod
+    def read(cls, path):
+        """
+        Reads plan written by write()
+
+        :param path: (str) plan file
+        :return: changePlan
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != PLAN_VERSION:
+            raise ValueError("Unsupported plan version: {}".format(data.get('version') if isinstance(data, dict) else None))
+        try:
+            return cls(data['updates'], data['artifacts'], data.get('sync_token'), data['created'])
+        except KeyError as error:
+            raise ValueError("Incomplete plan. Missing: {}".format(error))
+
+    def todict(self) -> dict:
+        """
+        Returns plan as JSON serializable dict
+
+        :return: dict
+        """
+        return {'version': PLAN_VERSION, 'created': self.created, 'sync_token': self.sync_token,
+                'updates': self.updates, 'artifacts': self.artifacts}
+
+    def write(self, path):
+        """
+        Writes plan to path. Replaces the file atomically
+
+        :param path: (str) plan file
+        :return: None
+        """
+        temp = path + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.todict(), f, ensure_ascii=False, separators=(',', ':'))
+            f.write("\n")
+        os.replace(temp, path)
+
+
+def commitbatch(queue, updates, retries=3, backoff=1.0, sleep=time.sleep) -> list:
+    """
+    Commits updates in one request. Failed commands are retried with exponential backoff
+
+    :param queue: (updateQueue) empty queue
+    :param updates: (list) (task, fields) tuples, at most queue.limit
+    :param retries: (int) retries of failed commands
+    :param backoff: (float) seconds before the first retry, doubled every retry
+    :param sleep: callable, waits given seconds
+    :return: (list) (task, fields) tuples that still failed
+    """
+    for attempt in range(retries + 1):
+        for task, fields in updates:
+            queue.update(task, **fields)
+        status = queue.commit()
+        updates = [(task, fields) for task, fields in updates if status.get(task['id']) != "ok"]
+        if not updates or attempt == retries:
+            break
+        logger.warning("{} updates failed. Retry {} of {} in {}s".format(len(updates), attempt + 1, retries, backoff * 2 ** attempt))
+        sleep(backoff * 2 ** attempt)
+    return updates
+
+
+def applyplan(plan, api, features, batch=COMMAND_LIMIT, delay=0.0, retries=3, fingerprints=None, changed=None, sleep=time.sleep) -> dict:
+    """
+    Applies plan to the current state in batches of batch commands, waiting delay seconds between requests.
+    Every entry is checked against the current state first, so applying a plan twice changes nothing:
+    an update is skipped if the task already has the new value and counted as stale if the task changed since the plan.
+    Artifacts are only created for tasks that still have the planned title and no link.
+
+    :param plan: (changePlan) plan to apply
+    :param api: (obj) todoist api, synced
+    :param features: (dict) feature name -> artifactFeature instance
+    :param batch: (int) commands per request
+    :param delay: (float) seconds between two requests
+    :param retries: (int) retries of failed commands
+    :param fingerprints: (fingerprintStore) remembers the applied updates. None -> not tracked
+    :param changed: (set) collects IDs of tasks changed in todoist while applying, and their ancestors. Needs fingerprints
+    :param sleep: callable, waits given seconds
+    :return: (dict) number of applied, skipped, stale and failed entries
+    """
+    queue = updateQueue(api, limit=batch)
+    counts = {'applied': 0, 'skipped': 0, 'stale': 0, 'failed': 0}
+    requests = []
+
+    def commit(updates):
+        if requests and delay:
+            sleep(delay)
+        requests.append(len(updates))
+        failed = commitbatch(queue, updates, retries=retries, sleep=sleep)
+        counts['applied'] += len(updates) - len(failed)
+        counts['failed'] += len(failed)
+        if fingerprints is not None:
+            failedids = {task['id'] for task, fields in failed}
+            fingerprints.remember(task for task, fields in updates if task['id'] not in failedids)
+            # every commit syncs with the current token - its delta holds the tasks changed while applying
+            items = [item for response in queue.responses if isinstance(response, dict) for item in response.get('items', [])]
+            queue.responses = []
+            if items:
+                dirty = fingerprints.observe(items, stateIndex(api))
+                if changed is not None:
+                    changed.update(dirty)
+
+    # title updates
+    index = stateIndex(api)
+    pending = {}
+    for task_id, field, before, after in plan.updates:
+        task = index.getitem(task_id)
+        if task is not None and task[field] == after:
+            counts['skipped'] += 1
+        elif task is None or task[field] != before:
+            logger.warning("Task {} changed since the plan. Skipping update of {}".format(task_id, field))
+            counts['stale'] += 1
+        else:
+            pending.setdefault(task_id, (task, {}))[1][field] = after
+    pending = list(pending.values())
+    for start in range(0, len(pending), batch):
+        commit(pending[start:start + batch])
+
+    # artifacts - created batch by batch, so an interrupted apply leaves at most one batch without link
+    index = stateIndex(api)
+    planned = {}
+    for name, task_id, title, content in plan.artifacts:
+        task = index.getitem(task_id)
+        if task is not None and "https://" in task['content']:
+            counts['skipped'] += 1
+        elif task is None or task['content'] != content or name not in features:
+            logger.warning("Task {} changed since the plan or {} is disabled. Skipping artifact".format(task_id, name))
+            counts['stale'] += 1
+        else:
+            planned.setdefault(name, []).append((task, title))
+    for name, artifacts in planned.items():
+        instance = features[name]
+        for start in range(0, len(artifacts), batch):
+            chunk = artifacts[start:start + batch]
+            urls = instance.create([title for task, title in chunk])
+            commit([(task, {'content': instance.link(task['content'], url)}) for (task, title), url in zip(chunk, urls)])
+
+    logger.info("Plan applied in {} requests. Applied: {applied}, already applied: {skipped}, stale: {stale}, failed: {failed}".format(
+        len(requests), **counts))
+    return counts
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Lookup tables for the todoist state of taskbutler."""
+
+import json
+import logging
+
+logger = logging.getLogger('todoist')
+
+
+class taskRecord:
+    """
+    Compact copy of the task fields taskbutler reads. Deleted and archived tasks get no record.
+    Fields are attributes - task['content'] works too, so records and todoist tasks are interchangeable.
+    Setting a field only changes the record. Changes reach todoist through updateQueue.
+    """
+
+    __slots__ = ('id', 'parent_id', 'content', 'labels', 'checked', 'in_history')
+
+    # fields of todoist tasks without a slot - always 0 for a record
+    inactive = ('is_deleted', 'is_archived')
+
+    def __init__(self, id, parent_id, content, labels, checked, in_history):
+        self.id = id
+        self.parent_id = parent_id
+        self.content = content
+        self.labels = labels
+        self.checked = checked
+        self.in_history = in_history
+
+    @classmethod
+    def fromtask(cls, task):
+        """
+        Returns record of given todoist task
+
+        :param task: todoist task
+        :return: taskRecord
+        """
+        data = task.data if hasattr(task, 'data') else task
+        return cls(data['id'], data.get('parent_id'), data.get('content', ""), tuple(data.get('labels') or ()),
+                   int(bool(data.get('checked'))), int(bool(data.get('in_history'))))
+
+    def __getitem__(self, key):
+        if key in self.inactive:
+            return 0
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ or key in self.inactive
+
+    def todict(self) -> dict:
+        """
+        Returns fields of the record as todoist task dict
+
+        :return: dict
+        """
+        return {'id': self.id, 'parent_id': self.parent_id, 'content': self.content, 'labels': list(self.labels),
+                'checked': self.checked, 'in_history': self.in_history, 'is_deleted': 0}
+
+
+class stateIndex:
+    """
+    Indexes of one todoist sync. Built in a single pass over api.state - rebuild after every api.sync()
+    Holds a taskRecord per task. Deleted and archived tasks are left out.
+
+    labels: label name -> label ID
+    labelled: label ID -> IDs of active tasks with this label
+    items: task ID -> taskRecord
+    children: parent ID -> child taskRecords (completed tasks included)
+    """
+
+    def __init__(self, api):
+        self.labels = {}
+        self.labelled = {}
+        self.items = {}
+        self.children = {}
+
+        for label in api.state['labels']:
+            # first label wins - same as a linear search
+            self.labels.setdefault(label['name'], label['id'])
+
+        for task in api.state['items']:
+            data = task.data if hasattr(task, 'data') else task
+            if data.get('is_deleted') or data.get('is_archived'):
+                continue
+            record = taskRecord.fromtask(data)
+            self.items[record.id] = record
+            if record.parent_id:
+                self.children.setdefault(record.parent_id, []).append(record)
+            if record.labels and not record.in_history and not isinstance(record.id, str):
+                for label in record.labels:
+                    self.labelled.setdefault(label, []).append(record.id)
+
+    def getlabelid(self, labelname: str):
+        """
+        Returns ID of given labelname
+
+        :param labelname: (str) Name of label to search for
+        :return: ID of labelname
+        """
+        if labelname not in self.labels:
+            logger.error("Label not found in Todoist. Skipped!")
+            raise ValueError('Label not found in Todoist. Skipped!')
+        logger.debug("ID for label: {} found! ID: {}".format(labelname, self.labels[labelname]))
+        return self.labels[labelname]
+
+    def gettaskswithlabelid(self, labelid) -> list:
+        """
+        Returns a list of IDs of active tasks with given label-ID
+
+        :param labelid: label ID of label to search for
+        :return: (list) found Task IDs
+        """
+        return list(self.labelled.get(labelid, []))
+
+    def getitem(self, taskid):
+        """
+        Returns task for given ID or None if unknown, deleted or archived
+
+        :param taskid: task ID
+        :return: taskRecord
+        """
+        return self.items.get(taskid)
+
+    def getchildren(self, taskid) -> list:
+        """
+        Returns the not deleted and not archived child tasks of given task ID
+
+        :param taskid: task ID of the parent
+        :return: (list) child taskRecords
+        """
+        return self.children.get(taskid, [])
+
+
+def fingerprint(task) -> list:
+    """
+    Returns fingerprint of the task fields taskbutler reads (content, checked, parent, labels, flags)
+
+    :param task: todoist task
+    :return: (list) fingerprint
+    """
+    flags = [task[flag] if flag in task else 0 for flag in ('checked', 'is_deleted', 'in_history', 'is_archived')]
+    return [task['content'], task['parent_id'], sorted(task['labels'] or [])] + [int(bool(flag)) for flag in flags]
+
+
+class fingerprintStore:
+    """
+    Fingerprints of all tasks from the last run. Stored as json between runs.
+    Compared with the tasks of a sync delta to find the tasks (and their ancestors) to recompute.
+    """
+
+    def __init__(self, path, settings=''):
+        self.path = path
+        self.settings = settings
+        self.fingerprints = {}
+        self.pending = set()
+        self.complete = False
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data['complete'] and data['settings'] == settings:
+                self.fingerprints = {task_id: taskfingerprint for task_id, taskfingerprint in data['items']}
+                self.pending = set(data['pending'])
+                self.complete = True
+            else:
+                logger.debug("Stored fingerprints outdated. Recompute all tasks")
+        except FileNotFoundError:
+            logger.debug("No stored fingerprints found. Recompute all tasks")
+        except (ValueError, KeyError, TypeError) as error:
+            logger.warning("Stored fingerprints unreadable. Recompute all tasks. Original: {}".format(error))
+
+    def getdirty(self, response, index):
+        """
+        Returns IDs of tasks to recompute: changed tasks of the sync delta, their ancestors and tasks left over from
+        the last run. None if all tasks have to be recomputed (first run, full sync or changed settings)
+
+        :param response: (dict) response of the sync
+        :param index: (stateIndex) index of the current sync
+        :return: (set) task IDs or None
+        """
+        if not self.complete or response.get('full_sync'):
+            self.fingerprints = {task_id: fingerprint(task) for task_id, task in index.items.items()}
+            self.complete = True
+            return None
+        dirty = self.observe(response.get('items', []), index)
+        dirty |= self.pending
+        logger.debug("Tasks to recompute: {}".format(len(dirty)))
+        return dirty
+
+    def observe(self, items, index) -> set:
+        """
+        Updates fingerprints with given tasks of a sync delta and returns the IDs of changed tasks and their ancestors
+
+        :param items: (list) tasks of a sync delta
+        :param index: (stateIndex) index to look up ancestors
+        :return: (set) task IDs
+        """
+        dirty = set()
+        for task in items:
+            old = self.fingerprints.get(task['id'])
+            new = fingerprint(task)
+            if old == new:
+                continue
+            dirty.add(task['id'])
+
+            # old and new parent chain
+            for parent_id in {new[1], old[1] if old else None}:
+                while parent_id and parent_id not in dirty:
+                    dirty.add(parent_id)
+                    parent = index.getitem(parent_id)
+                    parent_id = parent['parent_id'] if parent else None
+
+            if task['is_deleted']:
+                self.fingerprints.pop(task['id'], None)
+            else:
+                self.fingerprints[task['id']] = new
+        return dirty
+
+    def remember(self, tasks):
+        """
+        Stores fingerprint of given (locally changed) tasks - the sync echo of own changes isn't a change then
+
+        :param tasks: todoist tasks
+        :return: None
+        """
+        for task in tasks:
+            self.fingerprints[task['id']] = fingerprint(task)
+
+    def checkpoint(self, dirty, index):
+        """
+        Writes given tasks as pending before they get recomputed. The sync token of their delta is already stored,
+        so a run that aborts before save() still recomputes them next run
+
+        :param dirty: (set) task IDs to recompute. None -> all tasks
+        :param index: (stateIndex) index of the current sync
+        :return: None
+        """
+        self.save(set(index.items) if dirty is None else dirty)
+
+    def save(self, pending=()):
+        """
+        Writes fingerprints to disk
+
+        :param pending: task IDs to recompute next run. None -> recompute all tasks next run
+        :return: None
+        """
+        if pending is None:
+            self.complete = False
+        self.pending = set(pending or [])
+        data = {
+            'settings': self.settings,
+            'complete': self.complete,
+            'pending': sorted(self.pending),
+            'items': [[task_id, taskfingerprint] for task_id, taskfingerprint in self.fingerprints.items()],
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
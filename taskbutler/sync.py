@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Batched todoist Sync API commands for taskbutler."""
+
+import logging
+
+logger = logging.getLogger('todoist')
+
+# Todoist accepts up to 100 commands per sync request
+COMMAND_LIMIT = 100
+
+# error_tag of a rejected sync token
+INVALID_SYNC_TOKEN = 'INVALID_SYNC_TOKEN'
+
+
+def synctodoist(api, fullsync=False):
+    """
+    Syncs todoist state. Uses the sync token of the last run (stored in the api cache) to fetch only the changes.
+    Falls back to a full sync only if the stored sync token gets rejected. Other errors (rate limit, server or
+    auth errors) keep the stored state and raise.
+
+    :param api: (obj) todoist api
+    :param fullsync: (bool) ignore the stored state and sync token - download the whole account
+    :return: (dict) sync response
+    """
+    if fullsync:
+        logger.info("Full sync forced. Ignoring stored sync token")
+        api.reset_state()
+
+    incremental = api.sync_token != '*'
+    logger.debug("Sync type: {}".format("incremental" if incremental else "full"))
+    response = api.sync()
+
+    if incremental and isinvalidtoken(response):
+        logger.warning("Stored sync token rejected. Fallback to full sync. Original: {}".format(response))
+        api.reset_state()
+        response = api.sync()
+
+    if not issyncresponse(response):
+        raise ValueError('Sync error: {}'.format(response))
+    return response
+
+
+def isinvalidtoken(response) -> bool:
+    """
+    Returns True if response is the error todoist sends for an invalid or expired sync token
+
+    :param response: response of api.sync()
+    :return: bool
+    """
+    return isinstance(response, dict) and response.get('error_tag') == INVALID_SYNC_TOKEN
+
+
+def issyncresponse(response) -> bool:
+    """
+    Returns True if response is a valid Sync API response (and not an error)
+
+    :param response: response of api.sync()
+    :return: bool
+    """
+    return isinstance(response, dict) and 'error' not in response and 'sync_token' in response
+
+
+class updateQueue:
+    """
+    Collects all item updates of one run and sends them as batched Sync API commands.
+    Changes are applied to the local task right away, so later passes see the new titles.
+    Several updates of the same task are merged into one command.
+    The values before the first update are kept in self.original until the commit.
+    The sync responses of all commits are kept in self.responses.
+    """
+
+    def __init__(self, api, limit=COMMAND_LIMIT):
+        self.api = api
+        self.limit = limit
+        self.updates = {}
+        self.original = {}
+        self.responses = []
+
+    def __len__(self):
+        return len(self.updates)
+
+    def update(self, task, **kwargs):
+        """
+        Queue update of given task
+
+        :param task: todoist task
+        :param kwargs: fields to update, e.g. content
+        :return: None
+        """
+        original = self.original.setdefault(task['id'], {})
+        for field, value in kwargs.items():
+            original.setdefault(field, task[field])
+            task[field] = value
+        self.updates.setdefault(task['id'], {}).update(kwargs)
+
+    def commands(self) -> list:
+        """
+        Returns the queued updates as Sync API commands
+
+        :return: (list) item_update commands
+        """
+        commands = []
+        for task_id, fields in self.updates.items():
+            args = {'id': task_id}
+            args.update(fields)
+            commands.append({'type': 'item_update', 'uuid': self.api.generate_uuid(), 'args': args})
+        return commands
+
+    def commit(self) -> dict:
+        """
+        Sends all queued updates in chunks of at most self.limit commands per request
+
+        :return: (dict) task ID -> "ok" or the error returned for its command
+        """
+        status = {}
+        commands = self.commands()
+        self.updates = {}
+        self.original = {}
+        for start in range(0, len(commands), self.limit):
+            chunk = commands[start:start + self.limit]
+            response = self.api.sync(commands=chunk)
+            self.responses.append(response)
+            if isinstance(response, dict) and 'sync_status' in response:
+                sync_status = response['sync_status']
+            else:
+                logger.error("Sync request failed: {}".format(response))
+                sync_status = {}
+            for command in chunk:
+                status[command['args']['id']] = sync_status.get(command['uuid'], "no status returned")
+
+        failed = {task_id: result for task_id, result in status.items() if result != "ok"}
+        for task_id, result in failed.items():
+            logger.error("Update of task {} failed: {}".format(task_id, result))
+        logger.info("Committed {} updates in {} requests. Failed: {}".format(
+            len(commands), -(-len(commands) // self.limit), len(failed)))
+        return status
@@ -2,27 +2,44 @@
 # -*- coding: utf-8 -*-
 
 import codecs
+import contextvars
+import hashlib
+from contextlib import contextmanager
+import threading
+import time
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 import logging.handlers
 from configparser import ConfigParser
 
-import dropbox
-import requests
-from dropbox.exceptions import ApiError, AuthError
-from dropbox.files import WriteMode
-from dropbox.paper import ImportFormat, PaperDocCreateError, SharingPublicPolicyType, SharingPolicy
-
-from todoist.api import TodoistAPI
+# dropbox, requests and todoist get imported where they are used - startup stays fast if a feature is disabled
 import os
 import shutil
-import re
+from decimal import Decimal
 
 from .config import staticConfig, getConfigPaths
+from .state import stateIndex, fingerprintStore
+from .sync import updateQueue, synctodoist, COMMAND_LIMIT
+from .metrics import runMetrics
+from .features import feature, artifactFeature, updateIntent, artifactIntent
+from .titles import titleCodec
 
 logger = logging.getLogger('todoist')
 loggerdb = logging.getLogger('dropbox')
 loggerdg = logging.getLogger('github')
 
+# Dropbox content hash block size and max. entries of a copy batch
+DROPBOX_HASH_BLOCK = 4 * 1024 * 1024
+DROPBOX_BATCH_LIMIT = 1000
+
+# Update check: seconds the latest release is cached and max. seconds to wait for github
+UPDATE_CHECK_TTL = 24 * 60 * 60
+UPDATE_CHECK_TIMEOUT = 5
+
+# Fields taskbutler reads - webhooks of new tasks may not send all of them
+WEBHOOK_TASK_DEFAULTS = {'content': "", 'parent_id': None, 'labels': [], 'checked': 0, 'is_deleted': 0, 'in_history': 0}
+
 
 def localizePrice(value, currency) -> str:
     """
@@ -32,15 +49,7 @@ def localizePrice(value, currency) -> str:
     :return: str
     """
 
-    price = str(value)
-    if currency == '€':
-        seperator = ','
-        price = re.sub("[.]", seperator, price)
-    else:
-        seperator = '.'
-        price = re.sub(',', seperator, price)
-
-    return price + currency
+    return titleCodec(currency=currency).localize(value)
 
 
 def getRawPriceFromGrocery(title, grocery_currency, grocery_seperator, isTitle=True) -> float:
@@ -71,65 +80,201 @@ def getRawPriceFromGrocery(title, grocery_currency, grocery_seperator, isTitle=T
     return value_raw
 
 
-def createdropboxfile(title, dbx, templatefile, dropbox_prepart_files, folder) -> str:
+def getdropboxcontenthash(data) -> str:
     """
-    Creates new dropbox file with given name. Returns a office online URL
-    Requires a authorized dropbox -> office365 connection
+    Returns the dropbox content hash: sha256 of the concatenated sha256 of every 4MB block
+    https://www.dropbox.com/developers/reference/content-hash
+
+    :param data: (bytes) file content
+    :return: (str) hex digest
+    """
+    blockhashes = b''.join(hashlib.sha256(data[start:start + DROPBOX_HASH_BLOCK]).digest()
+                           for start in range(0, len(data), DROPBOX_HASH_BLOCK))
+    return hashlib.sha256(blockhashes).hexdigest()
+
+
+def uploadtemplate(dbx, templatefile, templatefolder) -> str:
+    """
+    Uploads template file to dropbox once. Uploads again only if the content hash changed.
 
-    :param folder: folder in dropbox. Relativ from /
-    :type dropbox_prepart_files: object URL pre-part to create dropbox/office365 url
-    :param title: (str) Title of the newly created file (special characters will get stripped)
-    :param templatefile: (str) Path to template file
     :param dbx: dropbox api object
-    :return: office online URL
+    :param templatefile: (str) Path to template file
+    :param templatefolder: (str) folder in dropbox to keep the template in. Relativ from /
+    :return: (str) dropbox path of the template
     """
-    # https://github.com/dropbox/dropbox-sdk-python/blob/master/example/back-up-and-restore/backup-and-restore-example.py
-    # https://github.com/dropbox/dropbox-sdk-python/blob/master/example/updown.py
+    from dropbox.exceptions import ApiError
+    from dropbox.files import WriteMode
 
-    filename = title
+    with open('./' + templatefile, 'rb') as f:
+        data = f.read()
+    templatepath = '/' + templatefolder.strip('/') + '/' + os.path.basename(templatefile)
+    contenthash = getdropboxcontenthash(data)
 
-    # Strip special characters
-    # #https://stackoverflow.com/questions/5843518/remove-all-special-characters-punctuation-and-spaces-from-string
-    filename = ''.join(e for e in filename if e.isalnum())
-    loggerdb.debug("Filename for new Dropbox file: {}".format(filename))
+    try:
+        metadata = dbx.files_get_metadata(templatepath)
+        if getattr(metadata, 'content_hash', None) == contenthash:
+            loggerdb.debug("Template up-to-date: {}".format(templatepath))
+            return templatepath
+    except ApiError as err:
+        if not (err.error.is_path() and err.error.get_path().is_not_found()):
+            loggerdb.error("Something went wrong: {}".format(err))
+            raise SystemExit(1)
 
-    # Check for duplicate filenames and rename new file
-    # Renaming breaks connection between task <-> file!
-    # Task doesn't know about renaming. Deleting file when task is completet is impossible.
     try:
-        searchresult = dbx.files_search('/' + folder, filename, start=0, max_results=1,
-                                        mode=dropbox.files.SearchMode('filename', None))
-        if not searchresult.matches:
-            loggerdb.debug("No duplicate filename found")
-        else:
-            filename = filename + "1"
-            loggerdb.debug("Duplicate filename found. Renaming {} to {}".format(title, filename))
+        dbx.files_upload(data, templatepath, mode=WriteMode.overwrite)
+        loggerdb.info("Uploaded template to: {}".format(templatepath))
     except ApiError as err:
-        loggerdb.error(
-            "Probably folder is not existent. Create folder:{} manually. Original: {}".format(folder, err.error))
+        loggerdb.error("Something went wrong: {}".format(err))
         raise SystemExit(1)
+    return templatepath
 
-    # Seperate filename - filetype
-    filetype = templatefile.rsplit(".", 1)[1]
-    loggerdb.debug("Filetype: {}".format(filetype))
 
-    # Upload file to dropbox and create link
-    with open('./' + templatefile, 'rb') as f:
-        try:
-            # Dropbox Api doesn't rename if Content is the same
-            # https://www.dropboxforum.com/t5/API-Support-Feedback/Cannot-auto-rename-file/td-p/234640
-            debugnote = dbx.files_upload(f.read(), '/' + folder + '/' + filename + '.' + filetype,
-                                         mode=dropbox.files.WriteMode.add, autorename=False)
-            loggerdb.debug("{}".format(debugnote))
+def copydropboxfiles(dbx, entries):
+    """
+    Copies files server side in batches. Waits until every batch is done.
 
-            todoist_dropboxfile_url = dropbox_prepart_files + folder + '/' + filename + '.' + filetype + '?force_role=personal'
-            loggerdb.debug("URL for new Dropbox file: {}".format(todoist_dropboxfile_url))
-            return todoist_dropboxfile_url
+    :param dbx: dropbox api object
+    :param entries: (list) RelocationPath from template to new file
+    :return: None
+    """
+    from dropbox.exceptions import ApiError
 
-        except Exception as err:
+    for start in range(0, len(entries), DROPBOX_BATCH_LIMIT):
+        chunk = entries[start:start + DROPBOX_BATCH_LIMIT]
+        try:
+            launch = dbx.files_copy_batch_v2(chunk, autorename=False)
+            if launch.is_async_job_id():
+                status = dbx.files_copy_batch_check_v2(launch.get_async_job_id())
+                while status.is_in_progress():
+                    time.sleep(1)
+                    status = dbx.files_copy_batch_check_v2(launch.get_async_job_id())
+                result = status.get_complete()
+            else:
+                result = launch.get_complete()
+        except ApiError as err:
             loggerdb.error("Something went wrong: {}".format(err))
             raise SystemExit(1)
 
+        for entry, relocation in zip(result.entries, chunk):
+            if not entry.is_success():
+                loggerdb.error("Copy to {} failed: {}".format(relocation.to_path, entry))
+                raise SystemExit(1)
+            loggerdb.debug("Created Dropbox file: {}".format(relocation.to_path))
+
+
+class dropboxFolder:
+    """
+    Names of all files in a dropbox folder. Listed once with files_list_folder,
+    then refreshed with the cursor - only changes get fetched.
+    """
+
+    def __init__(self, dbx, folder):
+        self.dbx = dbx
+        self.path = '/' + folder.strip('/')
+        self.names = set()
+        self.cursor = None
+
+    def refresh(self):
+        """
+        Fetches changes of the folder since the last refresh
+
+        :return: None
+        """
+        from dropbox.exceptions import ApiError
+
+        try:
+            if self.cursor is None:
+                result = self.dbx.files_list_folder(self.path)
+            else:
+                result = self.dbx.files_list_folder_continue(self.cursor)
+            self.apply(result.entries)
+            while result.has_more:
+                result = self.dbx.files_list_folder_continue(result.cursor)
+                self.apply(result.entries)
+            self.cursor = result.cursor
+        except ApiError as err:
+            if self.cursor is not None and getattr(err.error, 'is_reset', lambda: False)():
+                loggerdb.debug("Folder cursor expired. Listing folder again")
+                self.cursor = None
+                self.names = set()
+                self.refresh()
+                return
+            loggerdb.error(
+                "Probably folder is not existent. Create folder:{} manually. Original: {}".format(self.path, err.error))
+            raise SystemExit(1)
+
+    def apply(self, entries):
+        """
+        Adds/removes names of listed entries
+
+        :param entries: (list) metadata of files_list_folder
+        :return: None
+        """
+        from dropbox.files import DeletedMetadata
+
+        for entry in entries:
+            # dropbox file names are case insensitive
+            if isinstance(entry, DeletedMetadata):
+                self.names.discard(entry.name.lower())
+            else:
+                self.names.add(entry.name.lower())
+
+    def allocate(self, title, filetype) -> str:
+        """
+        Returns a free filename (without filetype) for title and reserves it.
+        Special characters get stripped, duplicates numbered: name, name1, name2, ...
+
+        :param title: (str) Title of the newly created file
+        :param filetype: (str) filetype without dot
+        :return: (str) filename
+        """
+        # Renaming breaks connection between task <-> file!
+        # Task doesn't know about renaming. Deleting file when task is completet is impossible.
+        filename = ''.join(e for e in title if e.isalnum())
+        candidate = filename
+        number = 0
+        while (candidate + '.' + filetype).lower() in self.names:
+            number = number + 1
+            candidate = filename + str(number)
+        if candidate != filename:
+            loggerdb.debug("Duplicate filename found. Renaming {} to {}".format(filename, candidate))
+        self.names.add((candidate + '.' + filetype).lower())
+        return candidate
+
+
+def createdropboxfiles(titles, dbx, templatefile, dropbox_prepart_files, folder, templatefolder, dropboxfolder=None) -> list:
+    """
+    Creates new dropbox files for all given titles. The template gets uploaded once and
+    copied server side - cost per file doesn't depend on the template size.
+
+    :param titles: (list) Titles of the newly created files
+    :param dbx: dropbox api object
+    :param templatefile: (str) Path to template file
+    :param dropbox_prepart_files: URL pre-part to create dropbox/office365 url
+    :param folder: folder in dropbox. Relativ from /
+    :param templatefolder: folder in dropbox to keep the template in. Relativ from /
+    :param dropboxfolder: (dropboxFolder) cached listing of folder. Kept between runs in daemon mode
+    :return: (list) office online URLs in order of titles
+    """
+    if not titles:
+        return []
+    from dropbox.files import RelocationPath
+
+    filetype = templatefile.rsplit(".", 1)[1]
+    templatepath = uploadtemplate(dbx, templatefile, templatefolder)
+
+    if dropboxfolder is None:
+        dropboxfolder = dropboxFolder(dbx, folder)
+    dropboxfolder.refresh()
+    filenames = [dropboxfolder.allocate(title, filetype) for title in titles]
+
+    copydropboxfiles(dbx, [RelocationPath(templatepath, '/' + folder + '/' + filename + '.' + filetype) for filename in filenames])
+
+    urls = [dropbox_prepart_files + folder + '/' + filename + '.' + filetype + '?force_role=personal' for filename in filenames]
+    for url in urls:
+        loggerdb.debug("URL for new Dropbox file: {}".format(url))
+    return urls
+
 
 def createpaperdocument(title, dbx, todoistfolderid, todoistpaperurl, sharing) -> str:
     """
@@ -142,6 +287,8 @@ def createpaperdocument(title, dbx, todoistfolderid, todoistpaperurl, sharing) -
     :param todoistpaperurl: (str) Dropbox paper URL pre-part to build full Link from. "this-part.com\"paperid
     :return: Full URL to created paper
     """
+    from dropbox.exceptions import ApiError
+    from dropbox.paper import ImportFormat, PaperDocCreateError, SharingPublicPolicyType, SharingPolicy
 
     content = title
     content_b = content.encode('UTF-8')
@@ -167,37 +314,103 @@ def createpaperdocument(title, dbx, todoistfolderid, todoistpaperurl, sharing) -
     return todoist_paper_url
 
 
-def gettodoistfolderid(foldername: str, dbx):
+def createpaperdocuments(titles, dbx, todoistfolderid, todoistpaperurl, sharing, concurrency=4) -> list:
+    """
+    Creates dropbox paper documents for all given titles on a pool of at most concurrency workers.
+    Each worker creates a document and sets its sharing policy while the others create theirs.
+
+    :param titles: (list) titles of the newly created documents
+    :param dbx: dropbox api object
+    :param todoistfolderid: (str) Folder ID of folder to save paper to
+    :param todoistpaperurl: (str) Dropbox paper URL pre-part to build full Link from
+    :param sharing: (str or bool) Wether to make paper public or not
+    :param concurrency: (int) max. number of documents created at the same time
+    :return: (list) Full URLs to created papers in order of titles
+    """
+    if not titles:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(titles)))) as executor:
+        context = contextvars.copy_context()
+        return list(executor.map(lambda title: context.copy().run(createpaperdocument, title, dbx, todoistfolderid, todoistpaperurl, sharing), titles))
+
+
+def gettodoistfolderid(foldername: str, dbx, cachefile=None, concurrency=8):
     """
 
     Dropbox - Get Folder ID of folder "todoist" from user account
     Note : only finds folder once a paper is created in. create test paper first.
+    Folder info of all papers is fetched concurrently and stops once the folder is found.
+    The folder of every checked paper gets cached in cachefile - later lookups only check new papers.
 
     :param foldername: foldername to look for
     :param dbx: dropbox object
+    :param cachefile: (str) json file to cache paper ID -> folder in. None -> no cache
+    :param concurrency: (int) max. number of concurrent folder info requests
     :return: folder ID for given name
     """
 
+    from dropbox.exceptions import ApiError
+
     loggerdb.debug("Lookup ID for paper folder: {}".format(foldername))
 
+    folders = {}
+    if cachefile:
+        try:
+            with open(cachefile, 'r', encoding='utf-8') as f:
+                folders = json.load(f)
+        except (OSError, ValueError):
+            folders = {}
+
+    def getfolder(doc_id):
+        folder_meta = dbx.paper_docs_get_folder_info(doc_id)
+        if folder_meta and folder_meta.folders:
+            return [folder_meta.folders[0].name, folder_meta.folders[0].id]
+        return None
+
+    def savecache():
+        if cachefile:
+            with open(cachefile, 'w', encoding='utf-8') as f:
+                json.dump(folders, f)
+
+    # Check cached papers of that folder first - they're probably still in there
+    for doc_id, folder in list(folders.items()):
+        if folder and folder[0] == foldername:
+            try:
+                folders[doc_id] = getfolder(doc_id)
+            except ApiError as err:
+                # paper was deleted or is no longer shared with us
+                loggerdb.debug("Cached paper {} not found, dropped from cache: {}".format(doc_id, err))
+                del folders[doc_id]
+                continue
+            if folders[doc_id] and folders[doc_id][0] == foldername:
+                loggerdb.debug("Paper folder set as todoist folder (cached): {}".format(folders[doc_id][1]))
+                savecache()
+                return folders[doc_id][1]
+
     paper = dbx.paper_docs_list()
-    todoist_folder_id = ""
+    doc_ids = list(paper.doc_ids)
     while paper.has_more:
-        paper += dbx.paper_docs_list_continue(paper)
-    for entry in paper.doc_ids:
-        folder_meta = dbx.paper_docs_get_folder_info(entry)
-
-        if folder_meta.folders:
-            # print(document_meta.title + "in Folder: " + folder_meta.folders[0].name + "id: " + folder_meta.folders[0].id)
-            # print("in Folder: " + folder_meta.folders[0].name + " id: " + folder_meta.folders[0].id)
-            if folder_meta.folders[0].name == foldername:
-                # print("id: " + folder_meta.folders[0].id)
-                todoist_folder_id = folder_meta.folders[0].id
-                loggerdb.debug("Paper folder set as todoist folder: {}".format(todoist_folder_id))
-                break
-            # print(folder_meta.folders[0].id)
-        # print(document_response)
+        paper = dbx.paper_docs_list_continue(paper.cursor.value)
+        doc_ids += paper.doc_ids
 
+    todoist_folder_id = ""
+    unknown = [doc_id for doc_id in doc_ids if doc_id not in folders]
+    if unknown:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unknown)))) as executor:
+            context = contextvars.copy_context()
+            futures = {executor.submit(context.copy().run, getfolder, doc_id): doc_id for doc_id in unknown}
+            for future in as_completed(futures):
+                folder = future.result()
+                folders[futures[future]] = folder
+                if folder and folder[0] == foldername:
+                    todoist_folder_id = folder[1]
+                    loggerdb.debug("Paper folder set as todoist folder: {}".format(todoist_folder_id))
+                    # Skip papers not checked yet
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+    savecache()
     return todoist_folder_id
 
 
@@ -227,24 +440,57 @@ def getprogresssymbols(progress_done, secrets):
     return str(item_progressbar)
 
 
-def checkforupdate(currentversion, updateurl):
+def checkforupdate(currentversion, updateurl, session=None, cachefile=None, ttl=UPDATE_CHECK_TTL, timeout=UPDATE_CHECK_TIMEOUT):
     """
-    Check for new version at github
+    Check for new version at github.
+    The latest release gets cached in cachefile for ttl seconds. Once expired, it gets revalidated with its ETag -
+    an unchanged release doesn't count against the github rate limit.
 
     :param currentversion: (str) version of current release
     :param updateurl: (str) github "releases" json url
+    :param session: (requests.Session) session to use. Default: new session with default retries
+    :param cachefile: (str) json file to cache the latest release in. None -> no cache
+    :param ttl: (int) seconds the cached release is used without asking github
+    :param timeout: (float) max. seconds to wait for github
     :return: None
     """
+    import requests
+    from .transport import meteredSession, retryPolicy
+
+    if session is None:
+        session = meteredSession('github', runMetrics(), policy=retryPolicy())
+
+    release = None
+    if cachefile:
+        try:
+            with open(cachefile, 'r', encoding='utf-8') as f:
+                release = json.load(f)
+            if release.get('url') != updateurl:
+                release = None
+        except (OSError, ValueError, AttributeError):
+            release = None
+
     # Check for updates
     try:
-        r = requests.get(updateurl)
-        r.raise_for_status()
-        release_info_json = r.json()
-
-        if not currentversion == release_info_json[0]['tag_name']:
+        if release is None or time.time() - release.get('checked', 0) >= ttl:
+            headers = {'If-None-Match': release['etag']} if release and release.get('etag') else {}
+            r = session.get(updateurl, headers=headers, timeout=timeout)
+            if r.status_code == 304 and release:
+                loggerdg.debug("Latest release unchanged: {}".format(release['tag_name']))
+            else:
+                r.raise_for_status()
+                release_info_json = r.json()
+                release = {'url': updateurl, 'etag': r.headers.get('ETag'),
+                           'tag_name': release_info_json[0]['tag_name'], 'html_url': release_info_json[0]['html_url']}
+            release['checked'] = time.time()
+            if cachefile:
+                with open(cachefile, 'w', encoding='utf-8') as f:
+                    json.dump(release, f)
+
+        if not currentversion == release['tag_name']:
             logger.info(
                 "Your version is not up-to-date! \nYour version: {}\nLatest version: {}\nSee latest version at: {}".format(
-                    currentversion, release_info_json[0]['tag_name'], release_info_json[0]['html_url']))
+                    currentversion, release['tag_name'], release['html_url']))
             return 1
         else:
             return 0
@@ -257,6 +503,9 @@ def checkforupdate(currentversion, updateurl):
     except requests.exceptions.RequestException as e:
         logger.error("Error while checking for updates: {}".format(e))
         return 1
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        logger.error("Error while checking for updates: {}".format(e))
+        return 1
 
 
 def getlabelid(labelname: str, api: object) -> str:
@@ -342,7 +591,66 @@ def gettaskwithlabelid(labelid, api):
     return found
 
 
-def main():
+def getgrocerytotals(index, label_grocery_id, grocery_currency, grocery_seperator, lists=None, titles=None) -> dict:
+    """
+    Sums up all grocery lists in one bottom-up (post-order) pass. Nested grocery lists add the already
+    computed sum of their sub lists, so lists of any depth are correct after one run.
+    Prices are summed up as Decimal to avoid float drift.
+
+    :param index: (stateIndex) index of the current sync
+    :param label_grocery_id: label ID of the grocery label
+    :param grocery_currency: (str) currency symbol
+    :param grocery_seperator: (str) grocery seperator
+    :param lists: (list) IDs of grocery lists to sum up (including their sub lists). Default: all lists
+    :param titles: (titleCodec) parses the prices. Default: codec of grocery_currency and grocery_seperator
+    :return: (dict) task ID of grocery list -> Decimal sum
+    """
+    if titles is None:
+        titles = titleCodec(grocery_seperator=grocery_seperator, currency=grocery_currency)
+    islist = set(index.gettaskswithlabelid(label_grocery_id))
+    if lists is None:
+        lists = index.gettaskswithlabelid(label_grocery_id)
+    totals = {}
+
+    def items(task_id):
+        # * -> Skip "text only Tasks"
+        return [groceryItem for groceryItem in index.getchildren(task_id) if
+                not groceryItem.content.startswith("*") and not groceryItem.in_history]
+
+    for root in lists:
+        stack = [(root, False)]
+        visiting = set()
+        while stack:
+            task_id, expanded = stack.pop()
+            if task_id in totals:
+                continue
+            if not expanded:
+                # sub lists go on top of the stack and get summed up first
+                visiting.add(task_id)
+                stack.append((task_id, True))
+                for groceryItem in items(task_id):
+                    if groceryItem.id in islist and groceryItem.id not in totals and groceryItem.id not in visiting:
+                        stack.append((groceryItem.id, False))
+                continue
+
+            total = Decimal(0)
+            for groceryItem in items(task_id):
+                if groceryItem.id in islist:
+                    logger.debug("Found list to add: {}".format(groceryItem.content))
+                    total += totals.get(groceryItem.id, Decimal(0))
+                else:
+                    logger.debug("Found item to add: {}".format(groceryItem.content))
+                    total += Decimal(str(titles.price(groceryItem)))
+            totals[task_id] = total
+    return totals
+
+
+def createconfigpaths():
+    """
+    Creates app, config, template, log and cache directories and the initial config
+
+    :return: None
+    """
     # create config
     if not os.path.exists(getConfigPaths().config()):
         os.mkdir(getConfigPaths().app(), mode=0o750)
@@ -356,10 +664,21 @@ def main():
     if os.path.exists(getConfigPaths().app()) and not os.path.exists(getConfigPaths().log()):
         os.mkdir(getConfigPaths().log(), mode=0o750)
 
+    # create cache
+    if os.path.exists(getConfigPaths().app()) and not os.path.exists(getConfigPaths().cache()):
+        os.mkdir(getConfigPaths().cache(), mode=0o750)
+
     # create initial config
     if not os.path.exists(getConfigPaths().file_config()):
         shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), staticConfig.filename_config_initial), getConfigPaths().file_config())
 
+
+def readconfig() -> ConfigParser:
+    """
+    Sets up logging and reads config.ini
+
+    :return: (ConfigParser) config
+    """
     # Read config.ini
     # TODO refactor read/write config -> https://docs.python.org/3/library/configparser.html
     # check for every non-optional parameter
@@ -412,289 +731,612 @@ def main():
             loggerdg.setLevel(logging.DEBUG)
 
         logger.info("Set logging level: {}".format(logging.getLevelName(logger.level)))
+    except FileNotFoundError as error:
+        logger.error("Config file not found! Create config.ini first. \nOriginal Error: {}".format(error))
+        raise SystemExit(1)
+
+    return config
 
-        # Setup devmode. If true -> no todoist commit and github update check(60 requests per hour)
-        if config.get('config', 'devmode') == "True" or config.get('config', 'devmode') == "true":
-            devmode = True
-            logger.info("Entering DEVMODE - no todoist data will get changed")
-        else:
-            devmode = False
-            logger.info("Entering Production mode - All changed will get synced")
 
-        # Read config
-        todoist_api_key = config.get('todoist', 'apikey')
-        label_progress = config.get('todoist', 'label_progress')
-        todoist_seperator = config.get('todoist', 'progress_seperator')
+def initdropbox(config, session=None, paths=None):
+    """
+    Authorizes dropbox and looks up the paper folder ID if not set
+
+    :param config: (ConfigParser) config
+    :param session: (requests.Session) session for all dropbox calls. Default: session of the dropbox SDK
+    :param paths: (getConfigPaths) config file and cache of the account. Default: paths of the user
+    :return: dropbox api object or None if dropbox is disabled
+    """
+    if paths is None:
+        paths = getConfigPaths()
+    dropbox_api_key = config.get('dropbox', 'apikey')
+    label_todoist_dropboxpaper = config.get('dropboxpaper', 'labelname')
+    label_todoist_dropboxoffice = config.get('dropboxoffice', 'labelname')
+
+    if not dropbox_api_key or not (label_todoist_dropboxpaper or label_todoist_dropboxoffice):
+        loggerdb.debug("Dropbox feature disabled. No API key found.")
+        return None
+
+    import dropbox
+    from dropbox.exceptions import AuthError
 
-        dropbox_api_key = config.get('dropbox', 'apikey')
+    policy = getattr(session, 'policy', None)
+    if policy is None:
+        dbx = dropbox.Dropbox(dropbox_api_key, session=session)
+    else:
+        # the session retries and sets the timeouts -> no retries of the SDK on top
+        dbx = dropbox.Dropbox(dropbox_api_key, session=session, max_retries_on_error=0, max_retries_on_rate_limit=0,
+                              timeout=policy.timeout)
+    try:
+        loggerdb.debug("Dropbox account set to: {}".format(dbx.users_get_current_account()))
+    except AuthError as err:
+        loggerdb.error("Invalid access token: {}".format(err))
+        raise SystemExit(1)
 
+    if label_todoist_dropboxpaper:
+        # Check paper folder ID, get if not encoding=self.encoding
+        # Check that folder it still matches folder name
         todoist_folder_id = str(config.get('dropboxpaper', 'todoistfolderid'))
-        todoist_folder_name = config.get('dropboxpaper', 'foldername')
-        label_todoist_dropboxpaper = config.get('dropboxpaper', 'labelname')
-        todoist_paper_sharing = config.get('dropboxpaper', 'sharing')
 
-        todoist_dropbox_templatefile = config.get('dropboxoffice', 'templatefile')
-        label_todoist_dropboxoffice = config.get('dropboxoffice', 'labelname')
-        todoist_dropbox_prepart_files = config.get('dropboxoffice', 'dropbox_prepart_files')
-        dropbox_todoist_folder = config.get('dropboxoffice', 'folder')
+        if todoist_folder_id:
+            loggerdb.debug("Dropbox paper - folder-ID set to: {}".format(todoist_folder_id))
+            # TODO Verify ID of foldername. Doesn't work properly. Not really important
+            # dbx.paper_docs_get_folder_info()
+            # folder_meta = dbx.paper_docs_get_folder_info(todoist_folder_id)
+            # print(folder_meta)
+            # raise SystemExit(1)
+            #
+            # if folder_meta.folders[0].name == "todoist":
+            #     loggerdb.debug("Dropbox paper - folder-ID is up-to-date: {}".format(todoist_folder_id))
+            #     todoist_folder_id = folder_meta.folders[0].id
+            # else:
+            #     loggerdb.debug("Dropbox paper - folder-ID is outdated. Resetting.")
+            #     todoist_folder_id = None
+        else:
+            todoist_folder_id = gettodoistfolderid(config.get('dropboxpaper', 'foldername'), dbx,
+                                                   cachefile=os.path.join(paths.cache(), staticConfig.filename_paperfolders),
+                                                   concurrency=config.getint('dropboxpaper', 'concurrency', fallback=4))
+            config.set('dropboxpaper', 'todoistfolderid', todoist_folder_id)
+            with open(paths.file_config(), 'w') as configfile:
+                config.write(codecs.open(paths.file_config(), 'wb+', 'utf-8'))
+    return dbx
+
 
+class groceryFeature(feature):
+    """
+    Sum of all prices in the subtasks of a grocery list, written to the title of the list
+    """
+
+    name = 'grocery'
+
+    def enabled(self) -> bool:
+        if self.config.get('todoist', 'label_grocery'):
+            return True
+        logger.debug("Grocery feature disabled. No labelname found.")
+        return False
+
+    def run(self, index, dirty) -> list:
+        config = self.config
+        titles = self.session.titles
         grocery_label = config.get('todoist', 'label_grocery')
         grocery_currency = config.get('todoist', 'grocery_currency')
         grocery_seperator = config.get('todoist', 'grocery_seperator')
 
-        github_apikey = config.get('github', 'apikey')
-        github_sync_project_name = config.get('github', 'TodoistProjectToSync')
-        github_synclabel_name = config.get('github', 'TodoistSyncLabel')
-        github_url_identifier = config.get('github', 'GithubURLIdentifier')
-        github_sync_repo_name = config.get('github', 'GithubSyncRepoName')
-        github_username = config.get('github', 'GithubUsername')
+        intents = []
+        label_grocery_id = index.getlabelid(grocery_label)
+        grocery_lists = [task_id for task_id in index.gettaskswithlabelid(label_grocery_id) if dirty is None or task_id in dirty]
+        self.scanned = len(grocery_lists)
+        grocery_totals = getgrocerytotals(index, label_grocery_id, grocery_currency, grocery_seperator, lists=grocery_lists, titles=titles)
 
-    except FileNotFoundError as error:
-        logger.error("Config file not found! Create config.ini first. \nOriginal Error: {}".format(error))
-        raise SystemExit(1)
+        for task_id in grocery_lists:
+            task = index.getitem(task_id)
+            logger.debug("Found grocery list: {}".format(task['content']))
 
-    # init dropbox session
-    if dropbox_api_key and (label_todoist_dropboxpaper or label_todoist_dropboxoffice):
-        dbx = dropbox.Dropbox(dropbox_api_key)
-        try:
-            dbx.users_get_current_account()
-            loggerdb.debug("Dropbox account set to: {}".format(dbx.users_get_current_account()))
-        except AuthError as err:
-            loggerdb.error("Invalid access token: {}".format(err))
-            raise SystemExit(1)
+            grocery_value_total_old = titles.total(task)
+            grocery_value_total_new = float(grocery_totals[task_id])
+
+            logger.debug("Check if sum changed")
+            if grocery_value_total_new != grocery_value_total_old:
+                logger.info("sum changed! Update needed")
+                logger.debug("Old sum: {}".format(grocery_value_total_old))
+                logger.debug("New sum: {}".format(grocery_value_total_new))
+
+                logger.debug("old title: {}".format(task['content']))
+
+                newTitle = titles.grocerytitle(task, grocery_value_total_new)
+                logger.info("new title: {}".format(newTitle))
+                intents.append(updateIntent(task['id'], {'content': newTitle}))
 
-        if label_todoist_dropboxpaper:
-            # Check paper folder ID, get if not encoding=self.encoding
-            # Check that folder it still matches folder name
-
-            if todoist_folder_id:
-                loggerdb.debug("Dropbox paper - folder-ID set to: {}".format(todoist_folder_id))
-                # TODO Verify ID of foldername. Doesn't work properly. Not really important
-                # dbx.paper_docs_get_folder_info()
-                # folder_meta = dbx.paper_docs_get_folder_info(todoist_folder_id)
-                # print(folder_meta)
-                # raise SystemExit(1)
-                #
-                # if folder_meta.folders[0].name == "todoist":
-                #     loggerdb.debug("Dropbox paper - folder-ID is up-to-date: {}".format(todoist_folder_id))
-                #     todoist_folder_id = folder_meta.folders[0].id
-                # else:
-                #     loggerdb.debug("Dropbox paper - folder-ID is outdated. Resetting.")
-                #     todoist_folder_id = None
             else:
-                todoist_folder_id = gettodoistfolderid(todoist_folder_name, dbx)
-                config.set('dropboxpaper', 'todoistfolderid', todoist_folder_id)
-                with open(getConfigPaths().file_config(), 'w') as configfile:
-                    config.write(codecs.open(getConfigPaths().file_config(), 'wb+', 'utf-8'))
-    else:
-        loggerdb.debug("Dropbox feature disabled. No API key found.")
+                logger.info("Sum not changed! Skipping list")
+        return intents
 
-    # init todoist session
-    try:
-        api = TodoistAPI(todoist_api_key)
-        api.sync()
-        if not api.state['items']:
-            raise ValueError('Sync error. State empty.')
-    except ValueError as error:
-        logger.error("Sync Error. \nOriginal Error: {}".format(error))
-        raise SystemExit(1)
 
-        # Usefull for development:
-        # Delete todoist tasks
-        # print( api.state['items'])
-        # print( api.state['projects'])
-        # item = api.items.get_by_id("ID_TO_DELETE")
-        # item.delete()
-        # api.commit()
-
-        # List projects
-
-    if grocery_label:
-        label_grocery_id = getlabelid(grocery_label, api)
-        run = 2
-        # run 2x to get nestet lists right in one run
-        while run != 0:
-            run = run - 1
-
-            for task in api.state['items']:
-                if not isinstance(task['id'], str) and task['labels'] and not task['is_deleted'] and not task['in_history'] and not getattr(task, 'is_archived', 0):
-                    for label in task['labels']:
-                        if label == label_grocery_id:
-                            logger.debug("Found grocery list: {}".format(task['content']))
-
-                            grocery_value_total_old = float(0)
-                            grocery_value_total_new = float(0)
-
-                            grocery_value_total_old = getRawPriceFromGrocery(task['content'], grocery_currency, grocery_seperator)
-
-                            for groceryItem in api.state['items']:
-                                if not groceryItem['content'].startswith("*"):
-                                    # * -> Skip "text only Tasks"
-
-                                    if not groceryItem['is_deleted'] and not groceryItem['in_history'] and groceryItem['parent_id'] == task['id']:
-                                        grocery_value_single = float(0)
-                                        grocery_value_full = ""
-
-                                        logger.debug("Found item to add: {}".format(groceryItem['content'], groceryItem['id']))
-                                        grocery_value_single = getRawPriceFromGrocery(groceryItem['content'], grocery_currency, grocery_seperator, isTitle=False)
-                                        grocery_value_total_new = grocery_value_total_new + grocery_value_single
-
-                            logger.debug("Check if sum changed")
-                            if grocery_value_total_new != grocery_value_total_old:
-                                logger.info("sum changed! Update needed")
-                                logger.debug("Old sum: {}".format(grocery_value_total_old))
-                                logger.debug("New sum: {}".format(grocery_value_total_new))
-
-                                logger.debug("old title: {}".format(gettasktitle(task['content'], grocery_seperator)))
-
-                                newTitle = addToTitle(gettasktitle(task['content'], grocery_seperator), ' ' + localizePrice(grocery_value_total_new, grocery_currency),
-                                                      grocery_seperator, )
-                                logger.info("new title: {}".format(newTitle))
-                                task.update(content=newTitle)
-                                api.commit()
-
-                            else:
-                                logger.info("Sum not changed! Skipping list")
-                                break
-
-            # Sync
-            if not devmode:
-                # TODO api.commit + api.sync could be a dubplicate. api.sync is added to prevent issues after changing titles
-                logger.debug("Sync start")
-                api.commit()
-                api.sync()
-                logger.debug("Sync done")
-        else:
-            logger.debug("Grocery feature disabled. No labelname found.")
+class progressFeature(feature):
+    """
+    Progress bar of done subtasks, written to the title of the tracked task.
+    Runs after the grocery sum, so a grocery list with progress bar gets both.
+    """
 
+    name = 'progress'
+    requires = ('grocery',)
 
-    if label_progress:
+    def enabled(self) -> bool:
+        if self.config.get('todoist', 'label_progress'):
+            return True
+        logger.debug("Progressbar feature disabled. No labelname found.")
+        return False
+
+    def run(self, index, dirty) -> list:
+        config = self.config
+        titles = self.session.titles
 
-        label_progress_id = getlabelid(label_progress, api)
+        intents = []
+        label_progress_id = index.getlabelid(config.get('todoist', 'label_progress'))
         counter_progress = 0
         counter_changed_items = 0
 
-        for task in api.state['items']:
-            if not isinstance(task['id'], str) and task['labels'] and not task['is_deleted'] and not task[
-                'in_history'] and not getattr(task, 'is_archived', 0):
-                for label in task['labels']:
-                    if label == label_progress_id:
-                        logger.debug("Found task to track: {}".format(task['content']))
-
-                        counter_progress = counter_progress + 1
-                        subtasks_total = 0
-                        subtasks_done = 0
-                        for subTask in api.state['items']:
-                            if not subTask['content'].startswith("*"):
-                                # * -> Skip "text only Tasks"
-
-                                if not subTask['is_deleted'] and subTask['parent_id'] == task['id']:
-                                    logger.debug(
-                                        "Found connected Subtask: {}".format(subTask['content'], subTask['id']))
-                                    if subTask['checked']:
-                                        subtasks_done = subtasks_done + 1
-                                        logger.debug("Subtask {} is marked as DONE".format(subTask['content']))
-                                    else:
-                                        logger.debug("Subtask {} is marked as UNDONE".format(subTask['content']))
-                                    subtasks_total = subtasks_total + 1
-
-                        if subtasks_total > 0:
-                            progress_per_task = 100 / subtasks_total
-                        else:
-                            progress_per_task = 100
-
-                        progress_done = round(subtasks_done * progress_per_task)
-                        logger.debug(
-                            "Task: {} done: {} total: {}".format(task['content'], subtasks_done, subtasks_total))
-
-                        item_task_old = task['content']
-
-                        if "‣" in task['content']:
-                            item_content_old = task['content'].split(todoist_seperator)
-                            item_content_new = item_content_old[0]
-
-                        else:
-                            item_content_new = task['content'] + " "
-
-                        item_content = item_content_new + "" + config["todoist"][
-                            "progress_seperator"] + " " + getprogresssymbols(progress_done, config) + " " + str(
-                            progress_done) + ' %'
-
-                        if not item_task_old == item_content:
-                            logger.debug(
-                                "Task progress updated!\nOld title :{}\nNew title :{}".format(item_task_old,
-                                                                                              item_content))
-
-                            item = api.items.get_by_id(task['id'])
-                            item.update(content=item_content)
-
-                            counter_changed_items = counter_changed_items + 1
-        # Sync
-        if not devmode:
-            # TODO api.commit + api.sync could be a dubplicate. api.sync is added to prevent issues after changing titles
-            logger.debug("Sync start")
-            api.commit()
-            api.sync()
-            logger.debug("Sync done")
+        for task_id in index.gettaskswithlabelid(label_progress_id):
+            task = index.getitem(task_id)
+            counter_progress = counter_progress + 1
+            if dirty is not None and task_id not in dirty:
+                continue
+            logger.debug("Found task to track: {}".format(task.content))
+
+            subtasks_total = 0
+            subtasks_done = 0
+            for subTask in index.getchildren(task.id):
+                if not subTask.content.startswith("*"):
+                    # * -> Skip "text only Tasks"
+                    logger.debug(
+                        "Found connected Subtask: {}".format(subTask.content, subTask.id))
+                    if subTask.checked:
+                        subtasks_done = subtasks_done + 1
+                        logger.debug("Subtask {} is marked as DONE".format(subTask.content))
+                    else:
+                        logger.debug("Subtask {} is marked as UNDONE".format(subTask.content))
+                    subtasks_total = subtasks_total + 1
+
+            if subtasks_total > 0:
+                progress_per_task = 100 / subtasks_total
+            else:
+                progress_per_task = 100
+
+            progress_done = round(subtasks_done * progress_per_task)
+            logger.debug(
+                "Task: {} done: {} total: {}".format(task.content, subtasks_done, subtasks_total))
+
+            item_task_old = task.content
+            item_content = titles.progresstitle(task, progress_done)
+
+            if not item_task_old == item_content:
+                logger.debug(
+                    "Task progress updated!\nOld title :{}\nNew title :{}".format(item_task_old,
+                                                                                  item_content))
+
+                intents.append(updateIntent(task.id, {'content': item_content}))
+
+                counter_changed_items = counter_changed_items + 1
 
         logger.info("Tracked tasks : {}".format(counter_progress))
+        self.scanned = counter_progress
         logger.info("Changed tasks: {}".format(counter_changed_items))
-    else:
-        logger.debug("Progressbar feature disabled. No labelname found.")
+        return intents
 
-    # Check for Update
-    if not devmode and config["config"]["update_url"]:
-        checkforupdate(config["config"]["version"], config["config"]["update_url"])
-
-    # Dropbox paper feature
-    # Drpopbox paper is disabled in devmode -> will create files every time since url is not written in task title.
-    # Dropbox paper is annoying to cleanup
-    if not devmode:
-        if label_todoist_dropboxpaper:
-            # Dropbox Paper
-            loggerdb.debug("Dropbox paper start")
-            labelidid = getlabelid(label_todoist_dropboxpaper, api)
-            taskid = gettaskwithlabelid(labelidid, api)
-
-            for task in taskid:
-                item = api.items.get_by_id(task)
-                if "https://" not in item['content'] and not item['is_deleted'] and not item[
-                    'in_history'] and not getattr(item, 'is_archived', 0):
-                    newurl = createpaperdocument(gettasktitle(item['content'], todoist_seperator), dbx,
-                                                 config.get('dropboxpaper', 'todoistfolderid'),
-                                                 config.get('dropboxpaper', 'url'),
-                                                 todoist_paper_sharing)
-                    item.update(content=addurltotask(item['content'], newurl, todoist_seperator))
-                    loggerdb.info("Added paper to task: {}".format(item['content']))
-            if not devmode:
-                api.commit()
-                loggerdb.debug("Sync done")
-        else:
+
+class updatecheckFeature(feature):
+    """
+    Logs a message if a new taskbutler release is available
+    """
+
+    name = 'updatecheck'
+    artifacts = True
+
+    def enabled(self) -> bool:
+        return not self.session.devmode and bool(self.config["config"]["update_url"])
+
+    def run(self, index, dirty) -> list:
+        # runs in the background - never delays the other features or the commit
+        session = self.session
+        if session.updatecheck is not None and session.updatecheck.is_alive():
+            logger.debug("Update check still running. Skipping")
+            return []
+        config = self.config
+        session.updatecheck = threading.Thread(target=contextvars.copy_context().run, name='updatecheck', daemon=True, args=(checkforupdate,), kwargs={
+            'currentversion': config["config"]["version"],
+            'updateurl': config["config"]["update_url"],
+            'session': session.github,
+            'cachefile': os.path.join(session.paths.cache(), staticConfig.filename_updatecheck),
+            'ttl': config.getint('config', 'update_ttl', fallback=UPDATE_CHECK_TTL),
+            'timeout': config.getfloat('config', 'update_timeout', fallback=UPDATE_CHECK_TIMEOUT)})
+        session.updatecheck.start()
+        return []
+
+
+def getartifactitems(index, labelname, titles) -> list:
+    """
+    Returns all tasks with given label that have no link yet
+
+    :param index: (stateIndex) index of the current state
+    :param labelname: (str) name of the label
+    :param titles: (titleCodec) finds the links
+    :return: (list) tasks
+    """
+    labelidid = index.getlabelid(labelname)
+    taskid = index.gettaskswithlabelid(labelidid)
+    return [index.getitem(task) for task in taskid if titles.url(index.getitem(task)) is None]
+
+
+class paperFeature(artifactFeature):
+    """
+    Creates a Dropbox Paper document per labelled task and adds its link to the task.
+    Documents are created right away, the link waits for the progress bar and gets added to the new title.
+    """
+
+    name = 'paper'
+    requires = ('progress',)
+
+    def enabled(self) -> bool:
+        # Drpopbox paper is disabled in devmode -> will create files every time since url is not written in task title.
+        # Dropbox paper is annoying to cleanup. A plan creates nothing -> planning works in devmode
+        if self.session.devmode and not self.dryrun:
+            logger.info("Dropbox paper feature in devmode disabled. Use taskbutler plan to see the planned documents.")
+            return False
+        if not self.config.get('dropboxpaper', 'labelname'):
             logger.info("Dropbox paper feature disabled. No labelname found.")
-    else:
-        logger.info("Dropbox paper feature in devmode disabled.")
+            return False
+        return True
+
+    def plan(self, index, dirty) -> list:
+        titles = self.session.titles
+        loggerdb.debug("Dropbox paper start")
+        return [artifactIntent(self.name, item['id'], titles.headline(item), item['content'])
+                for item in getartifactitems(index, self.config.get('dropboxpaper', 'labelname'), titles)]
+
+    def create(self, titles) -> list:
+        config = self.config
+        newurls = createpaperdocuments(titles, self.session.dbx,
+                                       config.get('dropboxpaper', 'todoistfolderid'),
+                                       config.get('dropboxpaper', 'url'),
+                                       config.get('dropboxpaper', 'sharing'),
+                                       concurrency=config.getint('dropboxpaper', 'concurrency', fallback=4))
+        for title in titles:
+            loggerdb.info("Added paper to task: {}".format(title))
+        return newurls
+
+    def link(self, content, url) -> str:
+        return self.session.titles.linktitle(content, url)
+
+
+class officeFeature(artifactFeature):
+    """
+    Copies the Office template per labelled task and adds its link to the task.
+    Files are copied right away, the link waits for the progress bar and gets added to the new title.
+    Tasks with the Paper label get a Paper document instead.
+    """
+
+    name = 'office'
+    requires = ('progress',)
 
-    # Dropbox -> Microsoft office feature
-    if label_todoist_dropboxoffice:
+    def enabled(self) -> bool:
+        if not self.config.get('dropboxoffice', 'labelname'):
+            logger.info("Dropbox to Office feature disabled. No labelname found.")
+            return False
+        return True
+
+    def plan(self, index, dirty) -> list:
         loggerdb.debug("Dropbox file start")
-        labelidid = getlabelid(label_todoist_dropboxoffice, api)
-        taskid = gettaskwithlabelid(labelidid, api)
-
-        for task in taskid:
-            item = api.items.get_by_id(task)
-            if "https://" not in item['content'] and not item['is_deleted'] and not item[
-                'in_history'] and not getattr(item, 'is_archived', 0):
-                newurl = createdropboxfile(item["content"], dbx, todoist_dropbox_templatefile,
-                                           todoist_dropbox_prepart_files, dropbox_todoist_folder)
-                item.update(content=addurltotask(item['content'], newurl, todoist_seperator))
-                loggerdb.info("Added File to Task: {}".format(item['content']))
-        if not devmode:
-            api.commit()
-            loggerdb.debug("Sync done")
-    else:
-        logger.info("Dropbox to Office feature disabled. No labelname found.")
+        paperlabel = self.config.get('dropboxpaper', 'labelname')
+        paperlabelid = index.labels.get(paperlabel) if paperlabel else None
+        return [artifactIntent(self.name, item['id'], item['content'], item['content'])
+                for item in getartifactitems(index, self.config.get('dropboxoffice', 'labelname'), self.session.titles)
+                if paperlabelid is None or paperlabelid not in item['labels']]
+
+    def create(self, titles) -> list:
+        config = self.config
+        session = self.session
+        dropbox_todoist_folder = config.get('dropboxoffice', 'folder')
+        if titles and session.dropboxfolder is None:
+            session.dropboxfolder = dropboxFolder(session.dbx, dropbox_todoist_folder)
+        newurls = createdropboxfiles(titles, session.dbx, config.get('dropboxoffice', 'templatefile'),
+                                     config.get('dropboxoffice', 'dropbox_prepart_files'), dropbox_todoist_folder,
+                                     config.get('dropboxoffice', 'templatefolder', fallback='.taskbutler'),
+                                     dropboxfolder=session.dropboxfolder)
+        for title in titles:
+            loggerdb.info("Added File to Task: {}".format(title))
+        return newurls
+
+    def link(self, content, url) -> str:
+        return self.session.titles.linktitle(content, url)
+
+
+# All features in order of precedence. Add new features here
+FEATURES = [groceryFeature, progressFeature, updatecheckFeature, paperFeature, officeFeature]
+
+
+class accountSession:
+    """
+    Config, clients and cached state of one account. Stays in memory between runs in daemon mode.
+    """
+
+    def __init__(self, config, paths=None, transport=None, limit=None):
+        """
+        :param config: (ConfigParser) config of the account
+        :param paths: (getConfigPaths) config file and cache of the account. Default: paths of the user
+        :param transport: (sharedTransport) connection pools shared with other accounts. Default: own pools
+        :param limit: (threading.Semaphore) max. concurrent HTTP requests of the account. Default: no limit
+        """
+        from .ingest import compactTodoistAPI
+        from .transport import meteredSession, retryPolicy, rateLimiter, SHARED_RATE_LIMITS
+
+        self.config = config
+        self.paths = paths or getConfigPaths()
+
+        # Setup devmode. If true -> no todoist commit and github update check(60 requests per hour)
+        if config.get('config', 'devmode') == "True" or config.get('config', 'devmode') == "true":
+            self.devmode = True
+            logger.info("Entering DEVMODE - no todoist data will get changed")
+        else:
+            self.devmode = False
+            logger.info("Entering Production mode - All changed will get synced")
+
+        # API calls, timings and processed tasks - exported after every run
+        self.metrics = runMetrics()
+
+        # all outbound calls get the timeouts and retries of [http] and the rate limits of [ratelimit]
+        # todoist and dropbox limit per token -> every account has its own limiters. github limits per IP -> shared
+        policy = retryPolicy.fromconfig(config)
+        self.ratelimits = {}
+        if transport is None:
+            def session(service):
+                self.ratelimits[service] = rateLimiter.fromconfig(config, service)
+                return meteredSession(service, self.metrics, limit=limit, policy=policy, ratelimit=self.ratelimits[service])
+        else:
+            def session(service):
+                if service in SHARED_RATE_LIMITS:
+                    self.ratelimits[service] = transport.ratelimit(service, config)
+                else:
+                    self.ratelimits[service] = rateLimiter.fromconfig(config, service)
+                return transport.session(service, self.metrics, limit=limit, policy=policy, ratelimit=self.ratelimits[service])
+        self.github = session('github')
+
+        # init dropbox session
+        self.dbx = initdropbox(config, session=session('dropbox'), paths=self.paths)
+
+        # init todoist session
+        # state and sync token are cached between runs -> incremental sync
+        # only active tasks and the fields taskbutler reads are kept, sync responses are parsed as a stream
+        self.api = compactTodoistAPI(config.get('todoist', 'apikey'), cache=self.paths.cache() + os.sep,
+                                     session=session('todoist'))
+
+        # Only recompute tasks whose subtree changed since the last run
+        # Changed settings invalidate the stored fingerprints
+        settings = hashlib.sha1(repr(list(config.items('todoist'))).encode('utf-8')).hexdigest()
+        self.fingerprints = fingerprintStore(os.path.join(self.paths.cache(), staticConfig.filename_fingerprints), settings=settings)
+
+        # parsed task titles - kept between runs, a title gets parsed again once it changed
+        self.titles = titleCodec.fromconfig(config)
+
+        # listing of the dropbox office folder - refreshed incrementally
+        self.dropboxfolder = None
+
+        # background thread of the last update check
+        self.updatecheck = None
+
+        # runs (daemon) and webhook recomputations must not overlap
+        self.lock = threading.Lock()
+
+    def run(self, fullsync=False, planfile=None):
+        """
+        Syncs todoist and runs all enabled features
+
+        :param fullsync: (bool) ignore the stored sync token
+        :param planfile: (str) write all updates and artifacts to this plan file instead of committing them
+        :return: None
+        """
+        with self.lock, self.measure():
+            api = self.api
+            try:
+                with self.metrics.phase('sync'):
+                    response = synctodoist(api, fullsync=fullsync)
+                if not api.state['items']:
+                    raise ValueError('Sync error. State empty.')
+                with self.metrics.phase('index'):
+                    index = stateIndex(api)
+            except ValueError as error:
+                logger.error("Sync Error. \nOriginal Error: {}".format(error))
+                raise SystemExit(1)
+
+                # Usefull for development:
+                # Delete todoist tasks
+                # print( api.state['items'])
+                # print( api.state['projects'])
+                # item = api.items.get_by_id("ID_TO_DELETE")
+                # item.delete()
+                # api.commit()
+
+                # List projects
+
+            dirty = self.fingerprints.getdirty(response, index)
+            self.fingerprints.checkpoint(dirty, index)
+            self.process(index, dirty, planfile=planfile)
+
+    def recompute(self, items):
+        """
+        Recomputes progress bars and grocery sums of the parent chain of given tasks (e.g. from webhooks)
+        without syncing first. Paper and Office files are left to the next run.
+
+        :param items: (list) changed tasks as sent by todoist
+        :return: None
+        """
+        with self.lock, self.measure():
+            api = self.api
+            index = stateIndex(api)
+            changed = []
+            for item in items:
+                task = dict(WEBHOOK_TASK_DEFAULTS)
+                if index.getitem(item['id']) is not None:
+                    task.update(index.getitem(item['id']).todict())
+                task.update(item)
+                changed.append(task)
+
+            # same merge as for a sync delta
+            api._update_state({'items': changed})
+            with self.metrics.phase('index'):
+                index = stateIndex(api)
+            dirty = self.fingerprints.observe(changed, index) | self.fingerprints.pending
+            self.fingerprints.checkpoint(dirty, index)
+            self.process(index, dirty, artifacts=False)
+
+    def process(self, index, dirty, artifacts=True, planfile=None):
+        """
+        Runs all enabled features on given index and commits their updates once
+
+        :param index: (stateIndex) index of the current state
+        :param dirty: (set) IDs of tasks to recompute. None -> all tasks
+        :param artifacts: (bool) run features that create Dropbox Paper and Office files or check for updates
+        :param planfile: (str) write all updates and planned artifacts to this plan file instead of committing them
+        :return: None
+        """
+        from .engine import runpipeline
+        from .planner import changePlan
+
+        devmode = self.devmode
+        api = self.api
+        fingerprints = self.fingerprints
+        queue = updateQueue(api)
+        dryrun = planfile is not None
+
+        features = [featureclass(self, dryrun=dryrun) for featureclass in FEATURES]
+        # a plan only lists artifacts - features with other side effects (update check) are skipped
+        features = [instance for instance in features if (artifacts or not instance.artifacts)
+                    and (not dryrun or not instance.artifacts or isinstance(instance, artifactFeature)) and instance.enabled()]
+        with self.metrics.phase('features'):
+            runpipeline(features, index, dirty, queue, metrics=self.metrics)
+        self.titles.retain(index.items)
+
+        if dryrun:
+            plan = changePlan.fromrun(queue, features, api.sync_token)
+            try:
+                plan.write(planfile)
+            except OSError as error:
+                logger.error("Could not write plan to {}: {}".format(planfile, error))
+                raise SystemExit(1)
+            logger.info("Plan written to {}. Updates: {}, artifacts: {}".format(planfile, len(plan.updates), len(plan.artifacts)))
+            # Nothing got committed - recompute the same tasks next run
+            fingerprints.save(dirty)
+        # Sync - all updates of this run in batched requests
+        elif not devmode:
+            logger.debug("Sync start")
+            with self.metrics.phase('commit'):
+                updated = list(queue.updates)
+                status = queue.commit()
+                # failed updates -> todoist keeps the old title. Recompute the tasks next run
+                failed = {task_id for task_id in updated if status.get(task_id) != "ok"}
+                fingerprints.remember(index.getitem(task_id) for task_id in updated if task_id not in failed)
+                items = [item for commit_response in queue.responses if isinstance(commit_response, dict)
+                         for item in commit_response.get('items', [])]
+                pending = fingerprints.observe(items, stateIndex(api)) if items else set()
+                fingerprints.save(pending | failed)
+            logger.debug("Sync done")
+        else:
+            # Nothing got committed - recompute the same tasks next run
+            fingerprints.save(dirty)
+
+        logger.info("Taskbutler end")
+
+    def apply(self, planfile, batch=COMMAND_LIMIT, delay=0.0, retries=3):
+        """
+        Syncs todoist and applies a plan written by run(planfile=...)
+
+        :param planfile: (str) plan file
+        :param batch: (int) todoist commands per request
+        :param delay: (float) seconds between two requests
+        :param retries: (int) retries of failed commands
+        :return: (dict) number of applied, skipped, stale and failed entries
+        """
+        from .planner import changePlan, applyplan
+
+        if self.devmode:
+            logger.error("Applying a plan changes todoist data. Disabled in devmode")
+            raise SystemExit(1)
+        try:
+            plan = changePlan.read(planfile)
+        except (OSError, ValueError) as error:
+            logger.error("Could not read plan {}: {}".format(planfile, error))
+            raise SystemExit(1)
+        logger.info("Applying plan of {} with {} updates and {} artifacts".format(
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(plan.created)), len(plan.updates), len(plan.artifacts)))
+
+        with self.lock, self.measure():
+            try:
+                with self.metrics.phase('sync'):
+                    response = synctodoist(self.api)
+            except ValueError as error:
+                logger.error("Sync Error. \nOriginal Error: {}".format(error))
+                raise SystemExit(1)
+            # tasks changed since the plan - this sync uses up their delta, so the next run has to recompute them
+            index = stateIndex(self.api)
+            dirty = self.fingerprints.getdirty(response, index)
+            self.fingerprints.checkpoint(dirty, index)
+
+            features = [featureclass(self) for featureclass in FEATURES]
+            features = {instance.name: instance for instance in features if isinstance(instance, artifactFeature) and instance.enabled()}
+            with self.metrics.phase('commit'):
+                changed = set()
+                counts = applyplan(plan, self.api, features, batch=batch, delay=delay, retries=retries,
+                                   fingerprints=self.fingerprints, changed=changed)
+                self.fingerprints.save(None if dirty is None else dirty | changed)
+            self.metrics.countitems('apply', scanned=len(plan), updated=counts['applied'])
+            return counts
+
+    @contextmanager
+    def measure(self):
+        """
+        Measures the with block as one run and exports the metrics to [metrics] file afterwards, also if the run failed.
+        """
+        metrics = self.metrics
+        metrics.started = time.time()
+        try:
+            with metrics.phase('total'):
+                yield
+        except BaseException:
+            metrics.success = False
+            raise
+        finally:
+            metricsfile = self.config.get('metrics', 'file', fallback='')
+            if metricsfile:
+                try:
+                    metrics.write(os.path.expanduser(metricsfile), self.config.get('metrics', 'format', fallback='json'))
+                except (OSError, ValueError) as error:
+                    logger.error("Could not write metrics to {}: {}".format(metricsfile, error))
+            metrics.reset()
+
+
+def plan(planfile, fullsync=False):
+    createconfigpaths()
+    config = readconfig()
+    session = accountSession(config)
+    session.run(fullsync=fullsync, planfile=planfile)
+
+
+def apply(planfile, batch=COMMAND_LIMIT, delay=0.0, retries=3):
+    createconfigpaths()
+    config = readconfig()
+    session = accountSession(config)
+    counts = session.apply(planfile, batch=batch, delay=delay, retries=retries)
+    if counts['failed']:
+        raise SystemExit(1)
+
 
-    logger.info("Taskbutler end")
+def main(fullsync=False):
+    createconfigpaths()
+    config = readconfig()
+    session = accountSession(config)
+    session.run(fullsync=fullsync)
+    # all tasks are committed - give the update check its remaining time before exiting
+    if session.updatecheck is not None:
+        session.updatecheck.join(config.getfloat('config', 'update_timeout', fallback=UPDATE_CHECK_TIMEOUT))
 
 
 if __name__ == '__main__':
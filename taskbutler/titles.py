@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Title codec of taskbutler - parses task titles into headline, link, progress meta and price and renders new titles."""
+
+# parts of a title that were not requested yet
+UNPARSED = object()
+
+# upper bounds of the progress bars in [todoist]
+PROGRESS_STEPS = (0, 20, 40, 60, 80, 100)
+
+
+class titleParts:
+    """
+    Parts of one task title. Every part is parsed on first use, e.g. titles of tasks that are no grocery list
+    never get searched for a price.
+
+    headline/meta: title before/after the progress seperator
+    url: link added by the Paper and Office features. None -> no link
+    groceryheadline: title before the grocery seperator
+    total: price in a grocery list title, price: price in a grocery item title
+    """
+
+    __slots__ = ('content', 'headline', 'meta', 'url', 'groceryheadline', 'total', 'price')
+
+    def __init__(self, content):
+        self.content = content
+        self.headline = self.meta = self.url = self.groceryheadline = self.total = self.price = UNPARSED
+
+
+class titleCodec:
+    """
+    Parses and renders task titles with the seperators and currency of the config.
+    Parts are cached per task and parsed again once the title changed, so every title gets parsed once per run
+    no matter how many features read it.
+    """
+
+    def __init__(self, progress_seperator='‣', grocery_seperator='💰', currency='€', progressbars=None):
+        """
+        :param progress_seperator: (str) seperator of the progress meta
+        :param grocery_seperator: (str) seperator of the grocery sum
+        :param currency: (str) currency symbol of grocery prices
+        :param progressbars: (list) progress bar per step of PROGRESS_STEPS
+        """
+        self.progress_seperator = progress_seperator
+        self.grocery_seperator = grocery_seperator
+        self.currency = currency
+        self.progressbars = list(progressbars or [""] * len(PROGRESS_STEPS))
+        self.cache = {}
+
+    @classmethod
+    def fromconfig(cls, config):
+        """
+        Returns codec for the [todoist] section of config
+
+        :param config: (ConfigParser) taskbutler config
+        :return: titleCodec
+        """
+        return cls(config.get('todoist', 'progress_seperator'), config.get('todoist', 'grocery_seperator', fallback='💰'),
+                   config.get('todoist', 'grocery_currency', fallback='€'),
+                   [config.get('todoist', 'progress_bar_{}'.format(step)) for step in PROGRESS_STEPS])
+
+    def parse(self, task) -> titleParts:
+        """
+        Returns the (cached) parts of the title of task
+
+        :param task: (taskRecord) task
+        :return: titleParts
+        """
+        parts = self.cache.get(task.id)
+        if parts is None or parts.content != task.content:
+            parts = titleParts(task.content)
+            self.cache[task.id] = parts
+        return parts
+
+    def retain(self, task_ids):
+        """
+        Drops cached parts of all other tasks, e.g. deleted tasks
+
+        :param task_ids: IDs of tasks to keep
+        :return: None
+        """
+        self.cache = {task_id: parts for task_id, parts in self.cache.items() if task_id in task_ids}
+
+    def splitmeta(self, parts) -> titleParts:
+        """
+        Splits headline and progress meta of parts
+
+        :param parts: (titleParts) parts of a title
+        :return: titleParts
+        """
+        if parts.headline is UNPARSED:
+            seperator = self.progress_seperator
+            if seperator and seperator in parts.content:
+                # more than one seperator -> ValueError
+                parts.headline, parts.meta = parts.content.split(seperator)
+            else:
+                parts.headline, parts.meta = parts.content, ""
+        return parts
+
+    def headline(self, task) -> str:
+        """
+        Returns title without progress meta (including the trailing space)
+
+        :param task: (taskRecord) task
+        :return: str
+        """
+        return self.splitmeta(self.parse(task)).headline
+
+    def url(self, task):
+        """
+        Returns link taskbutler added to the title
+
+        :param task: (taskRecord) task
+        :return: (str) link or None
+        """
+        parts = self.parse(task)
+        if parts.url is UNPARSED:
+            start = parts.content.find("https://")
+            parts.url = parts.content[start:].split(None, 1)[0] if start >= 0 else None
+        return parts.url
+
+    def total(self, task) -> float:
+        """
+        Returns sum in the title of a grocery list
+
+        :param task: (taskRecord) task
+        :return: float
+        """
+        parts = self.parse(task)
+        if parts.total is UNPARSED:
+            parts.total = self.getprice(parts.content.split(self.grocery_seperator))
+        return parts.total
+
+    def price(self, task) -> float:
+        """
+        Returns price in the title of a grocery item
+
+        :param task: (taskRecord) task
+        :return: float
+        """
+        parts = self.parse(task)
+        if parts.price is UNPARSED:
+            parts.price = self.getprice(parts.content.split())
+        return parts.price
+
+    def getprice(self, words) -> float:
+        """
+        Returns first price in words. Comma and dot are both read as decimal mark
+
+        :param words: (list) parts of a title
+        :return: float
+        """
+        for word in words:
+            if self.currency in word:
+                return float(word.strip(self.currency).replace(",", "."))
+        return float(0)
+
+    def localize(self, value) -> str:
+        """
+        Returns price with currency symbol. € uses a comma, all other currencies a dot
+
+        :param value: (float) price
+        :return: str
+        """
+        if self.currency == '€':
+            return str(value).replace(".", ",") + self.currency
+        return str(value).replace(",", ".") + self.currency
+
+    def progressbar(self, progress_done) -> str:
+        """
+        Returns progress bar of given percentage
+
+        :param progress_done: (int) percentage
+        :return: str
+        """
+        for step, bar in zip(PROGRESS_STEPS, self.progressbars):
+            if progress_done <= step:
+                return bar if progress_done >= 0 else ""
+        return ""
+
+    def progresstitle(self, task, progress_done) -> str:
+        """
+        Returns title of task with given progress
+
+        :param task: (taskRecord) task
+        :param progress_done: (int) percentage
+        :return: str
+        """
+        parts = self.parse(task)
+        seperator = self.progress_seperator
+        if seperator and seperator in parts.content:
+            headline = parts.content.split(seperator, 1)[0]
+        else:
+            headline = parts.content + " "
+        return headline + seperator + " " + self.progressbar(progress_done) + " " + str(progress_done) + ' %'
+
+    def grocerytitle(self, task, total) -> str:
+        """
+        Returns title of grocery list task with given sum
+
+        :param task: (taskRecord) task
+        :param total: (float) sum of the list
+        :return: str
+        """
+        parts = self.parse(task)
+        if parts.groceryheadline is UNPARSED:
+            seperator = self.grocery_seperator
+            if seperator and seperator in parts.content:
+                # more than one seperator -> ValueError
+                parts.groceryheadline, meta = parts.content.split(seperator)
+            else:
+                parts.groceryheadline = parts.content
+        return parts.groceryheadline + ' ' + self.grocery_seperator + ' ' + self.localize(total)
+
+    def linktitle(self, content, url) -> str:
+        """
+        Returns title with link. The old title moves into brackets, the progress meta stays at the end
+
+        :param content: (str) title
+        :param url: (str) link
+        :return: str
+        """
+        parts = self.splitmeta(titleParts(content))
+        meta = self.progress_seperator + parts.meta if self.progress_seperator in content else ""
+        return url + " (" + parts.headline.rstrip() + ") " + meta
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""HTTP sessions shared by the todoist, dropbox and github clients."""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# statuses of calls that get retried: rate limited or temporarily unavailable
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# services with their own rate limit and default [ratelimit] options: calls per second, burst, max. concurrent calls
+RATE_LIMITS = {
+    'todoist': (0.5, 20, 4),
+    'dropbox': (10.0, 20, 8),
+    # 60 calls per hour - quota of github without token
+    'github': (60 / 3600, 5, 2),
+}
+
+# services that limit per IP instead of per token -> one limiter for all accounts of the process
+SHARED_RATE_LIMITS = ('github',)
+
+
+class retryPolicy:
+    """
+    Timeouts and retries of all outbound calls. Configured in the [http] section.
+    Failed calls are retried with exponential backoff and full jitter, a Retry-After header of the response wins.
+    """
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30.0, connect_timeout=5.0, read_timeout=60.0, statuses=RETRY_STATUSES):
+        """
+        :param retries: (int) retries of a call after connection errors and RETRY_STATUSES. 0 -> no retries
+        :param backoff: (float) max. seconds before the first retry, doubled every retry
+        :param max_backoff: (float) max. seconds before a retry. Calls asked to wait longer by Retry-After are not retried
+        :param connect_timeout: (float) max. seconds to connect
+        :param read_timeout: (float) max. seconds between two bytes of the response
+        :param statuses: (tuple) HTTP statuses to retry
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.statuses = frozenset(statuses)
+
+    @classmethod
+    def fromconfig(cls, config):
+        """
+        Returns policy of the [http] section of config. Missing options use the defaults
+
+        :param config: (ConfigParser) taskbutler config
+        :return: retryPolicy
+        """
+        return cls(retries=config.getint('http', 'retries', fallback=3),
+                   backoff=config.getfloat('http', 'backoff', fallback=0.5),
+                   max_backoff=config.getfloat('http', 'max_backoff', fallback=30.0),
+                   connect_timeout=config.getfloat('http', 'connect_timeout', fallback=5.0),
+                   read_timeout=config.getfloat('http', 'read_timeout', fallback=60.0))
+
+    def delay(self, attempt, response=None):
+        """
+        Returns seconds to wait before retry number attempt + 1
+
+        :param attempt: (int) retries so far
+        :param response: (requests.Response) failed response. None -> connection error
+        :return: (float) seconds or None if the call must not be retried
+        """
+        if attempt >= self.retries:
+            return None
+        retryafter = getretryafter(response) if response is not None else None
+        if retryafter is not None:
+            return retryafter if retryafter <= self.max_backoff else None
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+# single account mode without [http] section and tests: default timeouts, no retries
+NO_RETRIES = retryPolicy(retries=0)
+
+
+def getretryafter(response):
+    """
+    Returns seconds to wait from the Retry-After header of response
+
+    :param response: (requests.Response) response
+    :return: (float) seconds or None if no valid header is set
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class rateLimiter:
+    """
+    Token bucket and adaptive concurrency of one service. Every call takes a token and a slot first.
+    The bucket holds up to burst tokens and refills with rate tokens per second.
+    Concurrency follows AIMD: a rate limited call (429) halves it - once per round of calls in flight -
+    every successful call adds 1/concurrency, so it grows by one per round up to the configured maximum.
+    It only grows while all slots are in use - a service that is not busy keeps its concurrency.
+    """
+
+    def __init__(self, rate=0.0, burst=1, concurrency=4, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: (float) tokens per second. 0 -> no rate limit
+        :param burst: (int) max. tokens in the bucket
+        :param concurrency: (int) max. calls in flight
+        :param clock: callable, returns monotonic seconds
+        :param sleep: callable, waits given seconds
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.maxconcurrency = max(1, concurrency)
+        self.concurrency = float(self.maxconcurrency)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.inflight = 0
+        self.waiting = 0
+        self.paused = 0.0
+        self.decreased = float('-inf')
+        self.condition = threading.Condition()
+
+    @classmethod
+    def fromconfig(cls, config, service):
+        """
+        Returns limiter of service with the options of the [ratelimit] section. Missing options use RATE_LIMITS
+
+        :param config: (ConfigParser) taskbutler config
+        :param service: (str) todoist, dropbox or github
+        :return: rateLimiter
+        """
+        rate, burst, concurrency = RATE_LIMITS[service]
+        return cls(rate=config.getfloat('ratelimit', service + '_rate', fallback=rate),
+                   burst=config.getint('ratelimit', service + '_burst', fallback=burst),
+                   concurrency=config.getint('ratelimit', service + '_concurrency', fallback=concurrency))
+
+    def acquire(self) -> float:
+        """
+        Waits for a free slot and a token
+
+        :return: (float) start of the call, pass it to release()
+        """
+        with self.condition:
+            self.waiting += 1
+            while self.inflight >= int(self.concurrency):
+                self.condition.wait()
+            self.waiting -= 1
+            self.inflight += 1
+            now = self.clock()
+            wait = self.paused - now
+            if self.rate:
+                # tokens below zero are reserved by waiting calls -> calls get their tokens in order
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+                self.updated = now
+                wait = max(wait, -self.tokens / self.rate)
+        if wait > 0:
+            self.sleep(wait)
+        return self.clock()
+
+    def release(self, started, status=None):
+        """
+        Frees the slot of a call and adapts the concurrency to its status
+
+        :param started: (float) start of the call returned by acquire()
+        :param status: (int) HTTP status of the call. None -> call failed without response
+        :return: None
+        """
+        with self.condition:
+            busy = self.waiting or self.inflight >= int(self.concurrency)
+            self.inflight -= 1
+            if status == 429:
+                # calls started before the last decrease saw the old concurrency - one 429 storm halves once
+                if started >= self.decreased:
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    self.decreased = self.clock()
+                self.tokens = min(self.tokens, 0.0)
+            elif status is not None and status < 400 and busy:
+                self.concurrency = min(self.maxconcurrency, self.concurrency + 1 / self.concurrency)
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        """
+        Lets all calls wait seconds, e.g. for the Retry-After of a rate limited call
+
+        :param seconds: (float) seconds
+        :return: None
+        """
+        with self.condition:
+            self.paused = max(self.paused, self.clock() + seconds)
+
+
+class meteredSession(requests.Session):
+    """
+    requests session that records latency and errors of every call in runMetrics.
+    Calls without timeout get the timeouts of the policy, failed calls are retried like the policy says.
+    Used by the todoist, dropbox and github clients.
+    """
+
+    def __init__(self, service, metrics, limit=None, policy=None, ratelimit=None, sleep=time.sleep):
+        """
+        :param service: (str) name of the service in runMetrics, also the logger of retries
+        :param metrics: (runMetrics) metrics of the run
+        :param limit: (threading.Semaphore) shared by all sessions of an account, caps its requests in flight. None -> no cap
+        :param policy: (retryPolicy) timeouts and retries. None -> default timeouts, no retries
+        :param ratelimit: (rateLimiter) rate and concurrency of the service. None -> not limited
+        :param sleep: callable, waits given seconds
+        """
+        super().__init__()
+        self.service = service
+        self.metrics = metrics
+        self.limit = limit
+        self.policy = policy or NO_RETRIES
+        self.ratelimit = ratelimit
+        self.sleep = sleep
+        self.shared = False
+
+    def request(self, method, url, *args, **kwargs):
+        # bodies get sent again on retries - all clients send bytes or str, no streams
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.policy.timeout
+        attempt = 0
+        while True:
+            try:
+                response = self.limitedrequest(method, url, attempt, *args, **kwargs)
+            except requests.exceptions.ConnectionError as error:
+                delay = self.policy.delay(attempt)
+                if delay is None:
+                    raise
+                reason = error
+            else:
+                if response.status_code not in self.policy.statuses:
+                    return response
+                delay = self.policy.delay(attempt, response)
+                if delay is None:
+                    return response
+                reason = "HTTP {}".format(response.status_code)
+                response.close()
+            attempt += 1
+            logging.getLogger(self.service).warning("{} {} failed: {}. Retry {} of {} in {:.1f}s".format(
+                method, urlparse(url).path, reason, attempt, self.policy.retries, delay))
+            # waits outside of the limit -> other calls of the account go on
+            self.sleep(delay)
+
+    def limitedrequest(self, method, url, attempt, *args, **kwargs):
+        ratelimit = self.ratelimit
+        if ratelimit is None:
+            return self.accountrequest(method, url, attempt, *args, **kwargs)
+        # token of the service first - a call waiting for its token doesn't block calls of the account to other services
+        started = ratelimit.acquire()
+        status = None
+        try:
+            response = self.accountrequest(method, url, attempt, *args, **kwargs)
+            status = response.status_code
+            if status == 429:
+                ratelimit.pause(getretryafter(response) or 0)
+            return response
+        finally:
+            ratelimit.release(started, status)
+
+    def accountrequest(self, method, url, attempt, *args, **kwargs):
+        if self.limit is None:
+            return self.meteredrequest(method, url, attempt, *args, **kwargs)
+        with self.limit:
+            return self.meteredrequest(method, url, attempt, *args, **kwargs)
+
+    def meteredrequest(self, method, url, attempt, *args, **kwargs):
+        started = time.monotonic()
+        error = True
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            error = response.status_code >= 400
+            return response
+        finally:
+            self.metrics.recordcall(self.service, urlparse(url).path, time.monotonic() - started, error=error, retry=attempt > 0)
+
+    def close(self):
+        # adapters of a sharedTransport outlive the session
+        if not self.shared:
+            super().close()
+
+
+class sharedTransport:
+    """
+    Connection pools shared by the sessions of all accounts in multi-account mode.
+    Every service gets one adapter, so accounts reuse open connections instead of opening their own.
+    """
+
+    def __init__(self, poolsize=10):
+        """
+        :param poolsize: (int) max. open connections per host, at least the number of concurrent requests
+        """
+        self.poolsize = poolsize
+        self.adapters = {}
+        self.ratelimits = {}
+        self.lock = threading.Lock()
+
+    def ratelimit(self, service, config) -> rateLimiter:
+        """
+        Returns the limiter of service shared by all accounts. Created with the options of the first account
+
+        :param service: (str) service of SHARED_RATE_LIMITS
+        :param config: (ConfigParser) taskbutler config
+        :return: rateLimiter
+        """
+        with self.lock:
+            if service not in self.ratelimits:
+                self.ratelimits[service] = rateLimiter.fromconfig(config, service)
+            return self.ratelimits[service]
+
+    def adapter(self, service) -> HTTPAdapter:
+        """
+        Returns the adapter of service
+
+        :param service: (str) todoist, dropbox or github
+        :return: HTTPAdapter
+        """
+        with self.lock:
+            if service not in self.adapters:
+                self.adapters[service] = HTTPAdapter(pool_connections=self.poolsize, pool_maxsize=self.poolsize)
+            return self.adapters[service]
+
+    def session(self, service, metrics, limit=None, policy=None, ratelimit=None) -> meteredSession:
+        """
+        Returns session of one account that sends its requests through the shared adapter of service
+
+        :param service: (str) todoist, dropbox or github
+        :param metrics: (runMetrics) metrics of the account
+        :param limit: (threading.Semaphore) caps the requests in flight of the account. None -> no cap
+        :param policy: (retryPolicy) timeouts and retries of the account. None -> default timeouts, no retries
+        :param ratelimit: (rateLimiter) rate and concurrency of the service for the account. None -> not limited
+        :return: meteredSession
+        """
+        session = meteredSession(service, metrics, limit=limit, policy=policy, ratelimit=ratelimit)
+        adapter = self.adapter(service)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.shared = True
+        return session
+
+    def close(self):
+        """
+        Closes all pooled connections
+
+        :return: None
+        """
+        with self.lock:
+            for adapter in self.adapters.values():
+                adapter.close()
+            self.adapters = {}
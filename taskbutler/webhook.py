@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Local webhook receiver for taskbutler - recomputes the parent chain of tasks changed in Todoist."""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+logger = logging.getLogger('todoist')
+
+# Todoist item events that can change a progress bar or grocery sum
+WEBHOOK_EVENTS = ('item:added', 'item:updated', 'item:completed', 'item:uncompleted', 'item:deleted')
+WEBHOOK_HEADER_HMAC = 'X-Todoist-Hmac-SHA256'
+
+
+def gethmac(body, secret) -> str:
+    """
+    Returns base64 encoded HMAC-SHA256 of body - as sent by todoist
+
+    :param body: (bytes) request body
+    :param secret: (str) client secret of the todoist app
+    :return: (str) signature
+    """
+    return base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode('ascii')
+
+
+def verifyhmac(body, signature, secret) -> bool:
+    """
+    Returns True if signature matches the HMAC of body
+
+    :param body: (bytes) request body
+    :param signature: (str) value of the X-Todoist-Hmac-SHA256 header
+    :param secret: (str) client secret of the todoist app
+    :return: bool
+    """
+    # no secret -> anybody could sign. Fail closed
+    if not signature or not secret:
+        return False
+    return hmac.compare_digest(gethmac(body, secret), signature)
+
+
+class webhookReceiver:
+    """
+    Collects changed tasks of webhook events and passes them to callback once no event came in for debounce seconds.
+    Bursts are passed on after maxwait seconds at the latest. Newer events of the same task replace older ones.
+    """
+
+    def __init__(self, callback, debounce=1.0, maxwait=5.0):
+        self.callback = callback
+        self.debounce = debounce
+        self.maxwait = maxwait
+        self.pending = {}
+        self.first = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, item):
+        """
+        Queue changed task
+
+        :param item: (dict) event_data of the webhook
+        :return: None
+        """
+        with self.lock:
+            now = time.monotonic()
+            if not self.pending:
+                self.first = now
+            self.pending[item['id']] = item
+            if self.timer:
+                self.timer.cancel()
+            delay = min(self.debounce, max(0.0, self.first + self.maxwait - now))
+            self.timer = threading.Timer(delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """
+        Passes all queued tasks to callback
+
+        :return: None
+        """
+        with self.lock:
+            items = list(self.pending.values())
+            self.pending = {}
+            self.timer = None
+        if not items:
+            return
+        logger.debug("Webhook: recompute {} changed tasks".format(len(items)))
+        try:
+            self.callback(items)
+        except (Exception, SystemExit) as error:
+            logger.error("Webhook recomputation failed. Original Error: {}".format(error))
+
+
+class webhookHandler(BaseHTTPRequestHandler):
+    """
+    Accepts todoist webhook POST requests. Unknown events are acknowledged and ignored.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if not verifyhmac(body, self.headers.get(WEBHOOK_HEADER_HMAC), self.server.secret):
+            logger.warning("Webhook: invalid HMAC. Request ignored")
+            self.respond(403)
+            return
+
+        try:
+            payload = json.loads(body.decode('utf-8'))
+            event_name = payload['event_name']
+            event_data = payload['event_data']
+        except (ValueError, KeyError, TypeError) as error:
+            logger.warning("Webhook: invalid payload: {}".format(error))
+            self.respond(400)
+            return
+
+        if event_name in WEBHOOK_EVENTS and isinstance(event_data, dict) and 'id' in event_data:
+            logger.debug("Webhook: {} {}".format(event_name, event_data['id']))
+            self.server.receiver.add(event_data)
+        self.respond(200)
+
+    def respond(self, code):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("Webhook: " + format % args)
+
+
+class webhookServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def startwebhookserver(receiver, secret, host='127.0.0.1', port=0):
+    """
+    Starts webhook HTTP server in a background thread. Only requests signed with secret are accepted
+
+    :param receiver: (webhookReceiver) receiver for changed tasks
+    :param secret: (str) client secret of the todoist app to verify the HMAC
+    :param host: (str) address to listen on
+    :param port: (int) port to listen on. 0 -> random free port
+    :return: (webhookServer) running server. Stop with server.shutdown()
+    """
+    if not secret:
+        raise ValueError("Webhook secret required to verify the HMAC of todoist requests")
+    server = webhookServer((host, port), webhookHandler)
+    server.receiver = receiver
+    server.secret = secret
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Webhook receiver listening on {}:{}".format(*server.server_address[:2]))
+    return server
+
+
+def replaypayloads(url, payloads, secret=''):
+    """
+    Posts recorded webhook payloads to url - local stand-in for todoist
+
+    :param url: (str) URL of the webhook receiver
+    :param payloads: (list) recorded webhook payloads
+    :param secret: (str) client secret to sign the payloads with
+    :return: (list) HTTP status codes
+    """
+    codes = []
+    for payload in payloads:
+        body = json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json', WEBHOOK_HEADER_HMAC: gethmac(body, secret)})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                codes.append(response.status)
+        except urllib.error.HTTPError as error:
+            codes.append(error.code)
+    return codes
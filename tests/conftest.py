@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Fixtures shared by the `taskbutler` tests: fake Todoist and Dropbox accounts and account sessions on top of them."""
+
+import os
+import threading
+import time
+from configparser import ConfigParser
+
+import pytest
+
+from dropbox.exceptions import ApiError
+from dropbox.files import GetMetadataError, LookupError, RelocationBatchV2Launch, RelocationBatchV2Result, \
+    RelocationBatchResultEntry, FileMetadata
+from dropbox.paper import ListPaperDocsResponse, Cursor, FoldersContainingPaperDoc, Folder
+from todoist.api import TodoistAPI
+from taskbutler import config as configpaths
+from taskbutler import taskbutler
+
+TESTPATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def readsampleconfig() -> ConfigParser:
+    config = ConfigParser()
+    config.read(os.path.join(os.path.dirname(TESTPATH), 'taskbutler', 'config.ini.sample'), encoding='utf-8')
+    return config
+
+
+class FakeListResult:
+
+    def __init__(self, entries, cursor, has_more=False):
+        self.entries = entries
+        self.cursor = cursor
+        self.has_more = has_more
+
+
+class FakePaperResult:
+
+    def __init__(self, doc_id):
+        self.doc_id = doc_id
+
+
+class FakeDropbox:
+    """
+    Dropbox account of the tests. Every call is recorded:
+
+    files: path -> uploaded content, uploads: uploaded paths, copies: (from, to) paths of every copy batch
+    events: changes of the office folder as seen by files_list_folder, listings: listed folders
+    docs: paper doc ID -> name of its folder or None, lookups: doc IDs of every folder info request
+    policies: doc IDs the sharing policy got set for, max_running: max. paper docs created at the same time
+    """
+
+    def __init__(self, existing=(), docs=None, pagesize=2, delay=0.0):
+        """
+        :param existing: (list) file names in the office folder
+        :param docs: (dict) paper doc ID -> name of its folder or None. Deleted docs raise ApiError
+        :param pagesize: (int) doc IDs per page of paper_docs_list
+        :param delay: (float) seconds paper_docs_create takes
+        """
+        self.lock = threading.Lock()
+        self.files = {}
+        self.uploads = []
+        self.copies = []
+        self.listings = []
+        self.events = [FileMetadata(name=name) for name in existing]
+        self.docs = dict(docs or {})
+        self.pagesize = pagesize
+        self.lookups = []
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.policies = []
+
+    def files_get_metadata(self, path):
+        if path not in self.files:
+            raise ApiError("request", GetMetadataError.path(LookupError.not_found), None, None)
+        return FileMetadata(name=path, content_hash=taskbutler.getdropboxcontenthash(self.files[path]))
+
+    def files_upload(self, data, path, mode=None):
+        self.uploads.append(path)
+        self.files[path] = data
+
+    def files_list_folder(self, path):
+        self.listings.append(path)
+        # paged: one entry per page
+        return self.files_list_folder_continue("0")
+
+    def files_list_folder_continue(self, cursor):
+        start = int(cursor)
+        entries = self.events[start:start + 1]
+        return FakeListResult(entries, str(start + len(entries)), has_more=start + 1 < len(self.events))
+
+    def files_copy_batch_v2(self, entries, autorename=False):
+        self.copies.append([(entry.from_path, entry.to_path) for entry in entries])
+        self.events.extend(FileMetadata(name=entry.to_path.rsplit('/', 1)[1]) for entry in entries)
+        results = [RelocationBatchResultEntry.success(FileMetadata(name=entry.to_path)) for entry in entries]
+        return RelocationBatchV2Launch.complete(RelocationBatchV2Result(entries=results))
+
+    def paper_docs_create(self, content, import_format, parent_folder_id=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return FakePaperResult("id-" + content.decode('UTF-8'))
+
+    def paper_docs_sharing_policy_set(self, doc_id, policy):
+        with self.lock:
+            self.policies.append(doc_id)
+
+    def page(self, start):
+        doc_ids = list(self.docs)[start:start + self.pagesize]
+        return ListPaperDocsResponse(doc_ids=doc_ids, cursor=Cursor(value=str(start + self.pagesize)),
+                                     has_more=start + self.pagesize < len(self.docs))
+
+    def paper_docs_list(self):
+        return self.page(0)
+
+    def paper_docs_list_continue(self, cursor):
+        return self.page(int(cursor))
+
+    def paper_docs_get_folder_info(self, doc_id):
+        with self.lock:
+            self.lookups.append(doc_id)
+        if doc_id not in self.docs:
+            raise ApiError("request-id", "doc_not_found", "Paper doc not found", None)
+        if self.docs[doc_id] is None:
+            return FoldersContainingPaperDoc()
+        return FoldersContainingPaperDoc(folders=[Folder(id="id-" + self.docs[doc_id], name=self.docs[doc_id])])
+
+
+@pytest.fixture()
+def dropboxaccount():
+    """
+    Returns factory of fake Dropbox accounts: factory(existing=(), docs=None, pagesize=2, delay=0.0) -> FakeDropbox
+    """
+    return FakeDropbox
+
+
+@pytest.fixture()
+def api():
+    """
+    Todoist account of todoist_testdata_before.json. Every sync is recorded:
+
+    requests: commands of every sync, tokens: sync token of every sync
+    responses: scripted responses, returned instead of the echo while there are any
+    failures: task ID -> number of failing commands left. Failed commands change nothing
+    Successful commands are applied to the state and echoed in 'items' like todoist does.
+    """
+    api = TodoistAPI(cache=TESTPATH + '/', token="todoist_testdata_before")
+    api.cache = None
+    api.requests = []
+    api.tokens = []
+    api.responses = []
+    api.failures = {}
+
+    def sync(commands=None):
+        api.tokens.append(api.sync_token)
+        if api.responses:
+            response = api.responses.pop(0)
+            if 'sync_token' in response:
+                api.sync_token = response['sync_token']
+            return response
+        api.requests.append(commands)
+        status = {}
+        items = []
+        for command in commands or []:
+            task_id = command['args']['id']
+            if api.failures.get(task_id):
+                api.failures[task_id] -= 1
+                status[command['uuid']] = {'error': "Service unavailable"}
+                continue
+            task = api.items.get_by_id(task_id)
+            task.data.update(command['args'])
+            items.append(dict(task.data))
+            status[command['uuid']] = "ok"
+        api.sync_token = "222"
+        return {'sync_status': status, 'sync_token': api.sync_token, 'full_sync': False, 'items': items}
+
+    api.sync = sync
+    return api
+
+
+@pytest.fixture()
+def accountsession(api, tmp_path, monkeypatch):
+    """
+    Returns factory of accountSessions built by accountSession.__init__ from config.ini.sample.
+    Cache and config live in tmp_path, todoist calls go to the api fixture, dropbox is disabled.
+
+    factory(devmode=True, **sections): sections -> dict of options to set, e.g. todoist={'label_grocery': ''}
+    """
+    monkeypatch.setattr(configpaths.getConfigPaths, 'user', lambda self: str(tmp_path))
+
+    def factory(devmode=True, **sections):
+        config = readsampleconfig()
+        config.set('config', 'devmode', str(devmode).lower())
+        for section, options in sections.items():
+            if not config.has_section(section):
+                config.add_section(section)
+            for option, value in options.items():
+                config.set(section, option, value)
+        paths = configpaths.getAccountPaths('test', str(tmp_path / 'config.ini'))
+        os.makedirs(paths.cache(), exist_ok=True)
+        session = taskbutler.accountSession(config, paths=paths)
+        session.api = api
+        return session
+    return factory
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import threading
+
+import dropbox
+import pytest
+
+from taskbutler import taskbutler
+from taskbutler.ingest import compactTodoistAPI
+from taskbutler.state import fingerprintStore
+from taskbutler.transport import meteredSession, sharedTransport
+
+
+class TestClassAccountSession:
+
+    def test_wires_todoist_and_github_sessions(self, accountsession, tmp_path):
+        session = accountsession(devmode=True, http={'retries': '5'}, ratelimit={'todoist_rate': '2'})
+        assert session.devmode is True
+        assert session.dbx is None
+        assert session.fingerprints.path.startswith(session.paths.cache())
+
+        # accountsession() replaces the todoist client with the fake account - build the real one again
+        real = taskbutler.accountSession(session.config, paths=session.paths)
+        assert isinstance(real.api, compactTodoistAPI)
+        assert real.api.cache == session.paths.cache() + '/'
+        for client in (real.api.session, real.github):
+            assert isinstance(client, meteredSession)
+            assert client.policy.retries == 5
+            assert client.metrics is real.metrics
+        assert real.api.session.ratelimit is real.ratelimits['todoist']
+        assert real.ratelimits['todoist'].rate == 2.0
+
+    def test_accounts_share_the_transport(self, accountsession):
+        config = accountsession().config
+        transport = sharedTransport()
+        limit = threading.BoundedSemaphore(2)
+        first = taskbutler.accountSession(config, transport=transport, limit=limit)
+        second = taskbutler.accountSession(config, transport=transport, limit=limit)
+        assert first.api.session.get_adapter('https://api.todoist.com') is second.api.session.get_adapter('https://api.todoist.com')
+        assert first.api.session.limit is limit
+        assert first.ratelimits['todoist'] is not second.ratelimits['todoist']
+        # github limits per IP - one budget for all accounts
+        assert first.ratelimits['github'] is second.ratelimits['github']
+        assert first.github.ratelimit is second.github.ratelimit
+
+    def test_dropbox_client_uses_the_metered_session(self, accountsession, monkeypatch):
+        monkeypatch.setattr(dropbox.Dropbox, 'users_get_current_account', lambda self: "account")
+        session = accountsession(dropbox={'apikey': "token"}, dropboxpaper={'labelname': '', 'todoistfolderid': ''})
+        assert isinstance(session.dbx._session, meteredSession)
+        assert session.dbx._session.service == 'dropbox'
+        # the session retries - no retries of the SDK on top
+        assert session.dbx._max_retries_on_error == 0
+        assert session.dbx._max_retries_on_rate_limit == 0
+
+    def test_failed_updates_are_recomputed_next_run(self, accountsession, api):
+        session = accountsession(devmode=False, todoist={'label_grocery': ''})
+        index = taskbutler.stateIndex(api)
+        api.failures = {task['id']: 1 for task in api.state['items']}
+        session.process(index, session.fingerprints.getdirty({'full_sync': True}, index), artifacts=False)
+        failed = [command['args']['id'] for command in api.requests[0]]
+        assert failed
+
+        index = taskbutler.stateIndex(api)
+        dirty = session.fingerprints.getdirty({'full_sync': False, 'items': []}, index)
+        assert set(failed) <= dirty
+        session.process(index, dirty, artifacts=False)
+        assert [command['args']['id'] for command in api.requests[1]] == failed
+        assert session.fingerprints.getdirty({'full_sync': False, 'items': []}, taskbutler.stateIndex(api)) == set()
+
+    def test_aborted_run_recomputes_its_delta_next_run(self, accountsession, api, monkeypatch):
+        session = accountsession(devmode=False, todoist={'label_grocery': ''})
+        session.fingerprints.getdirty({'full_sync': True}, taskbutler.stateIndex(api))
+        session.fingerprints.save()
+
+        # subtask reopened - the sync moves the stored token past it, then the run aborts before the commit
+        api.items.get_by_id(2886413796)['checked'] = 0
+        api.responses = [{'sync_token': "333", 'full_sync': False, 'items': [dict(api.items.get_by_id(2886413796).data)]}]
+
+        def abort(queue):
+            raise SystemExit(1)
+        monkeypatch.setattr(taskbutler.updateQueue, 'commit', abort)
+        with pytest.raises(SystemExit):
+            session.run()
+
+        quiet = {'full_sync': False, 'items': []}
+        changed = {2886413796, 2886413793, 2886413693}
+        # daemon keeps the session, a new run reads the fingerprints from disk
+        assert session.fingerprints.getdirty(quiet, taskbutler.stateIndex(api)) == changed
+        stored = fingerprintStore(session.fingerprints.path, settings=session.fingerprints.settings)
+        assert stored.getdirty(quiet, taskbutler.stateIndex(api)) == changed
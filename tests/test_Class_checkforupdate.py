@@ -24,3 +24,71 @@ class TestClassCheckForUpdate:
     def test_returns_1_when_URL_wrong(self):
         exit = taskbutler.checkforupdate("v.1.0.0", "https://doesntexist")
         assert exit == 1
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, releases=None, etag=None):
+        self.status_code = status_code
+        self.releases = releases
+        self.headers = {'ETag': etag} if etag else {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.releases
+
+
+class FakeGithub:
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append({'url': url, 'headers': headers, 'timeout': timeout})
+        return self.responses.pop(0)
+
+
+URL = "https://api.github.com/repos/6uhrmittag/taskbutler/releases"
+RELEASES = [{'tag_name': "v.2.0.0", 'html_url': "https://github.com/6uhrmittag/taskbutler/releases/v.2.0.0"}]
+
+
+class TestClassCheckForUpdateCache:
+
+    def test_uses_timeout(self):
+        github = FakeGithub(FakeResponse(200, RELEASES))
+        assert taskbutler.checkforupdate("v.2.0.0", URL, session=github, timeout=3) == 0
+        assert github.requests[0]['timeout'] == 3
+
+    def test_cached_release_is_used_within_ttl(self, tmp_path):
+        cachefile = str(tmp_path / 'updatecheck.json')
+        github = FakeGithub(FakeResponse(200, RELEASES, etag='"abc"'))
+        assert taskbutler.checkforupdate("v.2.0.0", URL, session=github, cachefile=cachefile) == 0
+        assert taskbutler.checkforupdate("v.1.0.0", URL, session=github, cachefile=cachefile) == 1
+        assert len(github.requests) == 1
+
+    def test_expired_release_is_revalidated_with_etag(self, tmp_path):
+        cachefile = str(tmp_path / 'updatecheck.json')
+        github = FakeGithub(FakeResponse(200, RELEASES, etag='"abc"'), FakeResponse(304))
+        taskbutler.checkforupdate("v.2.0.0", URL, session=github, cachefile=cachefile)
+        assert taskbutler.checkforupdate("v.2.0.0", URL, session=github, cachefile=cachefile, ttl=0) == 0
+        assert github.requests[0]['headers'] == {}
+        assert github.requests[1]['headers'] == {'If-None-Match': '"abc"'}
+
+    def test_new_release_replaces_cache(self, tmp_path):
+        cachefile = str(tmp_path / 'updatecheck.json')
+        newer = [{'tag_name': "v.3.0.0", 'html_url': "https://github.com/6uhrmittag/taskbutler/releases/v.3.0.0"}]
+        github = FakeGithub(FakeResponse(200, RELEASES, etag='"abc"'), FakeResponse(200, newer, etag='"def"'))
+        taskbutler.checkforupdate("v.2.0.0", URL, session=github, cachefile=cachefile)
+        assert taskbutler.checkforupdate("v.2.0.0", URL, session=github, cachefile=cachefile, ttl=0) == 1
+        assert taskbutler.checkforupdate("v.3.0.0", URL, session=github, cachefile=cachefile) == 0
+        assert len(github.requests) == 2
+
+    def test_broken_cache_is_ignored(self, tmp_path):
+        cachefile = tmp_path / 'updatecheck.json'
+        cachefile.write_text("not json")
+        github = FakeGithub(FakeResponse(200, RELEASES))
+        assert taskbutler.checkforupdate("v.2.0.0", URL, session=github, cachefile=str(cachefile)) == 0
+        assert len(github.requests) == 1
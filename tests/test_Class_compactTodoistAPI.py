@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import json
+import shutil
+import sys
+
+import pytest
+
+from todoist.api import TodoistAPI
+from taskbutler.ingest import jsonStream, readpayload, compactTodoistAPI, ITEM_FIELDS
+from taskbutler.state import stateIndex
+
+PAYLOAD = {
+    'sync_token': "222",
+    'full_sync': False,
+    'live_notifications_last_read_id': 1234567890,
+    'notes': [{'id': 1, 'content': "skipped"}] * 3,
+    'labels': [{'id': 1, 'name': "progressbar"}],
+    'items': [{'id': 2886409846, 'content': "Single List 1 ‣ 💰 12,50€", 'labels': [1], 'is_deleted': 0, 'is_archived': 0,
+               'parent_id': None, 'checked': 0, 'in_history': 0, 'project_id': 1, 'date_added': "Fri 05 Oct 2018"}],
+    'temp_id_mapping': {},
+    'day_orders': {"1": 2},
+    'empty': [],
+    'nested': {'a': [1.5, -2e3, True, None, "\"\\"]},
+}
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeResponse:
+
+    def __init__(self, body, contenttype='application/json'):
+        self.body = body
+        self.headers = {'Content-Type': contenttype}
+        self.text = body.decode('utf-8')
+        self.closed = False
+
+    def iter_content(self, size):
+        # 3 bytes -> multibyte characters get split between chunks
+        return iter(chunked(self.body, 3))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+
+    def __init__(self):
+        self.responses = []
+        self.posted = []
+
+    def post(self, url, data=None, stream=False):
+        self.posted.append(data)
+        return self.responses.pop(0)
+
+
+class TestClassJsonStream:
+
+    @pytest.mark.parametrize('size', [1, 2, 7, 4096])
+    def test_It_Should_Read_Payloads_In_Any_Chunk_Size(self, size):
+        text = json.dumps(PAYLOAD, ensure_ascii=False, indent=1)
+        items = []
+        payload = readpayload(jsonStream(chunked(text, size)), items.append)
+        assert items == PAYLOAD['items']
+        assert 'items' not in payload and 'notes' not in payload
+        assert payload == {key: value for key, value in PAYLOAD.items() if key not in ('items', 'notes', 'empty')}
+
+    def test_It_Should_Read_Numbers_Split_Between_Chunks(self):
+        assert list(jsonStream(["[12", "34,5", "6]"]).iterarray()) == [1234, 56]
+
+    def test_It_Should_Raise_An_Error_On_Invalid_Json(self):
+        with pytest.raises(ValueError):
+            readpayload(jsonStream(['{"items": [{"id": 1}']), lambda task: None)
+        with pytest.raises(ValueError):
+            readpayload(jsonStream(['{"a": 1} {}']), lambda task: None)
+        with pytest.raises(ValueError):
+            readpayload(jsonStream(['<html>']), lambda task: None)
+
+
+class TestClassCompactTodoistAPI:
+
+    @pytest.fixture()
+    def cachefolder(self, tmp_path):
+        for suffix in (".json", ".sync"):
+            shutil.copy(sys.path[0] + '/todoist_testdata_before' + suffix, str(tmp_path / ('todoist_testdata_before' + suffix)))
+        return str(tmp_path) + '/'
+
+    @pytest.fixture()
+    def api(self, cachefolder):
+        api = compactTodoistAPI(cache=cachefolder, token="todoist_testdata_before", session=FakeSession())
+        return api
+
+    def test_It_Should_Load_The_Same_Index_As_Todoist(self, api):
+        full = stateIndex(TodoistAPI(cache=sys.path[0] + '/', token="todoist_testdata_before"))
+        compact = stateIndex(api)
+        assert api.sync_token == "111"
+        assert {task_id: task.todict() for task_id, task in compact.items.items()} == \
+               {task_id: task.todict() for task_id, task in full.items.items()}
+        assert compact.labels == full.labels
+        assert compact.labelled == full.labelled
+
+    def test_It_Should_Keep_Only_Active_Tasks_And_Used_Fields(self, api):
+        assert api.state['items']
+        assert all(set(task.data) == {field for field, default in ITEM_FIELDS} for task in api.state['items'])
+        assert not any(task['is_deleted'] or task['is_archived'] for task in api.state['items'])
+        assert api.state['notes'] == [] and api.state['projects'] == []
+
+    def test_It_Should_Write_A_Readable_Cache(self, api, cachefolder):
+        api._write_cache()
+        reloaded = compactTodoistAPI(cache=cachefolder, token="todoist_testdata_before")
+        assert [task.data for task in reloaded.state['items']] == [task.data for task in api.state['items']]
+        assert reloaded.sync_token == api.sync_token
+
+    def test_It_Should_Start_Empty_With_A_Broken_Cache(self, cachefolder):
+        with open(cachefolder + 'todoist_testdata_before.json', 'w') as f:
+            f.write('{"items": [')
+        api = compactTodoistAPI(cache=cachefolder, token="todoist_testdata_before")
+        assert api.state['items'] == [] and api.sync_token == "*"
+
+    def test_It_Should_Merge_A_Streamed_Sync_Delta(self, api):
+        task = api.state['items'][0]
+        deleted = api.state['items'][1]
+        body = json.dumps({'sync_token': "333", 'full_sync': False, 'projects': [{'id': 1}],
+                           'items': [dict(task.data, content="Geändert ‣ ✓", date_added="x"),
+                                     dict(deleted.data, is_deleted=1),
+                                     {'id': 1, 'content': "New task", 'labels': [], 'checked': 0}]}, ensure_ascii=False)
+        api.session.responses.append(FakeResponse(body.encode('utf-8')))
+        count = len(api.state['items'])
+
+        response = api.sync()
+
+        assert json.loads(api.session.posted[0]['resource_types']) == ['items', 'labels']
+        assert api.sync_token == "333"
+        assert task['content'] == "Geändert ‣ ✓"
+        assert 'date_added' not in task.data
+        assert deleted not in api.state['items']
+        assert api.items.get_by_id(1)['content'] == "New task"
+        assert len(api.state['items']) == count
+        assert [item['id'] for item in response['items']] == [task['id'], deleted['id'], 1]
+        assert response['items'][1]['is_deleted'] == 1
+
+    def test_It_Should_Return_Text_Of_Other_Responses(self, api):
+        api.session.responses.append(FakeResponse(b'Service Unavailable', contenttype='text/plain'))
+        assert api.sync() == "Service Unavailable"
+        assert api.sync_token == "111"
+
+    def test_It_Should_Keep_State_And_Cache_On_Error_Payloads(self, api, cachefolder):
+        count = len(api.state['items'])
+        error = {'error': "Too many requests", 'error_tag': "LIMITS_REACHED", 'http_code': 429, 'sync_token': "*"}
+        api.session.responses.append(FakeResponse(json.dumps(error).encode('utf-8')))
+        assert api.sync()['error_tag'] == "LIMITS_REACHED"
+        assert api.sync_token == "111"
+        reloaded = compactTodoistAPI(cache=cachefolder, token="todoist_testdata_before")
+        assert reloaded.sync_token == "111"
+        assert len(reloaded.state['items']) == count
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import hashlib
+
+import pytest
+
+from dropbox.files import FileMetadata, DeletedMetadata
+from taskbutler import taskbutler
+
+
+class TestClassCreateDropboxFiles:
+
+    @pytest.fixture()
+    def template(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'letter.docx').write_bytes(b'template content')
+        return 'letter.docx'
+
+    def test_Content_hash_of_small_file_is_hash_of_block_hash(self):
+        assert taskbutler.getdropboxcontenthash(b'abc') == hashlib.sha256(hashlib.sha256(b'abc').digest()).hexdigest()
+
+    def test_Uploads_template_once_and_copies_server_side(self, dropboxaccount, template):
+        dbx = dropboxaccount()
+        urls = taskbutler.createdropboxfiles(["Letter A", "Letter B"], dbx, template, "https://office/", "todoist", ".taskbutler")
+        assert dbx.uploads == ["/.taskbutler/letter.docx"]
+        assert dbx.copies == [[("/.taskbutler/letter.docx", "/todoist/LetterA.docx"),
+                               ("/.taskbutler/letter.docx", "/todoist/LetterB.docx")]]
+        assert urls == ["https://office/todoist/LetterA.docx?force_role=personal",
+                        "https://office/todoist/LetterB.docx?force_role=personal"]
+
+    def test_Skips_upload_if_template_did_not_change(self, dropboxaccount, template):
+        dbx = dropboxaccount()
+        taskbutler.createdropboxfiles(["Letter A"], dbx, template, "https://office/", "todoist", ".taskbutler")
+        taskbutler.createdropboxfiles(["Letter B"], dbx, template, "https://office/", "todoist", ".taskbutler")
+        assert dbx.uploads == ["/.taskbutler/letter.docx"]
+
+    def test_Uploads_changed_template_again(self, dropboxaccount, template, tmp_path):
+        dbx = dropboxaccount()
+        taskbutler.createdropboxfiles(["Letter A"], dbx, template, "https://office/", "todoist", ".taskbutler")
+        (tmp_path / 'letter.docx').write_bytes(b'new template content')
+        taskbutler.createdropboxfiles(["Letter B"], dbx, template, "https://office/", "todoist", ".taskbutler")
+        assert len(dbx.uploads) == 2
+
+    def test_Numbers_duplicate_names(self, dropboxaccount, template):
+        dbx = dropboxaccount(existing=["letter.docx", "Letter1.docx"])
+        taskbutler.createdropboxfiles(["Letter", "Letter", "Letter"], dbx, template, "https://office/", "todoist", ".taskbutler")
+        assert [to_path for from_path, to_path in dbx.copies[0]] == ["/todoist/Letter2.docx", "/todoist/Letter3.docx", "/todoist/Letter4.docx"]
+
+
+class TestClassDropboxFolder:
+
+    def test_Lists_folder_once_and_refreshes_with_cursor(self, dropboxaccount):
+        dbx = dropboxaccount(existing=["a.docx", "b.docx"])
+        folder = taskbutler.dropboxFolder(dbx, "todoist")
+        folder.refresh()
+        assert folder.names == {"a.docx", "b.docx"}
+        dbx.events.extend([FileMetadata(name="C.docx"), DeletedMetadata(name="a.docx")])
+        folder.refresh()
+        assert folder.names == {"b.docx", "c.docx"}
+        assert dbx.listings == ["/todoist"]
+
+    def test_Reuses_listing_between_batches(self, dropboxaccount, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'letter.docx').write_bytes(b'template content')
+        dbx = dropboxaccount()
+        folder = taskbutler.dropboxFolder(dbx, "todoist")
+        taskbutler.createdropboxfiles(["Letter"], dbx, 'letter.docx', "https://office/", "todoist", ".taskbutler", dropboxfolder=folder)
+        taskbutler.createdropboxfiles(["Letter"], dbx, 'letter.docx', "https://office/", "todoist", ".taskbutler", dropboxfolder=folder)
+        assert dbx.listings == ["/todoist"]
+        assert dbx.copies[1] == [("/.taskbutler/letter.docx", "/todoist/Letter1.docx")]
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+from taskbutler import taskbutler
+
+
+class TestClassCreatePaperDocuments:
+
+    def test_Returns_urls_in_order_of_titles(self, dropboxaccount):
+        titles = ["task{}".format(number) for number in range(10)]
+        urls = taskbutler.createpaperdocuments(titles, dropboxaccount(), "folder", "https://paper/", "false", concurrency=4)
+        assert urls == ["https://paper/id-task{}".format(number) for number in range(10)]
+
+    def test_Creates_at_most_concurrency_documents_at_once(self, dropboxaccount):
+        dbx = dropboxaccount(delay=0.05)
+        taskbutler.createpaperdocuments(["task{}".format(number) for number in range(10)], dbx, "folder", "https://paper/", "false", concurrency=3)
+        assert 1 < dbx.max_running <= 3
+
+    def test_Sets_sharing_policy_for_every_document(self, dropboxaccount):
+        dbx = dropboxaccount()
+        taskbutler.createpaperdocuments(["a", "b", "c"], dbx, "folder", "https://paper/", "false")
+        assert sorted(dbx.policies) == ["id-a", "id-b", "id-c"]
+
+    def test_Returns_empty_list_without_titles(self, dropboxaccount):
+        assert taskbutler.createpaperdocuments([], dropboxaccount(), "folder", "https://paper/", "false") == []
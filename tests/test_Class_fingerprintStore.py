@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import pytest
+import sys
+
+from todoist.api import TodoistAPI
+from taskbutler.state import stateIndex, fingerprintStore
+
+
+class TestClassFingerprintStore:
+
+    @pytest.fixture(scope='session')
+    def API_BEFORE(self):
+        testpath = sys.path[0] + '/'
+        data = TodoistAPI(cache=testpath, token="todoist_testdata_before")
+        return data
+
+    @pytest.fixture()
+    def storepath(self, API_BEFORE, tmp_path):
+        path = str(tmp_path / 'fingerprints.json')
+        store = fingerprintStore(path, settings="test")
+        store.getdirty({'full_sync': True}, stateIndex(API_BEFORE))
+        store.save()
+        return path
+
+    def delta(self, API_BEFORE, task_id, **kwargs):
+        task = dict(API_BEFORE.items.get_by_id(task_id).data)
+        task.update(kwargs)
+        return {'full_sync': False, 'items': [task]}
+
+    def test_Recomputes_all_tasks_without_stored_fingerprints(self, API_BEFORE, tmp_path):
+        store = fingerprintStore(str(tmp_path / 'missing.json'))
+        assert store.getdirty({'full_sync': False, 'items': []}, stateIndex(API_BEFORE)) is None
+
+    def test_Recomputes_all_tasks_after_full_sync(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="test")
+        assert store.getdirty({'full_sync': True}, stateIndex(API_BEFORE)) is None
+
+    def test_Recomputes_all_tasks_if_settings_changed(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="changed")
+        assert store.getdirty({'full_sync': False, 'items': []}, stateIndex(API_BEFORE)) is None
+
+    def test_Recomputes_nothing_on_a_quiet_account(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="test")
+        assert store.getdirty(self.delta(API_BEFORE, 2886413796), stateIndex(API_BEFORE)) == set()
+
+    def test_Recomputes_changed_task_and_its_ancestors(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="test")
+        dirty = store.getdirty(self.delta(API_BEFORE, 2886413796, checked=0), stateIndex(API_BEFORE))
+        assert dirty == {2886413796, 2886413793, 2886413693}
+
+    def test_Recomputes_old_and_new_parent_of_moved_task(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="test")
+        dirty = store.getdirty(self.delta(API_BEFORE, 2886409986, parent_id=2886413088), stateIndex(API_BEFORE))
+        assert dirty == {2886409986, 2886409846, 2886413088}
+
+    def test_Keeps_pending_tasks_for_next_run(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="test")
+        store.save({2886433224})
+        store = fingerprintStore(storepath, settings="test")
+        assert store.getdirty({'full_sync': False, 'items': []}, stateIndex(API_BEFORE)) == {2886433224}
+
+    def test_Ignores_echo_of_own_changes(self, API_BEFORE, storepath):
+        store = fingerprintStore(storepath, settings="test")
+        delta = self.delta(API_BEFORE, 2886433224, content="Simple todo 2 ‣ ⬜⬜⬜⬜⬜ 0 %")
+        store.remember(delta['items'])
+        assert store.observe(delta['items'], stateIndex(API_BEFORE)) == set()
+
+    def test_Checkpoint_of_a_full_recompute_keeps_all_tasks_pending(self, API_BEFORE, tmp_path):
+        path = str(tmp_path / 'fingerprints.json')
+        index = stateIndex(API_BEFORE)
+        store = fingerprintStore(path, settings="test")
+        store.checkpoint(store.getdirty({'full_sync': True}, index), index)
+        store = fingerprintStore(path, settings="test")
+        assert store.getdirty({'full_sync': False, 'items': []}, index) == set(index.items)
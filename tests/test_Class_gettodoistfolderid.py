@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import json
+
+from taskbutler import taskbutler
+
+
+class TestClassGetTodoistFolderID:
+
+    def test_Finds_folder_on_a_later_page(self, dropboxaccount):
+        dbx = dropboxaccount(docs={"doc1": None, "doc2": "other", "doc3": None, "doc4": "todoist"})
+        assert taskbutler.gettodoistfolderid("todoist", dbx, concurrency=1) == "id-todoist"
+
+    def test_Returns_empty_string_if_folder_not_found(self, dropboxaccount):
+        dbx = dropboxaccount(docs={"doc1": None, "doc2": "other"})
+        assert taskbutler.gettodoistfolderid("todoist", dbx) == ""
+
+    def test_Stops_looking_up_once_folder_is_found(self, dropboxaccount):
+        docs = {"doc{}".format(number): None for number in range(50)}
+        docs["doc0"] = "todoist"
+        dbx = dropboxaccount(docs=docs, pagesize=10)
+        assert taskbutler.gettodoistfolderid("todoist", dbx, concurrency=1) == "id-todoist"
+        assert len(dbx.lookups) < 50
+
+    def test_Checks_cached_paper_instead_of_scanning(self, dropboxaccount, tmp_path):
+        cachefile = str(tmp_path / 'paperfolders.json')
+        dbx = dropboxaccount(docs={"doc1": None, "doc2": "other", "doc3": "todoist"})
+        assert taskbutler.gettodoistfolderid("todoist", dbx, cachefile=cachefile) == "id-todoist"
+        dbx.lookups = []
+        assert taskbutler.gettodoistfolderid("todoist", dbx, cachefile=cachefile) == "id-todoist"
+        assert dbx.lookups == ["doc3"]
+
+    def test_Drops_deleted_cached_paper(self, dropboxaccount, tmp_path):
+        cachefile = str(tmp_path / 'paperfolders.json')
+        dbx = dropboxaccount(docs={"doc1": "todoist", "doc2": None})
+        taskbutler.gettodoistfolderid("todoist", dbx, cachefile=cachefile)
+        del dbx.docs["doc1"]
+        dbx.docs["doc3"] = "todoist"
+        assert taskbutler.gettodoistfolderid("todoist", dbx, cachefile=cachefile) == "id-todoist"
+        with open(cachefile, encoding='utf-8') as f:
+            assert "doc1" not in json.load(f)
+
+    def test_Only_looks_up_new_papers(self, dropboxaccount, tmp_path):
+        cachefile = str(tmp_path / 'paperfolders.json')
+        dbx = dropboxaccount(docs={"doc1": None, "doc2": "other"})
+        taskbutler.gettodoistfolderid("todoist", dbx, cachefile=cachefile)
+        dbx.docs["doc3"] = "todoist"
+        dbx.lookups = []
+        assert taskbutler.gettodoistfolderid("todoist", dbx, cachefile=cachefile) == "id-todoist"
+        assert dbx.lookups == ["doc3"]
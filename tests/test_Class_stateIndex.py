@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import pytest
+import sys
+
+from todoist.api import TodoistAPI
+from taskbutler import taskbutler
+from taskbutler.state import stateIndex
+
+
+class TestClassStateIndex:
+
+    @pytest.fixture(scope='session')
+    def API_BEFORE(self):
+        testpath = sys.path[0] + '/'
+        data = TodoistAPI(cache=testpath, token="todoist_testdata_before")
+        return data
+
+    @pytest.fixture(scope='session')
+    def index(self, API_BEFORE):
+        return stateIndex(API_BEFORE)
+
+    def test_It_Should_Find_A_Given_Label(self, index):
+        assert index.getlabelid("progressbar") == 2149853835
+
+    def test_It_Should_Raise_An_Error_If_Noting_Is_Found(self, index):
+        with pytest.raises(ValueError, match="not found"):
+            index.getlabelid("NON_EXISTING")
+
+    def test_Returns_same_tasks_as_full_scan(self, API_BEFORE, index):
+        for label in API_BEFORE.state['labels']:
+            assert index.gettaskswithlabelid(label['id']) == taskbutler.gettaskwithlabelid(label['id'], API_BEFORE)
+
+    def test_Returns_empty_list_when_no_label_is_found(self, index):
+        assert index.gettaskswithlabelid(11) == []
+
+    def test_Returns_task_by_id(self, API_BEFORE, index):
+        task = API_BEFORE.items.get_by_id(2886409846)
+        record = index.getitem(2886409846)
+        for field in ('id', 'parent_id', 'content', 'checked', 'in_history', 'is_deleted'):
+            assert record[field] == task[field]
+        assert list(record.labels) == task['labels']
+
+    def test_Returns_children_of_a_list(self, index):
+        assert [task.id for task in index.getchildren(2886409846)] == [2886409986, 2886410511, 2886410956, 2886412814]
+        assert index.getchildren(2886409576) == []
+
+    def test_Returns_same_children_as_full_scan(self, API_BEFORE, index):
+        for task in API_BEFORE.state['items']:
+            expected = [subTask['id'] for subTask in API_BEFORE.state['items'] if subTask['parent_id'] == task['id']
+                        and not subTask['is_deleted'] and not subTask.data.get('is_archived')]
+            assert [subTask.id for subTask in index.getchildren(task['id'])] == expected
+
+    def test_Leaves_out_deleted_and_archived_tasks(self, API_BEFORE, index):
+        for task in API_BEFORE.state['items']:
+            assert (index.getitem(task['id']) is None) == bool(task['is_deleted'] or task.data.get('is_archived'))
+
+    def test_Records_have_no_dict(self, index):
+        record = index.getitem(2886409846)
+        assert not hasattr(record, '__dict__')
+        record['content'] = "changed"
+        assert record.content == "changed"
+        with pytest.raises(KeyError):
+            record['project_id']
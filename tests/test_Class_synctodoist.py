@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import pytest
+
+from taskbutler.sync import synctodoist
+
+
+class TestClassSyncTodoist:
+
+    def test_Uses_the_stored_sync_token(self, api):
+        api.responses = [{'sync_token': "222", 'full_sync': False}]
+        synctodoist(api)
+        assert api.tokens == ["111"]
+        assert api.state['items']
+
+    def test_Forced_full_sync_ignores_stored_state(self, api):
+        api.responses = [{'sync_token': "222", 'full_sync': True}]
+        synctodoist(api, fullsync=True)
+        assert api.tokens == ["*"]
+        assert api.state['items'] == []
+
+    def test_Falls_back_to_full_sync_if_token_is_rejected(self, api):
+        api.responses = [{'error': "Invalid sync token", 'error_tag': "INVALID_SYNC_TOKEN"},
+                         {'sync_token': "222", 'full_sync': True}]
+        synctodoist(api)
+        assert api.tokens == ["111", "*"]
+
+    def test_Raises_an_error_if_full_sync_fails(self, api):
+        api.responses = [{'error': "Invalid sync token", 'error_tag': "INVALID_SYNC_TOKEN"}, {'error': "Invalid token"}]
+        with pytest.raises(ValueError, match="Sync error"):
+            synctodoist(api)
+
+    @pytest.mark.parametrize('error', [{'error': "Too many requests", 'error_tag': "LIMITS_REACHED", 'http_code': 429},
+                                       {'error': "Invalid token", 'error_tag': "AUTH_INVALID_TOKEN", 'http_code': 401},
+                                       "Service Unavailable"])
+    def test_Other_errors_keep_the_stored_state(self, api, error):
+        items = len(api.state['items'])
+        api.responses = [error]
+        with pytest.raises(ValueError, match="Sync error"):
+            synctodoist(api)
+        assert api.tokens == ["111"]
+        assert api.sync_token == "111"
+        assert len(api.state['items']) == items
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+import os
+import re
+from configparser import ConfigParser
+
+import pytest
+
+from benchmarks.generate import generatestate
+from taskbutler import taskbutler
+from taskbutler.state import taskRecord
+from taskbutler.titles import titleCodec
+
+TITLES = [
+    "Single List 1",
+    "Single List 1 ",
+    "  Spaces   around  ",
+    "Single List 1 ‣ ⬛⬛⬛⬜⬜ 50 %",
+    "Single List 1‣ ⬛⬛⬛⬛⬛ 100 %",
+    "‣ only meta",
+    "Headline ‣",
+    "Twice ‣ meta ‣ meta",
+    "https://paper.dropbox.com/doc/abc (Project X) ‣ ⬜⬜⬜⬜⬜ 0 %",
+    "https://www.dropbox.com/ow/msft/edit/home/Todoist/file.docx?force_role=personal (Letter) ",
+    "Groceries",
+    "Groceries 💰 12,5€",
+    "Groceries  💰  3,30€",
+    "Groceries 💰 0,0€ ‣ ⬛⬜⬜⬜⬜ 20 %",
+    "Bread 0,10€",
+    "Bread 2.50€ at the bakery",
+    "Cake €3.20",
+    "Milk 1€ and 2€",
+    "Cheese 12€",
+    "Twice 💰 1€ 💰 2€",
+    "* Note 100€",
+    "Ümläute ÄÖÜ ß € 📦 ‣ emoji",
+    "tab\tseparated 1,5€",
+    "",
+]
+
+
+def legacyprogress(content, seperator, progress_done, config):
+    # progress pass before the title codec
+    if "‣" in content:
+        item_content_new = content.split(seperator)[0]
+    else:
+        item_content_new = content + " "
+    return item_content_new + "" + seperator + " " + taskbutler.getprogresssymbols(progress_done, config) + " " + str(progress_done) + ' %'
+
+
+def legacylocalize(value, currency):
+    price = str(value)
+    if currency == '€':
+        price = re.sub("[.]", ',', price)
+    else:
+        price = re.sub(',', '.', price)
+    return price + currency
+
+
+def legacygrocery(content, total, currency, seperator):
+    return taskbutler.addToTitle(taskbutler.gettasktitle(content, seperator), ' ' + legacylocalize(total, currency), seperator)
+
+
+def result(function, *args):
+    # value or raised ValueError - both must match the legacy functions
+    try:
+        return function(*args)
+    except ValueError:
+        return ValueError
+
+
+def record(task_id, content):
+    return taskRecord(task_id, None, content, (), 0, 0)
+
+
+def corpus():
+    generated = [task['content'] for task in generatestate(300, labeldensity=0.3, seed=7)['items']]
+    return TITLES + generated
+
+
+class TestClassTitleCodec:
+
+    @pytest.fixture()
+    def config(self):
+        config = ConfigParser()
+        config.read(os.path.join(os.path.dirname(taskbutler.__file__), 'config.ini.sample'), encoding='utf-8')
+        return config
+
+    @pytest.fixture()
+    def titles(self, config):
+        return titleCodec.fromconfig(config)
+
+    def test_progress_titles_match_legacy_output(self, titles, config):
+        for task_id, content in enumerate(corpus()):
+            for progress_done in (0, 1, 20, 21, 33, 40, 50, 60, 67, 80, 99, 100):
+                assert titles.progresstitle(record(task_id, content), progress_done).encode('utf-8') == \
+                       legacyprogress(content, '‣', progress_done, config).encode('utf-8')
+
+    def test_grocery_titles_and_prices_match_legacy_output(self, titles):
+        for task_id, content in enumerate(corpus()):
+            task = record(task_id, content)
+            assert result(titles.price, task) == result(taskbutler.getRawPriceFromGrocery, content, '€', '💰', False)
+            assert result(titles.total, task) == result(taskbutler.getRawPriceFromGrocery, content, '€', '💰')
+            for total in (0.0, 0.1, 3.3, 12.5, 100.0, 1234.56):
+                assert result(titles.grocerytitle, task, total) == result(legacygrocery, content, total, '€', '💰')
+
+    @pytest.mark.parametrize('currency', ['€', '$', '£'])
+    def test_localize_matches_legacy_output(self, currency):
+        titles = titleCodec(currency=currency)
+        for value in (0.0, 0.1, 3.3, 12.5, 1e21, 1234.56):
+            assert titles.localize(value) == legacylocalize(value, currency) == taskbutler.localizePrice(value, currency)
+
+    def test_links_and_headlines_match_legacy_output(self, titles):
+        for task_id, content in enumerate(corpus()):
+            assert result(titles.headline, record(task_id, content)) == result(taskbutler.gettasktitle, content, '‣')
+            assert result(titles.linktitle, content, "https://paper.dropbox.com/doc/x") == \
+                   result(taskbutler.addurltotask, content, "https://paper.dropbox.com/doc/x", '‣')
+            assert (titles.url(record(task_id, content)) is None) == ("https://" not in content)
+
+    def test_parses_every_title_once(self, titles):
+        task = record(1, "Groceries 💰 12,5€")
+        parts = titles.parse(task)
+        assert titles.total(task) == 12.5
+        assert titles.parse(task) is parts
+        task.content = "Groceries 💰 3€"
+        assert titles.parse(task) is not parts
+        assert titles.total(task) == 3.0
+        titles.retain({2})
+        assert titles.cache == {}
+
+    def test_custom_seperator_keeps_the_title_stable(self):
+        titles = titleCodec(progress_seperator='|', progressbars=['0', '20', '40', '60', '80', '100'])
+        first = titles.progresstitle(record(1, "Project"), 40)
+        assert first == "Project | 40 40 %"
+        assert titles.progresstitle(record(1, first), 40) == first
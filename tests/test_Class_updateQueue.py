@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `taskbutler` package."""
+
+from taskbutler.sync import updateQueue
+
+
+class TestClassUpdateQueue:
+
+    def test_Updates_local_task_right_away(self, api):
+        queue = updateQueue(api)
+        task = api.items.get_by_id(2886409846)
+        queue.update(task, content="Single List 1 ‣ changed")
+        assert task['content'] == "Single List 1 ‣ changed"
+        assert api.requests == []
+
+    def test_Merges_updates_of_the_same_task(self, api):
+        queue = updateQueue(api)
+        task = api.items.get_by_id(2886409846)
+        queue.update(task, content="first")
+        queue.update(task, content="second")
+        status = queue.commit()
+        assert len(api.requests) == 1
+        assert api.requests[0][0]['args'] == {'id': 2886409846, 'content': "second"}
+        assert status == {2886409846: "ok"}
+
+    def test_Sends_commands_in_chunks(self, api):
+        queue = updateQueue(api, limit=10)
+        for task in api.state['items']:
+            queue.update(task, content=task['content'] + "!")
+        status = queue.commit()
+        assert [len(chunk) for chunk in api.requests] == [10, 10, 10, 3]
+        assert len(status) == 33
+        assert len(queue) == 0
+
+    def test_Reports_failed_commands(self, api):
+        api.sync = lambda commands=None: "Service Unavailable"
+        queue = updateQueue(api)
+        queue.update(api.items.get_by_id(2886409846), content="changed")
+        assert queue.commit() == {2886409846: "no status returned"}
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import contextvars
+import logging
+import os
+import threading
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from taskbutler import accounts, config, taskbutler
+from taskbutler.metrics import runMetrics
+from taskbutler.transport import meteredSession, sharedTransport
+
+"""Tests for `taskbutler` multi-account mode."""
+
+CONFIG = """[config]
+devmode = True
+update_timeout = 1
+
+[log]
+loglevel = {}
+"""
+
+
+class FakeSession:
+    """
+    accountSession of the tests. Fails like the config of the account says: [test] fail = exit/error
+    """
+
+    created = []
+
+    def __init__(self, config, paths=None, transport=None, limit=None):
+        self.config = config
+        self.paths = paths
+        self.transport = transport
+        self.limit = limit
+        self.updatecheck = None
+        FakeSession.created.append(self)
+
+    def run(self, fullsync=False):
+        logger = logging.getLogger('todoist')
+        logger.debug("debug of {}".format(self.paths.name))
+        logger.info("run of {}".format(self.paths.name))
+        # threads of the run log with the account of the run
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(logger.info, "thread of {}".format(self.paths.name)))
+        thread.start()
+        thread.join()
+        fail = self.config.get('test', 'fail', fallback='')
+        if fail == 'exit':
+            logger.error("Invalid access token")
+            raise SystemExit(1)
+        if fail == 'error':
+            raise RuntimeError("broken account")
+
+
+class CountingAdapter(BaseAdapter):
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.maximum = 0
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.inflight += 1
+            self.maximum = max(self.maximum, self.inflight)
+        time.sleep(0.02)
+        with self.lock:
+            self.inflight -= 1
+        response = requests.Response()
+        response.status_code = 200
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture()
+def home(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.getConfigPaths, 'user', lambda self: str(tmp_path))
+    monkeypatch.setattr(taskbutler, 'accountSession', FakeSession)
+    FakeSession.created = []
+    loggers = [(instance, instance.level, instance.propagate, list(instance.handlers)) for instance in accounts.LOGGERS]
+    yield tmp_path
+    for instance, level, propagate, handlers in loggers:
+        instance.setLevel(level)
+        instance.propagate = propagate
+        instance.handlers = handlers
+
+
+def writeaccount(folder, name, loglevel='DEBUG', fail=''):
+    folder.mkdir(exist_ok=True)
+    content = CONFIG.format(loglevel)
+    if fail:
+        content += "\n[test]\nfail = {}\n".format(fail)
+    (folder / (name + '.ini')).write_text(content, encoding='utf-8')
+
+
+def readlog(home, name):
+    with open(os.path.join(str(home), '.taskbutler', 'log', 'accounts', name + '.log'), encoding='utf-8') as f:
+        return f.read()
+
+
+class TestAccounts:
+
+    def test_finds_account_configs(self, tmp_path):
+        for name in ('b.ini', 'a.ini', 'notes.txt'):
+            (tmp_path / name).write_text("", encoding='utf-8')
+        assert accounts.getaccounts(str(tmp_path)) == {'a': str(tmp_path / 'a.ini'), 'b': str(tmp_path / 'b.ini')}
+
+    def test_account_paths(self, home):
+        paths = config.getAccountPaths('alice', '/etc/taskbutler/alice.ini')
+        assert paths.cache() == os.path.join(str(home), '.taskbutler', 'cache', 'accounts', 'alice')
+        assert paths.file_log() == os.path.join(str(home), '.taskbutler', 'log', 'accounts', 'alice.log')
+        assert paths.file_config() == '/etc/taskbutler/alice.ini'
+
+    def test_failing_accounts_do_not_stop_the_others(self, home):
+        folder = home / 'accounts'
+        writeaccount(folder, 'alice')
+        writeaccount(folder, 'bob', fail='exit')
+        writeaccount(folder, 'carol', fail='error')
+        (folder / 'dave.ini').write_text("[broken", encoding='utf-8')
+
+        results = accounts.runaccounts(str(folder), workers=2)
+        assert results == {'alice': True, 'bob': False, 'carol': False, 'dave': False}
+        assert sorted(session.paths.name for session in FakeSession.created) == ['alice', 'bob', 'carol']
+        assert "Account carol failed: broken account" in readlog(home, 'carol')
+        with pytest.raises(SystemExit):
+            accounts.main(str(folder))
+
+    def test_every_account_logs_to_its_own_file(self, home):
+        folder = home / 'accounts'
+        writeaccount(folder, 'alice')
+        writeaccount(folder, 'bob', loglevel='INFO')
+        accounts.runaccounts(str(folder), workers=2)
+
+        alice = readlog(home, 'alice')
+        bob = readlog(home, 'bob')
+        assert "debug of alice" in alice and "run of alice" in alice and "thread of alice" in alice
+        assert " - alice - todoist - INFO - run of alice" in alice
+        assert "bob" not in alice
+        assert "run of bob" in bob and "thread of bob" in bob
+        assert "debug of bob" not in bob
+        assert "alice" not in bob
+
+    def test_accounts_share_the_connection_pools(self, home):
+        folder = home / 'accounts'
+        writeaccount(folder, 'alice')
+        writeaccount(folder, 'bob')
+        accounts.runaccounts(str(folder), workers=2, concurrency=3)
+
+        first, second = FakeSession.created
+        assert first.transport is second.transport
+        assert first.transport.poolsize == 6
+        assert first.paths.cache() != second.paths.cache()
+        assert os.path.isdir(first.paths.cache())
+        assert first.limit is not second.limit
+
+    def test_no_accounts(self, home):
+        with pytest.raises(SystemExit):
+            accounts.main(str(home))
+
+
+class TestSharedTransport:
+
+    def test_sessions_share_one_adapter_per_service(self):
+        transport = sharedTransport(poolsize=4)
+        first = transport.session('todoist', runMetrics())
+        second = transport.session('todoist', runMetrics())
+        assert first.get_adapter('https://api.todoist.com') is second.get_adapter('https://api.todoist.com')
+        assert first.get_adapter('https://api.todoist.com') is not transport.session('dropbox', runMetrics()).get_adapter('https://api.dropbox.com')
+        first.close()
+        assert transport.adapters['todoist'] is second.get_adapter('https://api.todoist.com')
+
+    def test_limit_caps_requests_in_flight(self):
+        adapter = CountingAdapter()
+        limit = threading.BoundedSemaphore(2)
+        metrics = runMetrics()
+        sessions = [meteredSession('todoist', metrics, limit=limit) for number in range(2)]
+        for session in sessions:
+            session.mount('https://', adapter)
+        threads = [threading.Thread(target=sessions[number % 2].get, args=("https://api.todoist.com/sync",)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert adapter.maximum == 2
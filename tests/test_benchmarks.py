@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from benchmarks.generate import generatestate, writestate, formatprice, LABEL_GROCERY, LABEL_PROGRESS
+from benchmarks.run import loadstate, bulkloadstate, compactloadstate, runbenchmark, TOKEN
+from taskbutler.state import stateIndex
+from taskbutler.taskbutler import getRawPriceFromGrocery
+
+"""Tests for the synthetic todoist states of the benchmarks."""
+
+
+def getdepth(state, task):
+    parents = {item['id']: item['parent_id'] for item in state['items']}
+    depth = 1
+    while parents[task['id']]:
+        task = {'id': parents[task['id']]}
+        depth = depth + 1
+    return depth
+
+
+class TestGenerateState:
+
+    def test_same_seed_same_state(self):
+        assert generatestate(200, seed=3) == generatestate(200, seed=3)
+        assert generatestate(200, seed=3) != generatestate(200, seed=4)
+
+    def test_nesting_depth_is_limited(self):
+        state = generatestate(500, depth=4)
+        depths = {getdepth(state, task) for task in state['items']}
+        assert max(depths) == 4
+
+    def test_labels_follow_density(self):
+        state = generatestate(2000, labeldensity=0.2)
+        labelids = {label['name']: label['id'] for label in state['labels']}
+        progress = [task for task in state['items'] if labelids[LABEL_PROGRESS] in task['labels']]
+        assert 300 < len(progress) < 500
+
+    @pytest.mark.parametrize("priceformat", ['comma', 'dot', 'prefix', 'integer', 'mixed'])
+    def test_grocery_items_have_parseable_prices(self, priceformat):
+        state = generatestate(500, labeldensity=0.3, priceformat=priceformat)
+        labelids = {label['name']: label['id'] for label in state['labels']}
+        lists = {task['id'] for task in state['items'] if labelids[LABEL_GROCERY] in task['labels']}
+        groceryitems = [task for task in state['items'] if task['parent_id'] in lists]
+        assert groceryitems
+        for task in groceryitems:
+            assert getRawPriceFromGrocery(task['content'], '€', '💰', isTitle=False) > 0
+
+    def test_inactive_share(self):
+        assert not any(task['is_deleted'] or task['in_history'] or task['is_archived']
+                       for task in generatestate(500, inactive=0)['items'])
+        inactive = [task for task in generatestate(2000, inactive=0.2)['items']
+                    if task['is_deleted'] or task['in_history'] or task['is_archived']]
+        assert 300 < len(inactive) < 500
+
+    def test_formatprice(self):
+        assert formatprice(1250, 'comma', '€', None) == "12,50€"
+        assert formatprice(1250, 'dot', '$', None) == "12.50$"
+        assert formatprice(1250, 'prefix', '€', None) == "€12.50"
+        assert formatprice(1250, 'integer', '€', None) == "12€"
+
+
+class TestLoadState:
+
+    def test_cache_and_bulk_load_give_same_state(self, tmp_path):
+        cachefolder = str(tmp_path) + os.sep
+        state = generatestate(300)
+        writestate(state, cachefolder, TOKEN)
+        cached = stateIndex(loadstate(cachefolder))
+        bulk = stateIndex(bulkloadstate(cachefolder))
+        compact = stateIndex(compactloadstate(cachefolder))
+        active = [task for task in state['items'] if not task['is_deleted'] and not task['is_archived']]
+        assert len(cached.items) == len(bulk.items) == len(active)
+        assert len(compact.items) == len(active)
+        assert cached.labels == bulk.labels == compact.labels
+        assert cached.labelled == bulk.labelled == compact.labelled
+
+    def test_runbenchmark_measures_all_passes(self):
+        results = runbenchmark(200, memory=False)
+        assert list(results) == ['load', 'bulkload', 'compactload', 'stateIndex', 'gettaskwithlabelid', 'progress', 'grocery']
+        assert 'load' not in runbenchmark(200, memory=False, maxload=100)
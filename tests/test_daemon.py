@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+from configparser import ConfigParser
+
+import pytest
+from click.testing import CliRunner
+
+from taskbutler import cli
+from taskbutler import daemon
+
+"""Tests for `taskbutler` daemon mode."""
+
+
+class FakeSession:
+
+    def __init__(self, config):
+        self.runs = []
+        self.stop = None
+        self.fail = False
+
+    def run(self, fullsync=False):
+        self.runs.append(fullsync)
+        if len(self.runs) == 3:
+            self.stop.set()
+        if self.fail:
+            raise SystemExit(1)
+
+
+class TestDaemon:
+
+    def prepare(self, monkeypatch, fail=False, config=None):
+        stop = threading.Event()
+        session = FakeSession(None)
+        session.stop = stop
+        session.fail = fail
+        monkeypatch.setattr(daemon, 'createconfigpaths', lambda: None)
+        monkeypatch.setattr(daemon, 'readconfig', lambda: config or ConfigParser())
+        monkeypatch.setattr(daemon, 'accountSession', lambda config: session)
+        return stop, session
+
+    def test_runs_until_stopped_and_keeps_session(self, monkeypatch):
+        stop, session = self.prepare(monkeypatch)
+        daemon.rundaemon(0, jitter=0, fullsync=True, stop=stop)
+        assert session.runs == [True, False, False]
+
+    def test_webhook_requires_a_secret(self, monkeypatch):
+        config = ConfigParser()
+        config.read_dict({'webhook': {'port': '0', 'secret': ''}})
+        stop, session = self.prepare(monkeypatch, config=config)
+        with pytest.raises(SystemExit):
+            daemon.rundaemon(0, jitter=0, stop=stop)
+        assert session.runs == []
+
+    def test_failed_run_does_not_stop_daemon(self, monkeypatch):
+        stop, session = self.prepare(monkeypatch, fail=True)
+        daemon.rundaemon(0, jitter=0, stop=stop)
+        assert len(session.runs) == 3
+
+    def test_delay_stays_within_jitter(self):
+        for _ in range(100):
+            assert 50 <= daemon.getdelay(60, 10) <= 70
+        assert daemon.getdelay(1, 10) >= 0
+
+    def test_cli_run_help(self):
+        runner = CliRunner()
+        help_result = runner.invoke(cli.cli, ['run', '--help'])
+        assert help_result.exit_code == 0
+        assert '--daemon' in help_result.output
+        assert '--interval' in help_result.output
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+
+from taskbutler.engine import runpipeline
+from taskbutler import taskbutler
+from taskbutler.features import feature, artifactFeature, updateIntent, artifactIntent, getfeatureorder, getrequirements
+from taskbutler.sync import updateQueue
+
+"""Tests for `taskbutler` feature pipeline."""
+
+
+class FakeTask(dict):
+
+    @property
+    def data(self):
+        return self
+
+
+class FakeIndex:
+
+    def __init__(self, *task_ids):
+        self.items = {task_id: FakeTask(id=task_id, content="task {}".format(task_id)) for task_id in task_ids}
+
+    def getitem(self, task_id):
+        return self.items.get(task_id)
+
+
+class FakeSession:
+    config = None
+
+
+def makefeature(name, run, requires=(), io=False):
+    instance = feature(FakeSession())
+    instance.name = name
+    instance.requires = requires
+    instance.io = io
+    instance.run = run
+    return instance
+
+
+class FakeArtifactFeature(artifactFeature):
+    """
+    Creates one artifact for task 1. create() waits until created is released
+    """
+
+    name = 'paper'
+    requires = ('progress',)
+
+    def __init__(self):
+        super().__init__(FakeSession())
+        self.creating = threading.Event()
+        self.created = threading.Event()
+
+    def plan(self, index, dirty):
+        return [artifactIntent(self.name, 1, index.getitem(1)['content'], index.getitem(1)['content'])]
+
+    def create(self, titles):
+        self.creating.set()
+        self.created.wait(5)
+        return ["https://paper/" + title.replace(" ", "-") for title in titles]
+
+    def link(self, content, url):
+        return content + " " + url
+
+
+def title(task_id, content):
+    return lambda index, dirty: [updateIntent(task_id, {'content': content})]
+
+
+class TestPipeline:
+
+    def test_io_features_run_concurrently(self):
+        def slow(index, dirty):
+            time.sleep(0.3)
+            return []
+
+        started = time.monotonic()
+        runpipeline([makefeature('paper', slow, io=True), makefeature('office', slow, io=True)], FakeIndex(), None, updateQueue(None))
+        assert time.monotonic() - started < 0.55
+
+    def test_cpu_features_run_while_io_in_flight(self):
+        inflight = threading.Event()
+        release = threading.Event()
+        seen = []
+
+        def io(index, dirty):
+            inflight.set()
+            release.wait(5)
+            return []
+
+        def cpu(index, dirty):
+            seen.append(inflight.wait(5))
+            release.set()
+            return []
+
+        runpipeline([makefeature('progress', cpu), makefeature('paper', io, io=True)], FakeIndex(), None, updateQueue(None))
+        assert seen == [True]
+
+    def test_intents_are_merged_into_one_queue(self):
+        queue = updateQueue(None)
+        index = FakeIndex(1, 2)
+        runpipeline([makefeature('grocery', title(1, "list 10 €")), makefeature('progress', title(2, "task ‣ 50 %"))], index, None, queue)
+        assert queue.updates == {1: {'content': "list 10 €"}, 2: {'content': "task ‣ 50 %"}}
+        assert index.getitem(2)['content'] == "task ‣ 50 %"
+
+    def test_required_feature_runs_first_and_its_intents_are_visible(self):
+        queue = updateQueue(None)
+        index = FakeIndex(1)
+
+        def paper(index, dirty):
+            return [updateIntent(1, {'content': index.getitem(1)['content'] + " https://paper"})]
+
+        features = [makefeature('paper', paper, requires=('progress',), io=True), makefeature('progress', title(1, "task ‣ 50 %"))]
+        runpipeline(features, index, None, queue)
+        assert queue.updates == {1: {'content': "task ‣ 50 % https://paper"}}
+
+    def test_artifacts_get_created_while_required_features_run(self):
+        queue = updateQueue(None)
+        paper = FakeArtifactFeature()
+        seen = []
+
+        def progress(index, dirty):
+            seen.append(paper.creating.wait(5))
+            paper.created.set()
+            return [updateIntent(1, {'content': "task 1 ‣ 50 %"})]
+
+        runpipeline([paper, makefeature('progress', progress)], FakeIndex(1), None, queue)
+        assert seen == [True]
+        # artifact named after the snapshot, link added to the new title
+        assert queue.updates == {1: {'content': "task 1 ‣ 50 % https://paper/task-1"}}
+
+    def test_conflicting_independent_updates_keep_the_first(self):
+        queue = updateQueue(None)
+        runpipeline([makefeature('grocery', title(1, "first")), makefeature('progress', title(1, "second"))], FakeIndex(1), None, queue)
+        assert queue.updates == {1: {'content': "first"}}
+
+    def test_failed_feature_raises_after_all_features_finished(self):
+        finished = []
+
+        def fail(index, dirty):
+            raise ValueError('boom')
+
+        def slow(index, dirty):
+            time.sleep(0.1)
+            finished.append(True)
+            return []
+
+        with pytest.raises(ValueError):
+            runpipeline([makefeature('paper', fail, io=True), makefeature('office', slow, io=True)], FakeIndex(), None, updateQueue(None))
+        assert finished == [True]
+
+
+class TestFeatureOrder:
+
+    def test_ready_io_features_come_first(self):
+        features = [makefeature('grocery', None), makefeature('paper', None, requires=('grocery',), io=True),
+                    makefeature('updatecheck', None, io=True)]
+        assert [instance.name for instance in getfeatureorder(features)] == ['updatecheck', 'grocery', 'paper']
+
+    def test_disabled_requirements_are_ignored(self):
+        features = [makefeature('paper', None, requires=('progress',), io=True)]
+        assert [instance.name for instance in getfeatureorder(features)] == ['paper']
+
+    def test_circular_requirements_raise(self):
+        features = [makefeature('a', None, requires=('b',)), makefeature('b', None, requires=('a',))]
+        with pytest.raises(ValueError):
+            getfeatureorder(features)
+
+    def test_title_features_build_on_earlier_titles(self, accountsession):
+        session = accountsession()
+        features = [featureclass(session) for featureclass in taskbutler.FEATURES]
+        requirements = getrequirements(features)
+        assert 'grocery' in requirements['progress']
+        assert {'grocery', 'progress'} <= requirements['paper']
+        assert {'grocery', 'progress'} <= requirements['office']
+        # paper and office create their artifacts independently
+        assert 'paper' not in requirements['office']
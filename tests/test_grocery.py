@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import pytest
+from decimal import Decimal
 
 from click.testing import CliRunner
 
+from todoist.api import TodoistAPI
 from taskbutler import taskbutler
 from taskbutler import cli
+from taskbutler.state import stateIndex
 
 """Tests for `taskbutler` package."""
 
@@ -47,3 +50,40 @@ class TestModifyTitle:
     def test_add_url_to_task(self):
         assert taskbutler.addurltotask("google", "https://google1.com", "-") == 'https://google1.com (google) '
         assert taskbutler.addurltotask("google - X", "https://google3.com", "-") == 'https://google3.com (google) - X'
+
+
+def grocerytask(task_id, content, parent_id=None, labels=None, in_history=0):
+    return {'id': task_id, 'content': content, 'parent_id': parent_id, 'labels': labels or [], 'checked': 0,
+            'is_deleted': 0, 'in_history': in_history, 'is_archived': 0}
+
+
+class TestGroceryTotals:
+
+    @pytest.fixture(scope='session')
+    def API_GROCERY(self):
+        data = TodoistAPI(cache=None)
+        data._update_state({
+            'labels': [{'id': 1, 'name': 'grocery', 'is_deleted': 0}],
+            'items': [
+                grocerytask(10, 'Shopping', labels=[1]),
+                grocerytask(11, 'Bakery 💰 1€', parent_id=10, labels=[1]),
+                grocerytask(12, 'Bread 0,1€', parent_id=11),
+                grocerytask(13, 'Cake 0,2€', parent_id=11),
+                grocerytask(14, 'Cakes', parent_id=11, labels=[1]),
+                grocerytask(15, 'Cheesecake 3€', parent_id=14),
+                grocerytask(16, '* Note 100€', parent_id=14),
+                grocerytask(17, 'Milk 1,5€', parent_id=10),
+                grocerytask(18, 'Eggs 2€', parent_id=10, in_history=1),
+            ]
+        })
+        return data
+
+    def test_Sums_up_nested_lists_in_one_run(self, API_GROCERY):
+        totals = taskbutler.getgrocerytotals(stateIndex(API_GROCERY), 1, '€', '💰')
+        assert totals[14] == Decimal('3')
+        assert totals[11] == Decimal('3.3')
+        assert totals[10] == Decimal('4.8')
+
+    def test_Sums_up_without_float_drift(self, API_GROCERY):
+        totals = taskbutler.getgrocerytotals(stateIndex(API_GROCERY), 1, '€', '💰')
+        assert taskbutler.localizePrice(float(totals[11]), '€') == '3,3€'
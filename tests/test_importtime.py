@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from benchmarks.importtime import getheavymodules, HELP_COMMAND
+
+"""Tests for the lazy imports of `taskbutler`."""
+
+
+class TestLazyImports:
+
+    def test_help_imports_no_sdk(self):
+        assert getheavymodules(HELP_COMMAND) == []
+
+    def test_module_imports_no_dropbox_or_todoist(self):
+        assert getheavymodules("import taskbutler.taskbutler") == []
+
+    def test_enabled_dropbox_gets_imported(self):
+        assert 'dropbox' in getheavymodules("from taskbutler.taskbutler import createpaperdocument\n"
+                                            "try:\n"
+                                            "    createpaperdocument('title', None, '', '', False)\n"
+                                            "except Exception:\n"
+                                            "    pass")
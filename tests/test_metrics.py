@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from taskbutler.metrics import runMetrics
+from taskbutler.transport import meteredSession
+
+"""Tests for `taskbutler` run metrics."""
+
+
+class FakeAdapter(BaseAdapter):
+
+    def __init__(self, status_code=200, error=None):
+        super().__init__()
+        self.status_code = status_code
+        self.error = error
+
+    def send(self, request, **kwargs):
+        if self.error:
+            raise self.error
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def getsession(metrics, **kwargs):
+    session = meteredSession('todoist', metrics)
+    session.mount('https://', FakeAdapter(**kwargs))
+    return session
+
+
+class TestRunMetrics:
+
+    def test_phases_add_up(self):
+        metrics = runMetrics()
+        with metrics.phase('sync'):
+            pass
+        metrics.addphase('sync', 1.0)
+        assert 1.0 <= metrics.todict()['phases']['sync'] < 1.5
+
+    def test_calls_are_recorded_per_endpoint(self):
+        metrics = runMetrics()
+        session = getsession(metrics)
+        session.get('https://api.todoist.com/sync/v8/sync?token=secret')
+        session.post('https://api.todoist.com/sync/v8/sync')
+        calls = metrics.todict()['calls']
+        assert len(calls) == 1
+        assert calls[0]['service'] == 'todoist'
+        assert calls[0]['endpoint'] == '/sync/v8/sync'
+        assert calls[0]['count'] == 2
+        assert calls[0]['errors'] == 0
+
+    def test_error_status_and_exceptions_count_as_errors(self):
+        metrics = runMetrics()
+        getsession(metrics, status_code=500).get('https://api.todoist.com/sync/v8/sync')
+        with pytest.raises(requests.exceptions.ConnectionError):
+            getsession(metrics, error=requests.exceptions.ConnectionError()).get('https://api.todoist.com/sync/v8/sync')
+        assert metrics.todict()['calls'][0]['errors'] == 2
+
+    def test_prometheus_format(self):
+        metrics = runMetrics()
+        metrics.addphase('sync', 0.5)
+        metrics.recordcall('dropbox', '/2/files/copy_batch_v2', 0.25)
+        metrics.countitems('progress', scanned=10, updated=2)
+        text = metrics.toprometheus()
+        assert '# TYPE taskbutler_phase_seconds gauge' in text
+        assert 'taskbutler_phase_seconds{phase="sync"} 0.5' in text
+        assert 'taskbutler_api_calls{service="dropbox",endpoint="/2/files/copy_batch_v2"} 1' in text
+        assert 'taskbutler_items_scanned{feature="progress"} 10' in text
+        assert 'taskbutler_items_updated{feature="progress"} 2' in text
+        assert 'taskbutler_last_run_success 1' in text
+
+    def test_write_json(self, tmp_path):
+        metrics = runMetrics()
+        metrics.countitems('grocery', scanned=3)
+        path = str(tmp_path / 'metrics.json')
+        metrics.write(path)
+        assert json.load(open(path))['items'] == {'grocery': {'scanned': 3, 'updated': 0}}
+        assert not (tmp_path / 'metrics.json.tmp').exists()
+
+    def test_write_unknown_format_raises(self, tmp_path):
+        with pytest.raises(ValueError):
+            runMetrics().write(str(tmp_path / 'metrics'), 'xml')
+
+
+class TestSessionMetrics:
+
+    def test_failed_run_is_exported(self, tmp_path, accountsession):
+        path = str(tmp_path / 'metrics.json')
+        session = accountsession(metrics={'file': path, 'format': 'json'})
+        with pytest.raises(SystemExit):
+            with session.measure():
+                raise SystemExit(1)
+        data = json.load(open(path))
+        assert data['success'] is False
+        assert 'total' in data['phases']
+        assert session.metrics.success is True
+
+    def test_no_file_configured(self, accountsession):
+        session = accountsession(metrics={'file': ''})
+        with session.measure():
+            pass
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import pytest
+
+from taskbutler.features import artifactFeature, artifactIntent
+from taskbutler.planner import changePlan, applyplan, PLAN_VERSION
+from taskbutler.state import stateIndex
+
+"""Tests for `taskbutler` plan and apply mode."""
+
+PROGRESS_TASK = 2886409846
+
+
+class FakeArtifactFeature(artifactFeature):
+    name = 'paper'
+
+    def __init__(self):
+        self.created = []
+
+    def create(self, titles):
+        self.created.extend(titles)
+        return ["https://paper/{}".format(len(self.created) - len(titles) + number) for number in range(len(titles))]
+
+    def link(self, content, url):
+        return url + " (" + content + ")"
+
+
+class TestChangePlan:
+
+    def test_round_trip(self, tmp_path):
+        plan = changePlan([[1, 'content', "a", "a ‣ 50 %"]], [['paper', 2, "b", "b"]], sync_token="111")
+        plan.write(str(tmp_path / 'plan.json'))
+        read = changePlan.read(str(tmp_path / 'plan.json'))
+        assert read.todict() == plan.todict()
+        assert len(read) == 2
+        assert not os.path.exists(str(tmp_path / 'plan.json.tmp'))
+
+    def test_rejects_other_versions(self, tmp_path):
+        path = str(tmp_path / 'plan.json')
+        with open(path, 'w') as f:
+            json.dump({'version': PLAN_VERSION + 1, 'updates': [], 'artifacts': [], 'created': 0}, f)
+        with pytest.raises(ValueError, match="version"):
+            changePlan.read(path)
+
+
+class TestApplyPlan:
+
+    def test_applies_updates_in_batches(self, api):
+        tasks = [task for task in api.state['items'] if not task['checked']][:5]
+        plan = changePlan([[task['id'], 'content', task['content'], task['content'] + " ‣ 0 %"] for task in tasks])
+        sleeps = []
+        counts = applyplan(plan, api, {}, batch=2, delay=0.5, sleep=sleeps.append)
+        assert counts == {'applied': 5, 'skipped': 0, 'stale': 0, 'failed': 0}
+        assert [len(commands) for commands in api.requests] == [2, 2, 1]
+        assert sleeps == [0.5, 0.5]
+        assert all(task['content'].endswith(" ‣ 0 %") for task in tasks)
+
+    def test_applying_twice_changes_nothing(self, api):
+        task = api.items.get_by_id(PROGRESS_TASK)
+        plan = changePlan([[PROGRESS_TASK, 'content', task['content'], "new title"]])
+        applyplan(plan, api, {})
+        assert applyplan(plan, api, {}) == {'applied': 0, 'skipped': 1, 'stale': 0, 'failed': 0}
+        assert len(api.requests) == 1
+
+    def test_skips_tasks_changed_since_the_plan(self, api):
+        plan = changePlan([[PROGRESS_TASK, 'content', "title at plan time", "new title"], [1, 'content', "a", "b"]])
+        assert applyplan(plan, api, {}) == {'applied': 0, 'skipped': 0, 'stale': 2, 'failed': 0}
+        assert api.requests == []
+
+    def test_retries_failed_commands(self, api):
+        task = api.items.get_by_id(PROGRESS_TASK)
+        api.failures[PROGRESS_TASK] = 2
+        sleeps = []
+        counts = applyplan(changePlan([[PROGRESS_TASK, 'content', task['content'], "new title"]]), api, {}, retries=2, sleep=sleeps.append)
+        assert counts['applied'] == 1
+        assert sleeps == [1.0, 2.0]
+        assert task['content'] == "new title"
+
+    def test_counts_commands_failing_after_all_retries(self, api):
+        task = api.items.get_by_id(PROGRESS_TASK)
+        api.failures[PROGRESS_TASK] = 5
+        counts = applyplan(changePlan([[PROGRESS_TASK, 'content', task['content'], "new title"]]), api, {}, retries=1, sleep=lambda seconds: None)
+        assert counts['failed'] == 1
+        assert len(api.requests) == 2
+
+    def test_creates_artifacts_of_unchanged_tasks_only(self, api):
+        tasks = [task for task in api.state['items'] if "https://" not in task['content']][:3]
+        plan = changePlan(artifacts=[artifactIntent('paper', task['id'], "doc {}".format(number), task['content'])
+                                     for number, task in enumerate(tasks)])
+        tasks[1]['content'] = "changed"
+        paper = FakeArtifactFeature()
+        counts = applyplan(plan, api, {'paper': paper})
+        assert counts == {'applied': 2, 'skipped': 0, 'stale': 1, 'failed': 0}
+        assert paper.created == ["doc 0", "doc 2"]
+        assert tasks[0]['content'].startswith("https://paper/0 (")
+        assert tasks[2]['content'].startswith("https://paper/1 (")
+        assert applyplan(plan, api, {'paper': paper})['skipped'] == 2
+        assert paper.created == ["doc 0", "doc 2"]
+
+
+class TestPlanRun:
+
+    @pytest.fixture()
+    def session(self, accountsession):
+        return accountsession(devmode=True, todoist={'label_grocery': ''})
+
+    def test_plans_updates_and_artifacts_without_changes(self, session, tmp_path):
+        session.api.items.get_by_id(PROGRESS_TASK)['labels'].append(2149965784)
+        before = {task['id']: task['content'] for task in session.api.state['items']}
+        planfile = str(tmp_path / 'plan.json')
+        session.process(stateIndex(session.api), None, planfile=planfile)
+
+        plan = changePlan.read(planfile)
+        assert session.api.requests == []
+        assert {task['id']: task['content'] for task in session.api.state['items']} == before
+        assert [PROGRESS_TASK, 'content', "Single List 1", "Single List 1 ‣ ⬛⬛⬛⬜⬜ 50 %"] in plan.updates
+        # paper is planned in devmode too - nothing gets created. The document is named after the title
+        # of the snapshot, its link gets added to the new progress bar
+        assert plan.artifacts == [['paper', PROGRESS_TASK, "Single List 1", "Single List 1 ‣ ⬛⬛⬛⬜⬜ 50 %"]]
+        for task_id, field, old, new in plan.updates:
+            assert before[task_id] == old
+
+    def test_apply_is_disabled_in_devmode(self, session, tmp_path):
+        planfile = str(tmp_path / 'plan.json')
+        changePlan().write(planfile)
+        with pytest.raises(SystemExit):
+            session.apply(planfile)
+
+    def test_apply_keeps_changes_since_the_plan_for_the_next_run(self, accountsession, api, tmp_path):
+        session = accountsession(devmode=False, todoist={'label_grocery': ''})
+        session.fingerprints.getdirty({'full_sync': True}, stateIndex(api))
+        planfile = str(tmp_path / 'plan.json')
+        changePlan().write(planfile)
+
+        # subtask reopened between plan and apply - apply's sync gets the delta
+        task = dict(api.items.get_by_id(2886413796).data, checked=0)
+        api.responses = [{'sync_token': "333", 'full_sync': False, 'items': [task]}]
+        session.apply(planfile)
+        dirty = session.fingerprints.getdirty({'full_sync': False, 'items': []}, stateIndex(api))
+        assert dirty == {2886413796, 2886413793, 2886413693}
+
+    def test_apply_keeps_changes_made_while_applying_for_the_next_run(self, accountsession, api, tmp_path):
+        session = accountsession(devmode=False, todoist={'label_grocery': ''})
+        session.fingerprints.getdirty({'full_sync': True}, stateIndex(api))
+        task = api.items.get_by_id(PROGRESS_TASK)
+        planfile = str(tmp_path / 'plan.json')
+        changePlan([[PROGRESS_TASK, 'content', task['content'], "new title"]]).write(planfile)
+
+        # subtask reopened while applying - the commit gets the delta along with the echo
+        sync = api.sync
+
+        def syncwithchange(commands=None):
+            response = sync(commands)
+            if commands:
+                response['items'].append(dict(api.items.get_by_id(2886413796).data, checked=0))
+            return response
+        api.sync = syncwithchange
+        api.responses = [{'sync_token': "333", 'full_sync': False, 'items': []}]
+        assert session.apply(planfile)['applied'] == 1
+        dirty = session.fingerprints.getdirty({'full_sync': False, 'items': []}, stateIndex(api))
+        assert dirty == {2886413796, 2886413793, 2886413693}
+
+    def test_grocery_list_with_progress_bar_gets_both(self, accountsession, api, tmp_path):
+        session = accountsession(devmode=True, todoist={'label_grocery': 'progressbar'})
+        api.items.get_by_id(2886409986)['content'] = "Milk 2€"
+        planfile = str(tmp_path / 'plan.json')
+        session.process(stateIndex(api), None, planfile=planfile)
+        updates = {task_id: new for task_id, field, old, new in changePlan.read(planfile).updates}
+        assert updates[PROGRESS_TASK] == "Single List 1 💰 2,0€ ‣ ⬛⬛⬛⬜⬜ 50 %"
+
+    def test_office_leaves_tasks_with_paper_label_to_paper(self, session, tmp_path):
+        # paper: progressbar and paper label, office: letter label on both tasks
+        session.api.items.get_by_id(PROGRESS_TASK)['labels'] += [2149965784, 2150476420]
+        session.api.items.get_by_id(2886433224)['labels'].append(2150476420)
+        planfile = str(tmp_path / 'plan.json')
+        session.process(stateIndex(session.api), None, planfile=planfile)
+
+        artifacts = changePlan.read(planfile).artifacts
+        assert [[name, task_id] for name, task_id, title, content in artifacts] == [['paper', PROGRESS_TASK], ['office', 2886433224]]
@@ -33,6 +33,7 @@ class TestConfigVariables:
         assert config.staticConfig.dir_config == 'config'
         assert config.staticConfig.dir_templates == 'templates'
         assert config.staticConfig.dir_log == 'log'
+        assert config.staticConfig.dir_cache == 'cache'
 
         assert config.staticConfig.filename_config == 'config.ini'
         assert config.staticConfig.filename_config_initial == 'config.ini.sample'
@@ -46,6 +47,7 @@ class TestConfigVariables:
             print('paths in this env: ', config.getConfigPaths().config())
             print('paths in this env: ', config.getConfigPaths().log())
             print('paths in this env: ', config.getConfigPaths().templates())
+            print('paths in this env: ', config.getConfigPaths().cache())
             print('paths in this env: ', config.getConfigPaths().file_config())
 
             # Make sure the test reaches the config.ini.sample
@@ -83,3 +85,9 @@ class TestCreateConfigPaths:
         runner = CliRunner()
         result = runner.invoke(cli.main)
         assert os.path.exists(config.getConfigPaths().log()) is True
+
+    def test_create_cache_paths(self):
+        # create cache
+        runner = CliRunner()
+        result = runner.invoke(cli.main)
+        assert os.path.exists(config.getConfigPaths().cache()) is True
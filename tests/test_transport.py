@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from configparser import ConfigParser
+from email.utils import formatdate
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from taskbutler import taskbutler
+from taskbutler.metrics import runMetrics
+from taskbutler.transport import meteredSession, retryPolicy, rateLimiter, getretryafter
+
+"""Tests for `taskbutler` HTTP transport."""
+
+URL = 'https://api.todoist.com/sync/v8/sync'
+
+
+class ScriptedAdapter(BaseAdapter):
+    """
+    Answers with the given statuses or exceptions in order, 200 once the script is done
+    """
+
+    def __init__(self, *script):
+        super().__init__()
+        self.script = list(script)
+        self.timeouts = []
+        self.responses = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        step = self.script.pop(0) if self.script else 200
+        if isinstance(step, Exception):
+            raise step
+        status, headers = step if isinstance(step, tuple) else (step, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.url = request.url
+        response.request = request
+        response.raw = ClosingBody()
+        self.responses.append(response)
+        return response
+
+    def close(self):
+        pass
+
+
+class ClosingBody:
+
+    closed = False
+
+    def read(self, size=-1):
+        return b""
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        pass
+
+
+def getsession(adapter, policy, metrics=None):
+    sleeps = []
+    session = meteredSession('todoist', metrics or runMetrics(), policy=policy, sleep=sleeps.append)
+    session.mount('https://', adapter)
+    return session, sleeps
+
+
+class TestRetryPolicy:
+
+    def test_backoff_grows_with_full_jitter(self):
+        policy = retryPolicy(retries=5, backoff=0.5, max_backoff=3)
+        for attempt, bound in enumerate((0.5, 1.0, 2.0, 3.0, 3.0)):
+            delays = [policy.delay(attempt) for number in range(50)]
+            assert all(0 <= delay <= bound for delay in delays)
+        assert policy.delay(5) is None
+
+    def test_retry_after(self):
+        response = requests.Response()
+        assert getretryafter(response) is None
+        response.headers['Retry-After'] = '7'
+        assert getretryafter(response) == 7.0
+        response.headers['Retry-After'] = formatdate(time.time() + 20, usegmt=True)
+        assert 15 < getretryafter(response) <= 20
+        response.headers['Retry-After'] = 'soon'
+        assert getretryafter(response) is None
+
+    def test_reads_config(self):
+        config = ConfigParser()
+        config.read(os.path.join(os.path.dirname(taskbutler.__file__), 'config.ini.sample'), encoding='utf-8')
+        policy = retryPolicy.fromconfig(config)
+        assert policy.retries == 3
+        assert policy.timeout == (5.0, 60.0)
+        assert retryPolicy.fromconfig(ConfigParser()).retries == 3
+
+
+class TestMeteredSession:
+
+    def test_retries_server_errors(self):
+        metrics = runMetrics()
+        adapter = ScriptedAdapter(503, 502)
+        session, sleeps = getsession(adapter, retryPolicy(retries=3, backoff=1), metrics)
+        assert session.post(URL, data="commands", stream=True).status_code == 200
+        assert len(sleeps) == 2
+        assert all(response.raw.closed for response in adapter.responses[:2])
+        call = metrics.todict()['calls'][0]
+        assert (call['count'], call['errors'], call['retries']) == (3, 2, 2)
+
+    def test_waits_for_retry_after(self):
+        adapter = ScriptedAdapter((429, {'Retry-After': '12'}))
+        session, sleeps = getsession(adapter, retryPolicy(max_backoff=30))
+        assert session.get(URL).status_code == 200
+        assert sleeps == [12.0]
+
+    def test_does_not_wait_longer_than_max_backoff(self):
+        adapter = ScriptedAdapter((429, {'Retry-After': '3600'}))
+        session, sleeps = getsession(adapter, retryPolicy(max_backoff=30))
+        assert session.get(URL).status_code == 429
+        assert sleeps == []
+
+    def test_gives_up_after_all_retries(self):
+        session, sleeps = getsession(ScriptedAdapter(500, 500, 500), retryPolicy(retries=2))
+        assert session.get(URL).status_code == 500
+        assert len(sleeps) == 2
+
+    def test_retries_connection_errors(self):
+        session, sleeps = getsession(ScriptedAdapter(requests.exceptions.ConnectionError()), retryPolicy(retries=1))
+        assert session.get(URL).status_code == 200
+        error = requests.exceptions.ConnectionError()
+        session, sleeps = getsession(ScriptedAdapter(error, error), retryPolicy(retries=1))
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(URL)
+        assert len(sleeps) == 1
+
+    def test_client_errors_are_not_retried(self):
+        session, sleeps = getsession(ScriptedAdapter(404), retryPolicy())
+        assert session.get(URL).status_code == 404
+        assert sleeps == []
+
+    def test_timeouts(self):
+        adapter = ScriptedAdapter()
+        session, sleeps = getsession(adapter, retryPolicy(connect_timeout=2, read_timeout=9))
+        session.get(URL)
+        session.get(URL, timeout=3)
+        assert adapter.timeouts == [(2, 9), 3]
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class LimitedAdapter(ScriptedAdapter):
+    """
+    Rate limits every call above ceiling calls in flight
+    """
+
+    def __init__(self, ceiling):
+        super().__init__()
+        self.ceiling = ceiling
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.limited = 0
+
+    def send(self, request, timeout=None, **kwargs):
+        with self.lock:
+            self.inflight += 1
+            status = 429 if self.inflight > self.ceiling else 200
+            self.limited += status == 429
+        time.sleep(0.005)
+        self.script.append(status)
+        response = super().send(request, timeout=timeout, **kwargs)
+        with self.lock:
+            self.inflight -= 1
+        return response
+
+
+class TestRateLimiter:
+
+    def getlimiter(self, **kwargs):
+        clock = FakeClock()
+        return rateLimiter(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+    def test_burst_then_rate(self):
+        limiter, clock = self.getlimiter(rate=2.0, burst=3, concurrency=10)
+        for number in range(5):
+            limiter.release(limiter.acquire(), 200)
+        # 3 tokens of the burst, then one token every 0.5s
+        assert clock.sleeps == [0.5, 0.5]
+        assert clock.now == 101.0
+
+    def test_no_rate_never_waits(self):
+        limiter, clock = self.getlimiter(rate=0, concurrency=2)
+        for number in range(50):
+            limiter.release(limiter.acquire(), 200)
+        assert clock.sleeps == []
+
+    def test_rate_limited_calls_halve_the_concurrency_once_per_round(self):
+        limiter, clock = self.getlimiter(concurrency=8)
+        started = [limiter.acquire() for number in range(4)]
+        clock.now += 1
+        for start in started:
+            limiter.release(start, 429)
+        assert limiter.concurrency == 4
+        # a call started after the decrease halves again
+        limiter.release(limiter.acquire(), 429)
+        assert limiter.concurrency == 2
+        limiter.release(limiter.acquire(), 429)
+        limiter.release(limiter.acquire(), 429)
+        assert limiter.concurrency == 1
+
+    def busy(self, limiter, calls, status=200):
+        # keeps all slots in use
+        started = []
+        for number in range(calls):
+            while len(started) < int(limiter.concurrency):
+                started.append(limiter.acquire())
+            limiter.release(started.pop(0), status)
+        for start in started:
+            limiter.release(start, status)
+
+    def test_successful_calls_grow_the_concurrency_back(self):
+        limiter, clock = self.getlimiter(concurrency=4)
+        limiter.release(limiter.acquire(), 429)
+        assert limiter.concurrency == 2
+        # one step per round of concurrency calls
+        self.busy(limiter, 2)
+        assert 2.8 < limiter.concurrency <= 3
+        self.busy(limiter, 20)
+        assert limiter.concurrency == 4
+        # errors and failed calls don't change it
+        limiter.release(limiter.acquire(), 500)
+        limiter.release(limiter.acquire(), None)
+        assert limiter.concurrency == 4
+
+    def test_idle_service_keeps_its_concurrency(self):
+        limiter, clock = self.getlimiter(concurrency=8)
+        limiter.release(limiter.acquire(), 429)
+        for number in range(50):
+            limiter.release(limiter.acquire(), 200)
+        assert limiter.concurrency == 4
+
+    def test_pause_lets_all_calls_wait(self):
+        limiter, clock = self.getlimiter(concurrency=4)
+        limiter.pause(10)
+        limiter.release(limiter.acquire(), 200)
+        assert clock.sleeps == [10]
+        limiter.release(limiter.acquire(), 200)
+        assert clock.sleeps == [10]
+
+    def test_reads_config(self):
+        config = ConfigParser()
+        config.read_dict({'ratelimit': {'todoist_rate': '2', 'todoist_concurrency': '3'}})
+        limiter = rateLimiter.fromconfig(config, 'todoist')
+        assert (limiter.rate, limiter.burst, limiter.maxconcurrency) == (2.0, 20, 3)
+        assert rateLimiter.fromconfig(ConfigParser(), 'github').rate * 3600 == 60
+
+    def runthreads(self, limiter):
+        adapter = LimitedAdapter(ceiling=3)
+        session = meteredSession('todoist', runMetrics(), ratelimit=limiter)
+        session.mount('https://', adapter)
+
+        def worker():
+            for number in range(20):
+                session.get(URL)
+        threads = [threading.Thread(target=worker) for number in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return adapter.limited
+
+    def test_concurrency_adapts_to_the_service(self):
+        unlimited = self.runthreads(None)
+        limiter = rateLimiter(concurrency=12)
+        limited = self.runthreads(limiter)
+        assert limiter.inflight == 0
+        # concurrency saw-tooths around the ceiling of the service
+        assert limiter.concurrency < 6
+        assert limited < unlimited / 2
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+import threading
+
+import pytest
+
+from taskbutler import webhook
+from taskbutler.state import stateIndex
+
+"""Tests for `taskbutler` webhook receiver."""
+
+
+@pytest.fixture()
+def payloads():
+    with open(sys.path[0] + '/todoist_webhook_payloads.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TestWebhookHMAC:
+
+    def test_accepts_valid_signature(self):
+        assert webhook.verifyhmac(b'{}', webhook.gethmac(b'{}', "secret"), "secret") is True
+
+    def test_rejects_invalid_signature(self):
+        assert webhook.verifyhmac(b'{}', webhook.gethmac(b'{}', "wrong"), "secret") is False
+        assert webhook.verifyhmac(b'{}', None, "secret") is False
+
+    def test_rejects_everything_without_secret(self):
+        assert webhook.verifyhmac(b'{}', webhook.gethmac(b'{}', ""), "") is False
+        with pytest.raises(ValueError):
+            webhook.startwebhookserver(webhook.webhookReceiver(lambda items: None), "")
+
+
+class TestWebhookReceiver:
+
+    @pytest.fixture()
+    def server(self):
+        received = []
+        done = threading.Event()
+
+        def callback(items):
+            received.append(items)
+            done.set()
+
+        receiver = webhook.webhookReceiver(callback, debounce=0.2)
+        server = webhook.startwebhookserver(receiver, "secret", port=0)
+        server.url = "http://127.0.0.1:{}/".format(server.server_address[1])
+        server.received = received
+        server.done = done
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def test_debounces_recorded_payloads(self, server, payloads):
+        codes = webhook.replaypayloads(server.url, payloads, secret="secret")
+        assert codes == [200, 200, 200, 200]
+        assert server.done.wait(5)
+        assert len(server.received) == 1
+        assert sorted(item['id'] for item in server.received[0]) == [2886409986, 2886410511]
+
+    def test_rejects_payloads_with_invalid_hmac(self, server, payloads):
+        assert webhook.replaypayloads(server.url, payloads[:1], secret="wrong") == [403]
+        assert server.received == []
+
+
+class TestRecompute:
+
+    @pytest.fixture()
+    def session(self, accountsession):
+        session = accountsession(devmode=False, todoist={'label_grocery': ''})
+        session.fingerprints.getdirty({'full_sync': True}, stateIndex(session.api))
+        return session
+
+    def test_recomputes_only_the_parent_chain(self, session, payloads):
+        session.recompute([payload['event_data'] for payload in payloads[:3]])
+        assert session.api.items.get_by_id(2886409846)['content'] == "Single List 1 ‣ ⬛⬛⬛⬛⬛ 100 %"
+        assert session.api.items.get_by_id(2886413088)['content'] == "Single List 2"